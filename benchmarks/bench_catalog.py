@@ -0,0 +1,65 @@
+# Startup and lookup cost of the product catalog (src/pc_application/catalog.py)
+#
+# Builds synthetic SQLite catalogs of growing size and measures, for each, the
+# time to open it (what the application pays at startup), uncached lookups by
+# name and by alias, lookups of unknown items (which try name, class label and
+# alias) and prefix searches as the item picker does them. All of these should
+# stay flat as the catalog grows.
+#
+# Usage:
+#   python benchmarks/bench_catalog.py [--sizes 1000 10000 100000]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from catalog import CatalogStore, build_catalog, synthetic_products  # noqa: E402
+
+
+def per_call_us(func, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the product catalog store")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'SKUs':>8} {'build s':>8} {'open ms':>8} {'name us':>8} {'alias us':>9} {'miss us':>8} "
+          f"{'search us':>10}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in args.sizes:
+            path = os.path.join(temp_dir, f"catalog_{size}.db")
+            start = time.perf_counter()
+            build_catalog(path, synthetic_products(size))
+            build_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            store = CatalogStore(path)
+            open_ms = (time.perf_counter() - start) * 1000
+
+            picks = [rng.randrange(size) for _ in range(args.queries)]
+            names = [(store.search(f"Product {i:07d}", 1)[0],) for i in picks[:200]]
+            store.cache = {}
+            name_us = per_call_us(store.lookup, names)
+            store.cache = {}
+            alias_us = per_call_us(store.lookup, [(f"P{i:07d}",) for i in picks])
+            miss_us = per_call_us(store.lookup, [(f"Unknown {i}",) for i in picks])
+            search_us = per_call_us(store.search, [(f"Product {i:07d}"[:rng.randint(9, 13)],) for i in picks])
+            store.close()
+
+            print(f"{size:>8} {build_s:>8.2f} {open_ms:>8.2f} {name_us:>8.1f} {alias_us:>9.1f} {miss_us:>8.1f} "
+                  f"{search_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Cost and effect of the detection consensus window (DetectionState in
+# src/pc_application/verification_core.py)
+#
+# Feeds a stream of frames in which FOMO flickers: every class has a true
+# quantity, but each frame misses or double-counts an item with some
+# probability. For several window sizes it reports the per-frame update cost,
+# which should not grow with the window, and how often the reported quantities
+# differ from the true ones.
+#
+# Usage:
+#   python benchmarks/bench_consensus.py [--frames 200000] [--flicker 0.2]
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from detection_parser import Detection  # noqa: E402
+from verification_core import DetectionState  # noqa: E402
+
+TRUE_COUNTS = {"KitKat": 2, "goodday": 1, "HidenSeek": 3, "Unibic": 1}
+
+
+def make_frames(count, flicker, seed=0):
+    rng = random.Random(seed)
+    frames = []
+    for _ in range(count):
+        frame = []
+        for name, quantity in TRUE_COUNTS.items():
+            if rng.random() < flicker:
+                quantity += rng.choice((-1, 1))
+            if quantity > 0:
+                frame.append(Detection(name, quantity, rng.uniform(0.6, 1.0)))
+        frames.append(frame)
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection consensus window")
+    parser.add_argument("--frames", type=int, default=200000)
+    parser.add_argument("--flicker", type=float, default=0.2, help="Chance a class is miscounted in a frame")
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.flicker)
+    print(f"{'statistic':<9} {'window':>6} {'us/frame':>9} {'wrong verdicts':>15}")
+    for statistic in ("mode", "median"):
+        for window in (1, 3, 5, 15, 60):
+            state = DetectionState({}, window_frames=window, statistic=statistic)
+            wrong = 0
+            start = time.perf_counter()
+            for i, frame in enumerate(frames):
+                state.update(frame, now=i * 0.1)
+                if state.counts != TRUE_COUNTS:
+                    wrong += 1
+            elapsed = time.perf_counter() - start
+            print(f"{statistic:<9} {window:>6} {elapsed / len(frames) * 1e6:>9.2f} {wrong / len(frames):>14.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Redraw cost of the "Detected Items" Treeview (needs a display)
+#
+# Renders a stream of detection frames into a real ttk.Treeview two ways and
+# reports the time per frame including Tk's redraw:
+#   rebuild - delete every row, insert every row, then tree.update()
+#             (what _update_detected_tree used to do)
+#   keyed   - KeyedTreeView.render() from src/pc_application/tree_view.py,
+#             then update_idletasks() so the repaint of changed rows is counted
+#
+# Frames show --visible items out of a catalog of --catalog names. Between
+# frames one item changes quantity with probability --change, so most frames
+# at high frame rates repeat the previous one.
+#
+# Usage:
+#   python benchmarks/bench_detected_tree.py [--frames 2000] [--catalog 10 100 1000] [--visible 20]
+import argparse
+import os
+import random
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from tree_view import KeyedTreeView  # noqa: E402
+
+COLUMNS = ("Item", "Count", "Price", "Confidence")
+
+
+def make_frames(count, catalog, visible, change, seed=0):
+    """Row mappings as _update_detected_tree builds them"""
+    rng = random.Random(seed)
+    names = [f"item{i:04d}" for i in range(catalog)]
+    current = {name: rng.randint(1, 4) for name in rng.sample(names, min(visible, catalog))}
+    frames = []
+    for _ in range(count):
+        if rng.random() < change:
+            current = dict(current)
+            name = rng.choice(list(current))
+            if rng.random() < 0.5 and len(current) > 1:
+                del current[name]
+                current[rng.choice(names)] = 1
+            else:
+                current[name] = max(1, current[name] + rng.choice((-1, 1)))
+        frames.append({name: (name, count, "25.00", "0.90") for name, count in current.items()})
+    return frames
+
+
+def make_tree(root):
+    tree = ttk.Treeview(root, columns=COLUMNS, show="headings", height=6)
+    for column in COLUMNS:
+        tree.heading(column, text=column)
+    tree.pack(fill=tk.BOTH, expand=True)
+    root.update()
+    return tree
+
+
+def bench_rebuild(root, frames):
+    tree = make_tree(root)
+    start = time.perf_counter()
+    for rows in frames:
+        for item in tree.get_children():
+            tree.delete(item)
+        for values in rows.values():
+            tree.insert('', tk.END, values=values)
+        tree.update()
+    elapsed = time.perf_counter() - start
+    tree.destroy()
+    return elapsed
+
+
+def bench_keyed(root, frames):
+    tree = make_tree(root)
+    view = KeyedTreeView(tree)
+    start = time.perf_counter()
+    for rows in frames:
+        view.render(rows)
+        tree.update_idletasks()
+    elapsed = time.perf_counter() - start
+    tree.destroy()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detected items Treeview update")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--catalog", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--visible", type=int, default=20, help="Items in view per frame")
+    parser.add_argument("--change", type=float, default=0.1, help="Chance a frame differs from the previous one")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"This benchmark needs a display: {e}")
+        sys.exit(1)
+    root.geometry("600x400")
+
+    print(f"{'catalog':>7} {'visible':>7} {'rebuild ms/frame':>17} {'keyed ms/frame':>15} {'speedup':>8}")
+    for catalog in args.catalog:
+        visible = min(args.visible, catalog)
+        frames = make_frames(args.frames, catalog, visible, args.change)
+        rebuild = bench_rebuild(root, frames) / len(frames) * 1000
+        keyed = bench_keyed(root, frames) / len(frames) * 1000
+        print(f"{catalog:>7} {visible:>7} {rebuild:>17.3f} {keyed:>15.3f} {rebuild / keyed:>7.1f}x")
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
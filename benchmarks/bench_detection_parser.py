@@ -0,0 +1,106 @@
+# Micro-benchmark for the DETECTION line parser (src/pc_application/detection_parser.py)
+#
+# Parses a synthetic corpus (a million lines by default) of current-format,
+# legacy-format and malformed "Sent: DETECTION|..." lines, and compares the
+# throughput with the inline parser that used to live in read_serial_data
+# (with its per-part debug strings still formatted, but not sent to Tk).
+#
+# Usage:
+#   python benchmarks/bench_detection_parser.py [--lines 1000000] [--min-rate 500000]
+#
+# With --min-rate the script exits with status 1 when the parser is slower
+# than that many lines per second, so it can guard against regressions.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from detection_parser import parse_detection_line  # noqa: E402
+
+CLASSES = ["KitKat", "goodday", "HidenSeek", "Unibic", "Apple", "Banana", "Chips", "Water"]
+
+
+def make_corpus(count, seed=0):
+    """Mostly valid detection lines with a sprinkling of legacy and broken ones"""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        classes = rng.sample(CLASSES, rng.randint(1, 4))
+        kind = rng.random()
+        if kind < 0.85:
+            parts = [f"{name}:{rng.randint(1, 9)}:{rng.uniform(0.6, 1.0):.2f}" for name in classes]
+        elif kind < 0.95:
+            parts = [f"{name}:{rng.uniform(0.6, 1.0):.2f}" for name in classes]
+        else:
+            parts = [f"{name}:x:{rng.uniform(0.6, 1.0):.2f}" for name in classes]
+        # The echo printed by the device script is what the PC receives today
+        lines.append("Sent: DETECTION|" + "|".join(parts))
+    return lines
+
+
+def legacy_parse(decoded_line, log):
+    """The inline parser from read_serial_data, with log_debug replaced by log"""
+    log(f"Processing line: '{decoded_line}'")
+    if "Sent:" in decoded_line and "DETECTION|" in decoded_line:
+        log(f"Found detection in: '{decoded_line}'")
+        detection_part = decoded_line.split("Sent:", 1)[1].strip()
+        log(f"Detection part: '{detection_part}'")
+        if detection_part.startswith("DETECTION|"):
+            parts = detection_part.split("|")
+            log(f"Split parts: {parts}")
+            detections = []
+            for part in parts[1:]:
+                log(f"Processing part: '{part}'")
+                if ":" in part:
+                    try:
+                        if part.count(":") == 2:
+                            item, quantity_str, score_str = part.split(":", 2)
+                            log(f"Found item: '{item}', quantity: '{quantity_str}', score: '{score_str}'")
+                            detections.append({"class": item, "quantity": int(quantity_str), "score": float(score_str)})
+                        else:
+                            item, score_str = part.split(":", 1)
+                            log(f"Found item (old format): '{item}', score: '{score_str}'")
+                            detections.append({"class": item, "quantity": 1, "score": float(score_str)})
+                    except ValueError as ve:
+                        log(f"Error parsing part '{part}': {str(ve)}")
+            return detections
+    return None
+
+
+def bench(name, func, lines):
+    start = time.perf_counter()
+    for line in lines:
+        func(line)
+    elapsed = time.perf_counter() - start
+    rate = len(lines) / elapsed
+    print(f"{name:<8} {len(lines):>9} lines {elapsed:8.3f} s {rate:12,.0f} lines/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DETECTION line parser")
+    parser.add_argument("--lines", type=int, default=1000000)
+    parser.add_argument("--min-rate", type=float, default=None,
+                        help="Fail if the parser handles fewer lines per second")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    lines = make_corpus(args.lines)
+
+    rate = bench("parser", parse_detection_line, lines)
+    if not args.skip_legacy:
+        def drop(message):
+            pass
+        legacy_rate = bench("legacy", lambda line: legacy_parse(line, drop), lines)
+        print(f"speedup  {rate / legacy_rate:.1f}x")
+
+    if args.min_rate is not None and rate < args.min_rate:
+        print(f"REGRESSION: {rate:,.0f} lines/s is below the minimum of {args.min_rate:,.0f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+# Regression guard for the host pipeline hot paths
+#
+# Times the per-frame work of the PC application on fixed synthetic workloads
+# and compares it with the baselines stored in benchmarks/baselines.json:
+#   parse   - parse_detection_line() on one DETECTION line (read_serial_data)
+#   process - DetectionState.update() with one frame (process_detections)
+#   verify  - verify() of the billed against the detected quantities
+#   total   - adding the frame's items to a cart and formatting the total
+#             (the bulk order path of calculate_total)
+#   merge   - merge_nearby_detections() per class on the frame's centroids
+# for every combination of 1, 20 and 500 classes with 1, 100 and 10,000
+# detections per frame, and
+#   fomo    - the NumPy FOMO post-processing of src/tools/fomo_post_process_np.py
+#             on 500 synthetic 12x12x5 heatmaps, one frame per call (frame)
+#             and all of them in one batch (batch); the baselines also record
+#             the frames per second this measured
+#
+# Each case also records a fingerprint of its result, so a change in
+# behaviour fails as loudly as a slowdown. Every case is timed next to a fixed
+# pure-Python calibration loop and compared as a multiple of it, which takes
+# out most of the difference between machines and of CPU clock changes during
+# the run. A case fails when it is more than --tolerance slower than its
+# baseline in two more tries; baselines are the median of three tries.
+#
+# Usage:
+#   python benchmarks/bench_hot_paths.py                 # compare, exit 1 on regression
+#   python benchmarks/bench_hot_paths.py --update        # record new baselines
+#   python benchmarks/bench_hot_paths.py --cases merge/  # only cases containing "merge/"
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, "..", "src", "pc_application"))
+sys.path.insert(0, os.path.join(_HERE, "..", "src", "nicla"))
+sys.path.insert(0, os.path.join(_HERE, "..", "src", "tools"))
+
+from detection_merge import merge_nearby_detections  # noqa: E402
+from detection_parser import parse_detection_line  # noqa: E402
+from fomo_post_process_np import fomo_post_process, fomo_post_process_batch  # noqa: E402
+from threshold_sweep import synthetic_dataset  # noqa: E402
+from verification_core import Cart, DetectionState, verify  # noqa: E402
+
+BASELINES_PATH = os.path.join(_HERE, "baselines.json")
+
+CLASS_COUNTS = (1, 20, 500)
+DETECTION_COUNTS = (1, 100, 10000)
+
+# The GUI's default consensus window
+WINDOW_FRAMES = 5
+
+# Heatmaps per run of the fomo cases
+FOMO_FRAMES = 500
+
+# Snapshot size on the device (QVGA)
+FRAME_WIDTH = 320
+FRAME_HEIGHT = 240
+
+# Detection classes of the model come first, so their distance thresholds are used
+MODEL_CLASSES = ["KitKat", "goodday", "HidenSeek", "Unibic"]
+
+
+def class_names(count):
+    return (MODEL_CLASSES + [f"Item{i:03d}" for i in range(count)])[:count]
+
+
+class Workload:
+    """One fixed synthetic frame and what the hot paths need to process it"""
+
+    def __init__(self, classes, detections, seed=0):
+        rng = random.Random(seed * 1000003 + classes * 10007 + detections)
+        self.names = class_names(classes)
+        self.prices = {name: f"{rng.randint(5, 500)}.{rng.randint(0, 99):02d}" for name in self.names}
+
+        # One centroid per detection, spread over the classes
+        self.centroids = {}
+        for _ in range(detections):
+            name = rng.choice(self.names)
+            x = rng.randrange(0, FRAME_WIDTH, 4)
+            y = rng.randrange(0, FRAME_HEIGHT, 4)
+            self.centroids.setdefault(name, []).append(((x, y, 8, 8), round(rng.uniform(0.6, 1.0), 2)))
+
+        # The line the device sends for the frame: one part per centroid
+        parts = [f"{name}:1:{score:.2f}" for name, found in self.centroids.items() for _, score in found]
+        self.line = "DETECTION|" + "|".join(parts)
+
+        # Consensus frames: the frame with a flickering count per class
+        self.frames = []
+        for _ in range(WINDOW_FRAMES):
+            self.frames.append([(name, max(0, len(found) + rng.choice((-1, 0, 0, 1))), 0.9)
+                                for name, found in self.centroids.items()])
+
+        self.detected = {name: len(found) for name, found in self.centroids.items()}
+        self.billed = {name: count + (1 if rng.random() < 0.1 else 0) for name, count in self.detected.items()}
+        self.cart_entries = [(name, 1) for name, found in self.centroids.items() for _ in found]
+
+
+def case_parse(workload):
+    line = workload.line
+
+    def run():
+        return len(parse_detection_line(line)[0])
+    return run
+
+
+def case_process(workload):
+    state = DetectionState(workload.prices, window_frames=WINDOW_FRAMES)
+    frames = workload.frames
+    position = [0]
+
+    def run():
+        frame = frames[position[0] % len(frames)]
+        position[0] += 1
+        state.update(frame, now=position[0] * 0.05)
+        return sum(state.counts.values())
+    # Fill the window so every timed update also evicts a frame
+    for _ in frames:
+        run()
+    position[0] = 0
+    return run
+
+
+def case_verify(workload):
+    billed = workload.billed
+    detected = workload.detected
+
+    def run():
+        return len(verify(billed, detected))
+    return run
+
+
+def case_total(workload):
+    cart = Cart(workload.prices)
+    entries = workload.cart_entries
+
+    def run():
+        cart.clear()
+        cart.add_many(entries)
+        return f"{cart.total:.2f}"
+    return run
+
+
+def case_merge(workload):
+    centroids = workload.centroids
+
+    def run():
+        # The merge sorts in place, so each call works on a fresh copy
+        return sum(len(merge_nearby_detections(list(found), name)) for name, found in centroids.items())
+    return run
+
+
+def count_boxes(results):
+    return sum(len(found) for frame in results for found in frame)
+
+
+def case_fomo_frame(heatmaps):
+    def run():
+        return count_boxes(fomo_post_process(frame[None]) for frame in heatmaps)
+    return run
+
+
+def case_fomo_batch(heatmaps):
+    def run():
+        return count_boxes(fomo_post_process_batch(heatmaps))
+    return run
+
+
+CASES = {
+    "parse": case_parse,
+    "process": case_process,
+    "verify": case_verify,
+    "total": case_total,
+    "merge": case_merge,
+}
+
+# Cases on FOMO_FRAMES heatmaps instead of a Workload
+FOMO_CASES = {
+    "fomo/frame": case_fomo_frame,
+    "fomo/batch": case_fomo_batch,
+}
+
+
+def measure(run, min_time=0.02, repeat=5):
+    """Best time per call in microseconds over repeat batches of at least min_time"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed * 1.2)))
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        best = min(best, time.perf_counter() - start)
+    return best / loops * 1e6
+
+
+def calibration_run():
+    """A fixed mix of dict, string and float work, like the hot paths do"""
+    counts = {}
+    for i in range(2000):
+        key = f"Item{i % 97:03d}"
+        counts[key] = counts.get(key, 0) + 1
+        float(f"0.{i % 100:02d}")
+    return sorted(counts.items())
+
+
+def measure_case(run, min_time):
+    """(us per call, multiple of the calibration loop timed right before and after)"""
+    before = measure(calibration_run, min_time)
+    us = measure(run, min_time)
+    after = measure(calibration_run, min_time)
+    return us, us / min(before, after)
+
+
+def key(args):
+    """The baseline field the run is compared on"""
+    return "us" if args.no_calibrate else "relative"
+
+
+def case_names(selected):
+    names = []
+    for stage in CASES:
+        for classes in CLASS_COUNTS:
+            for detections in DETECTION_COUNTS:
+                name = f"{stage}/c{classes}/d{detections}"
+                if not selected or any(part in name for part in selected):
+                    names.append((name, stage, classes, detections))
+    for name in FOMO_CASES:
+        if not selected or any(part in name for part in selected):
+            names.append((name, name, None, None))
+    return names
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the host pipeline hot paths against stored baselines")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--update", action="store_true", help="Store this run as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Fail when a case is this much slower than its baseline (0.5 = 50%%)")
+    parser.add_argument("--cases", nargs="*", default=[], help="Only run cases whose name contains one of these")
+    parser.add_argument("--min-time", type=float, default=0.02, help="Seconds per timed batch")
+    parser.add_argument("--no-calibrate", action="store_true",
+                        help="Compare raw times, e.g. when the baselines come from this machine")
+    args = parser.parse_args()
+
+    baselines = None if args.update else load_baselines(args.baselines)
+    if not args.update and baselines is None:
+        print(f"No baselines at {args.baselines}; run with --update to record them")
+        sys.exit(1)
+
+    workloads = {}
+    results = {}
+    failures = []
+    print(f"{'case':<22} {'us/call':>10} {'x calib':>8} {'baseline':>9} {'ratio':>6}  result")
+    for name, stage, classes, detections in case_names(args.cases):
+        workload = workloads.get((classes, detections))
+        if workload is None and classes is None:
+            workload = workloads[(classes, detections)] = synthetic_dataset(FOMO_FRAMES)[0]
+        elif workload is None:
+            workload = workloads[(classes, detections)] = Workload(classes, detections)
+        run = (FOMO_CASES if classes is None else CASES)[stage](workload)
+        result = run()
+        baseline = None if baselines is None else baselines["cases"].get(name)
+
+        if args.update:
+            # Baselines are the median of three tries
+            us, relative = sorted((measure_case(run, args.min_time) for _ in range(3)), key=lambda m: m[1])[1]
+        else:
+            # A slow try is repeated, so one busy moment on the machine does not fail the run
+            for _ in range(3):
+                us, relative = measure_case(run, args.min_time)
+                if args.no_calibrate:
+                    relative = us
+                if baseline is None or relative / baseline[key(args)] <= 1.0 + args.tolerance:
+                    break
+        results[name] = {"us": round(us, 3), "relative": round(relative, 6), "result": result}
+        shown = result
+        if classes is None:
+            results[name]["frames_per_s"] = round(FOMO_FRAMES / us * 1e6)
+            shown = f"{result} ({results[name]['frames_per_s']} frames/s)"
+
+        if baseline is None:
+            print(f"{name:<22} {us:>10.2f} {relative:>8.4f} {'-':>9} {'-':>6}  {shown}")
+            continue
+        ratio = relative / baseline[key(args)]
+        status = ""
+        if result != baseline["result"]:
+            status = f"  CHANGED, baseline {baseline['result']}"
+            failures.append(f"{name}: result {result!r} differs from the baseline {baseline['result']!r}")
+        elif ratio > 1.0 + args.tolerance:
+            status = "  SLOWER"
+            failures.append(f"{name}: {ratio:.2f}x its baseline ({us:.2f} us, baseline {baseline['us']:.2f} us)")
+        print(f"{name:<22} {us:>10.2f} {relative:>8.4f} {baseline[key(args)]:>9.4g} {ratio:>6.2f}  "
+              f"{shown}{status}")
+
+    if args.update:
+        stored = load_baselines(args.baselines) or {"cases": {}}
+        stored["cases"].update(results)
+        stored["cases"] = dict(sorted(stored["cases"].items()))
+        with open(args.baselines, "w") as f:
+            json.dump(stored, f, indent=2)
+            f.write("\n")
+        print(f"Stored {len(results)} baselines in {args.baselines}")
+        return
+
+    if failures:
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        sys.exit(1)
+    print(f"All {len(results)} cases within {args.tolerance:.0%} of their baselines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# End-to-end replay benchmark for the PC reader pipeline, without hardware
+#
+# Plays a session recording (see src/pc_application/serial_session.py) through
+# ReplayPort -> read_available -> StreamDecoder -> parse_detection_line, the
+# same path read_serial_data uses, and reports the throughput. Without a
+# recording, a synthetic one is generated first.
+#
+# Usage:
+#   python benchmarks/bench_replay.py [session.srec] [--speed 0] [--frames 100000]
+#
+# To watch a recording in the GUI instead:
+#   python src/pc_application/smart_retail_verification_final.py --replay session.srec --speed max
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from detection_parser import parse_detection_line  # noqa: E402
+from nicla_protocol import StreamDecoder, read_available  # noqa: E402
+from serial_session import MAGIC, RECORD, ReplayPort  # noqa: E402
+
+CLASSES = ["KitKat", "goodday", "HidenSeek", "Unibic"]
+
+
+def write_synthetic_session(path, frames, fps, seed=0):
+    """Write a recording of text-protocol frames as the device would send them"""
+    rng = random.Random(seed)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for i in range(frames):
+            classes = rng.sample(CLASSES, rng.randint(1, len(CLASSES)))
+            parts = "|".join(f"{name}:{rng.randint(1, 4)}:{rng.uniform(0.6, 1.0):.2f}" for name in classes)
+            data = f"Sent: DETECTION|{parts}\r\nLATENCY:{rng.randint(55, 70)}ms\r\n".encode("utf-8")
+            f.write(RECORD.pack(int(i * 1e9 / fps), len(data)))
+            f.write(data)
+
+
+def replay(path, speed):
+    port = ReplayPort(path, speed=speed, timeout=0.05)
+    decoder = StreamDecoder()
+    lines = 0
+    detections = 0
+    start = time.perf_counter()
+    while True:
+        data = read_available(port)
+        if not data:
+            if port.finished:
+                break
+            continue
+        for kind, payload in decoder.feed(data):
+            lines += 1
+            if kind == "line":
+                parsed = parse_detection_line(payload.decode("utf-8", errors="replace").strip())
+                if parsed:
+                    detections += 1
+            else:
+                detections += 1
+    # The last empty read waits for one timeout; don't count it
+    elapsed = time.perf_counter() - start - port.timeout
+    port.close()
+    return port.bytes_replayed, lines, detections, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a session through the reader pipeline")
+    parser.add_argument("path", nargs="?", help="Session recording (.srec); generated if omitted")
+    parser.add_argument("--speed", type=float, default=0, help="Replay speed factor, 0 = as fast as possible")
+    parser.add_argument("--frames", type=int, default=100000, help="Frames in the generated session")
+    parser.add_argument("--fps", type=float, default=15, help="Frame rate of the generated session")
+    args = parser.parse_args()
+
+    path = args.path
+    temp_dir = None
+    if not path:
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, "synthetic.srec")
+        write_synthetic_session(path, args.frames, args.fps)
+
+    total_bytes, lines, detections, elapsed = replay(path, args.speed)
+    print(f"{total_bytes} bytes, {lines} lines/frames, {detections} detection messages in {elapsed:.3f} s")
+    print(f"{lines / elapsed:,.0f} lines/s, {total_bytes / elapsed / 1e6:.1f} MB/s")
+
+    if temp_dir:
+        temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
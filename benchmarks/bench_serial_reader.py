@@ -0,0 +1,124 @@
+# Benchmark for the serial reader loop of the PC application
+#
+# A writer thread pushes DETECTION-sized lines through a pseudo-terminal at a
+# fixed rate, each stamped with its send time. Two readers are compared:
+#
+#   legacy: poll in_waiting, readline() with a 1 s timeout, sleep 10 ms when idle
+#   bulk:   block in read_available() and split lines with StreamDecoder
+#
+# For each, the per-line latency (send -> line handed to the parser) and the
+# CPU time used by the reader thread are reported. Linux/macOS only (needs a pty).
+#
+# Usage:
+#   python benchmarks/bench_serial_reader.py [--rate 200] [--seconds 5]
+import argparse
+import os
+import sys
+import threading
+import time
+import tty
+
+import serial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from nicla_protocol import StreamDecoder, read_available  # noqa: E402
+
+SERIAL_READ_TIMEOUT = 0.2
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def writer(fd, rate, seconds, stop):
+    """Write timestamped lines at a fixed rate"""
+    period = 1.0 / rate
+    next_time = time.perf_counter()
+    end = next_time + seconds
+    while next_time < end and not stop.is_set():
+        now = time.perf_counter()
+        if now < next_time:
+            time.sleep(next_time - now)
+        line = f"Sent: DETECTION|KitKat:2:0.91|Unibic:1:0.87|T{time.perf_counter_ns()}\r\n"
+        os.write(fd, line.encode("utf-8"))
+        next_time += period
+
+
+def handle_line(line, latencies):
+    received = time.perf_counter_ns()
+    start = line.rfind(b"|T")
+    if start != -1:
+        latencies.append((received - int(line[start + 2:].strip())) / 1e6)
+
+
+def legacy_reader(port, latencies, stop):
+    """The reader loop before this change"""
+    while not stop.is_set():
+        if port.in_waiting:
+            handle_line(port.readline(), latencies)
+        else:
+            time.sleep(0.01)
+
+
+def bulk_reader(port, latencies, stop):
+    """Blocking bulk read + incremental splitter, as in read_serial_data"""
+    decoder = StreamDecoder()
+    while not stop.is_set():
+        data = read_available(port)
+        if not data:
+            continue
+        for kind, payload in decoder.feed(data):
+            if kind == "line":
+                handle_line(payload, latencies)
+
+
+def run(mode, rate, seconds):
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    timeout = 1 if mode == "legacy" else SERIAL_READ_TIMEOUT
+    port = serial.Serial(os.ttyname(slave), 115200, timeout=timeout)
+
+    latencies = []
+    cpu = {}
+    stop = threading.Event()
+
+    def reader():
+        start = time.thread_time()
+        (legacy_reader if mode == "legacy" else bulk_reader)(port, latencies, stop)
+        cpu["seconds"] = time.thread_time() - start
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    writer(master, rate, seconds, stop)
+    time.sleep(0.3)  # Let the reader drain the tail
+    stop.set()
+    reader_thread.join(timeout=2)
+
+    port.close()
+    os.close(master)
+    os.close(slave)
+    return latencies, cpu.get("seconds", float("nan"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the serial reader loop")
+    parser.add_argument("--rate", type=float, default=200, help="Lines per second")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.rate:.0f} lines/s for {args.seconds:.0f} s")
+    print(f"{'reader':<8} {'lines':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'CPU %':>7}")
+    for mode in ("legacy", "bulk"):
+        latencies, cpu_seconds = run(mode, args.rate, args.seconds)
+        wall = args.seconds + 0.3
+        print(f"{mode:<8} {len(latencies):>7} {percentile(latencies, 0.5):8.2f} "
+              f"{percentile(latencies, 0.99):8.2f} {max(latencies, default=float('nan')):8.2f} "
+              f"{100 * cpu_seconds / wall:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Time-to-ready of the PC application (needs a display)
+#
+# Starts src/pc_application/smart_retail_verification_final.py with
+# --exit-when-ready a number of times and reports the time from process start
+# until the main window was shown, as logged by the application, plus the
+# wall time of the whole process. The splash screen closes as soon as the
+# catalog is open, the widgets are built and the serial ports are listed, so
+# this used to be at least the fixed 4 s the splash screen was shown for.
+#
+# Usage:
+#   python benchmarks/bench_startup.py [--runs 10] [--catalog catalog.db]
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application",
+                   "smart_retail_verification_final.py")
+
+READY_LINE = re.compile(r"Ready in (\d+) ms \((.*)\)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the application's time to ready")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--catalog", help="SQLite product catalog to open")
+    args = parser.parse_args()
+
+    command = [sys.executable, APP, "--exit-when-ready", "--no-auto-connect"]
+    if args.catalog:
+        command += ["--catalog", args.catalog]
+
+    ready = []
+    wall = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Keep the user's remembered port out of the measurement
+        env = dict(os.environ, SMART_RETAIL_SETTINGS=os.path.join(temp_dir, "settings.json"))
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            result = subprocess.run(command, capture_output=True, text=True, env=env)
+            wall.append((time.perf_counter() - start) * 1000)
+            match = READY_LINE.search(result.stdout)
+            if result.returncode != 0 or not match:
+                print(f"The application did not report being ready:\n{result.stdout}{result.stderr}")
+                sys.exit(1)
+            ready.append(int(match.group(1)))
+            steps = match.group(2)
+
+    ready.sort()
+    wall.sort()
+    print(f"time to ready: p50 {ready[len(ready) // 2]} ms, max {ready[-1]} ms over {args.runs} runs")
+    print(f"process wall time: p50 {wall[len(wall) // 2]:.0f} ms")
+    print(f"last run: {steps}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Headless verification throughput (src/pc_application/verification_core.py)
+#
+# Runs complete checkout transactions without a display: fill a cart, apply a
+# detection frame, verify, clear. About half of the generated transactions
+# have a miscounted or unbilled item.
+#
+# Then builds one bulk order of --bulk-lines cart lines and times adding,
+# removing, totalling and verifying against it, next to re-summing the
+# formatted Total column the way calculate_total used to.
+#
+# Usage:
+#   python benchmarks/bench_verification.py [--transactions 100000] [--bulk-lines 1000] [--min-rate 5000]
+import argparse
+import os
+from decimal import Decimal
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from detection_parser import Detection  # noqa: E402
+from verification_core import VerificationSession  # noqa: E402
+
+PRICES = {"KitKat": 25.00, "goodday": 25.00, "HidenSeek": 30.00, "Unibic": 30.00,
+          "Apple": 0.00, "Banana": 0.00, "Chips": 0.00, "Water": 0.00}
+
+
+def make_transactions(count, seed=0):
+    """(cart lines, detections, expected match) per transaction"""
+    rng = random.Random(seed)
+    names = list(PRICES)
+    transactions = []
+    for _ in range(count):
+        cart = [(name, rng.randint(1, 4)) for name in rng.sample(names, rng.randint(1, 5))]
+        detections = [Detection(name, quantity, rng.uniform(0.6, 1.0)) for name, quantity in cart]
+        match = rng.random() < 0.5
+        if not match:
+            item, quantity, score = detections[0]
+            detections[0] = Detection(item, quantity + 1, score)
+        transactions.append((cart, detections, match))
+    return transactions
+
+
+def bench_bulk_order(lines, seed=0):
+    """Per-operation cost against a cart of many lines"""
+    rng = random.Random(seed)
+    names = list(PRICES)
+    session = VerificationSession(PRICES)
+    entries = [(rng.choice(names), rng.randint(1, 9)) for _ in range(lines)]
+
+    start = time.perf_counter()
+    added = session.cart.add_many(entries)
+    add_us = (time.perf_counter() - start) / lines * 1e6
+
+    # The old calculate_total: float() of every formatted Total cell
+    cells = [f"{line.total:.2f}" for line in added]
+    start = time.perf_counter()
+    for _ in range(100):
+        legacy_total = sum(float(cell) for cell in cells)
+    legacy_us = (time.perf_counter() - start) / 100 * 1e6
+
+    start = time.perf_counter()
+    for _ in range(100000):
+        total = session.cart.total
+    total_us = (time.perf_counter() - start) / 100000 * 1e6
+
+    session.detections.update([Detection(item, count, 0.9) for item, count in session.cart.quantities.items()])
+    start = time.perf_counter()
+    for _ in range(10000):
+        session.verify()
+    verify_us = (time.perf_counter() - start) / 10000 * 1e6
+
+    removed = rng.sample(added, lines // 10)
+    start = time.perf_counter()
+    for line in removed:
+        session.cart.remove(line.line_id)
+    remove_us = (time.perf_counter() - start) / len(removed) * 1e6
+
+    # The running total must equal an exact recount of the remaining lines
+    expected = sum((line.total for line in session.cart.lines.values()), Decimal("0.00"))
+    ok = session.cart.total == expected and abs(float(total) - legacy_total) < 0.005
+
+    print(f"bulk order of {lines} lines: add {add_us:.2f} us/line, remove {remove_us:.2f} us/line, "
+          f"total {total_us:.3f} us (re-parse {legacy_us:,.0f} us), verify {verify_us:.2f} us")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless cart verification")
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--bulk-lines", type=int, default=1000)
+    parser.add_argument("--min-rate", type=float, default=None,
+                        help="Fail if fewer transactions per second are verified")
+    args = parser.parse_args()
+
+    transactions = make_transactions(args.transactions)
+    session = VerificationSession(PRICES)
+
+    start = time.perf_counter()
+    wrong = 0
+    for cart, detections, match in transactions:
+        for item, quantity in cart:
+            session.cart.add(item, quantity)
+        session.detections.update(detections)
+        if (not session.verify()) != match:
+            wrong += 1
+        session.clear()
+    elapsed = time.perf_counter() - start
+
+    rate = len(transactions) / elapsed
+    print(f"{len(transactions)} transactions in {elapsed:.3f} s, {rate:,.0f} transactions/s")
+    if wrong:
+        print(f"ERROR: {wrong} transactions verified incorrectly")
+        sys.exit(1)
+    if not bench_bulk_order(args.bulk_lines):
+        print("ERROR: running cart total differs from a recount")
+        sys.exit(1)
+    if args.min_rate is not None and rate < args.min_rate:
+        print(f"REGRESSION: {rate:,.0f} transactions/s is below the minimum of {args.min_rate:,.0f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
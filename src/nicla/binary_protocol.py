@@ -0,0 +1,59 @@
+# Compact binary detection frames for the UART link
+#
+# Copy this file next to the detection script. The layout must match
+# src/pc_application/nicla_protocol.py on the PC side:
+#
+#   sync (2) | type (1) | seq (2) | latency_ms (2) | count (1) |
+#   count x [class_id (1) | quantity (1) | score (1)] | crc16 (2)
+#
+# Multi-byte fields are little-endian. The score is quantized to 0..255 and the
+# CRC-16/CCITT-FALSE covers everything between the sync word and the CRC.
+import struct
+
+SYNC = b'\xa5\x5a'
+FRAME_DETECTION = 0x01
+FRAME_HEARTBEAT = 0x02  # Same layout, repeats the last reported state
+
+HEADER_FORMAT = "<BHHB"
+
+
+def _make_crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC_TABLE = _make_crc_table()
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE of a bytes-like object"""
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[((crc >> 8) ^ byte) & 0xFF]
+    return crc
+
+
+def encode_detection_frame(seq, latency_ms, entries, frame_type=FRAME_DETECTION):
+    """
+    Build one detection frame.
+
+    Args:
+        seq: Frame sequence number (wraps at 65536)
+        latency_ms: Processing time of this frame in milliseconds
+        entries: List of (class_id, quantity, score) tuples
+        frame_type: FRAME_DETECTION or FRAME_HEARTBEAT
+
+    Returns:
+        bytes ready for uart.write()
+    """
+    body = bytearray(struct.pack(HEADER_FORMAT, frame_type, seq & 0xFFFF,
+                                 min(max(int(latency_ms), 0), 0xFFFF), len(entries)))
+    for class_id, quantity, score in entries:
+        body.append(class_id & 0xFF)
+        body.append(min(quantity, 255))
+        body.append(min(max(int(score * 255 + 0.5), 0), 255))
+    return SYNC + bytes(body) + struct.pack("<H", crc16(body))
@@ -0,0 +1,99 @@
+# Class-aware merging of nearby FOMO detections
+#
+# Kept in its own module so the same code runs on the Nicla Vision (copy this
+# file next to the detection script) and on a PC for benchmarking.
+
+# Define distance thresholds for each class
+class_distance_thresholds = {
+    # Format: 'class_name': threshold_in_pixels
+    'Unibic': 80,
+    'KitKat': 40,
+    'goodday': 80,
+    'HidenSeek': 80,
+    'bird': 20,
+}
+
+# Default threshold to use when a class is not in the dictionary
+DEFAULT_DISTANCE_THRESHOLD = 30
+
+# Grid cells are keyed by a single int (cell_x * stride + cell_y) so lookups
+# don't allocate a tuple. The stride only has to exceed the number of rows.
+_CELL_KEY_STRIDE = 1 << 16
+_NEIGHBOUR_OFFSETS = tuple(
+    [0] + [dx * _CELL_KEY_STRIDE + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+)
+
+
+def merge_nearby_detections(detection_list, label, distance_threshold=None):
+    """
+    Merge nearby detections of the same class based on distance between centers.
+
+    Detections are visited from highest to lowest score. A detection is kept
+    unless a kept detection with a higher score has its center closer than the
+    class threshold. Kept centers are bucketed in a grid of threshold-sized
+    cells, so only the 3x3 cells around a center have to be checked.
+
+    Args:
+        detection_list: List of detections in format [((x,y,w,h), score), ...]
+        label: The class label string to determine appropriate distance threshold
+        distance_threshold: Use this threshold instead of the class's, e.g.
+            when sweeping thresholds offline
+
+    Returns:
+        List of merged detections
+    """
+    if not detection_list:
+        return []
+
+    # Get the appropriate distance threshold for this class
+    if distance_threshold is None:
+        distance_threshold = class_distance_thresholds.get(label, DEFAULT_DISTANCE_THRESHOLD)
+
+    # Sort detections by score (highest first)
+    detection_list.sort(key=lambda x: x[1], reverse=True)
+
+    # Nothing can be closer than a non-positive threshold
+    if distance_threshold <= 0:
+        return list(detection_list)
+
+    threshold_sq = distance_threshold * distance_threshold
+    cell_size = distance_threshold
+
+    merged_detections = []
+    # Cell key -> flat list of kept centers [x0, y0, x1, y1, ...]
+    grid = {}
+
+    for detection in detection_list:
+        (x, y, w, h), _ = detection
+        center_x = x + w//2
+        center_y = y + h//2
+        cell = (center_x // cell_size) * _CELL_KEY_STRIDE + center_y // cell_size
+
+        # A kept center within the threshold can only be in one of the 3x3
+        # neighbouring cells. The own cell is the most likely one, so it goes first.
+        suppressed = False
+        for offset in _NEIGHBOUR_OFFSETS:
+            centers = grid.get(cell + offset)
+            if centers is None:
+                continue
+            for k in range(0, len(centers), 2):
+                dx = centers[k] - center_x
+                dy = centers[k + 1] - center_y
+                if dx*dx + dy*dy < threshold_sq:
+                    suppressed = True
+                    break
+            if suppressed:
+                break
+
+        if suppressed:
+            continue
+
+        merged_detections.append(detection)
+        centers = grid.get(cell)
+        if centers is None:
+            grid[cell] = [center_x, center_y]
+        else:
+            centers.append(center_x)
+            centers.append(center_y)
+
+    return merged_detections
@@ -1,310 +1,606 @@
-# Edge Impulse - OpenMV FOMO Object Detection Example with Serial Communication
-#
-# This work is licensed under the MIT license.
-# Copyright (c) 2013-2024 OpenMV LLC. All rights reserved.
-# https://github.com/openmv/openmv/blob/master/LICENSE
-import sensor
-import time
-import ml
-from ml.utils import NMS
-import math
-import image
-import pyb  # For UART communication
-
-# Set up UART for communication (using configuration from nicla_main.py)
-uart = pyb.UART(1, 115200)
-uart.init(115200, bits=8, parity=None, stop=1)
-
-# Configure LED for visual feedback
-led = pyb.LED(1)  # Usually red LED
-led2 = pyb.LED(3) if hasattr(pyb.LED, '3') else None  # Green LED if available
-
-sensor.reset()  # Reset and initialize the sensor.
-sensor.set_pixformat(sensor.RGB565)  # Set pixel format to RGB565 (or GRAYSCALE)
-sensor.set_framesize(sensor.QVGA)  # Set frame size to QVGA (320x240)
-sensor.skip_frames(time=2000)  # Let the camera adjust.
-
-# Default parameters (can be modified via commands from PC)
-min_confidence = 0.6
-delay_ms = 1000
-is_running = True
-
-threshold_list = [(math.ceil(min_confidence * 255), 255)]
-
-# Load built-in model
-model = ml.Model("trained")
-print(model)
-
-colors = [  # Add more colors if you are detecting more than 7 types of classes at once.
-    (255, 0, 0),
-    (0, 255, 0),
-    (255, 255, 0),
-    (0, 0, 255),
-    (255, 0, 255),
-    (0, 255, 255),
-    (255, 255, 255),
-]
-
-# Define distance thresholds for each class
-class_distance_thresholds = {
-    # Format: 'class_name': threshold_in_pixels
-    'Unibic': 80,
-    'KitKat': 40,
-    'goodday': 80,
-    'HidenSeek': 80,
-    'bird': 20,
-}
-
-# Default threshold to use when a class is not in the dictionary
-DEFAULT_DISTANCE_THRESHOLD = 30
-
-# FOMO outputs an image per class where each pixel in the image is the centroid of the trained
-# object. So, we will get those output images and then run find_blobs() on them to extract the
-# centroids. We will also run get_stats() on the detected blobs to determine their score.
-def fomo_post_process(model, inputs, outputs):
-    n, oh, ow, oc = model.output_shape[0]
-    # Create NMS without custom parameters as they're not supported in this version
-    nms = NMS(ow, oh, inputs[0].roi)
-
-    for i in range(oc):
-        img = image.Image(outputs[0][0, :, :, i] * 255)
-        blobs = img.find_blobs(
-            threshold_list, x_stride=1, area_threshold=1, pixels_threshold=1, merge=True
-        )
-
-        for b in blobs:
-            rect = b.rect()
-            x, y, w, h = rect
-            score = (
-                img.get_statistics(thresholds=threshold_list, roi=rect).l_mean() / 255.0
-            )
-            nms.add_bounding_box(x, y, x + w, y + h, score, i)
-
-    return nms.get_bounding_boxes()
-
-def merge_nearby_detections(detection_list, label):
-    """
-    Merge nearby detections of the same class based on distance between centers.
-
-    Args:
-        detection_list: List of detections in format [((x,y,w,h), score), ...]
-        label: The class label string to determine appropriate distance threshold
-
-    Returns:
-        List of merged detections
-    """
-    if not detection_list:
-        return []
-
-    # Get the appropriate distance threshold for this class
-    distance_threshold = class_distance_thresholds.get(label, DEFAULT_DISTANCE_THRESHOLD)
-
-    # Sort detections by score (highest first)
-    detection_list.sort(key=lambda x: x[1], reverse=True)
-
-    merged_detections = []
-    used_indices = set()
-
-    for i, ((x1, y1, w1, h1), score1) in enumerate(detection_list):
-        if i in used_indices:
-            continue
-
-        center_x1 = x1 + w1//2
-        center_y1 = y1 + h1//2
-        current_rect = (x1, y1, w1, h1)
-        current_score = score1
-        merged_count = 1
-
-        # Find all nearby detections
-        for j, ((x2, y2, w2, h2), score2) in enumerate(detection_list):
-            if j == i or j in used_indices:
-                continue
-
-            center_x2 = x2 + w2//2
-            center_y2 = y2 + h2//2
-
-            # Calculate distance between centers
-            distance = math.sqrt((center_x1 - center_x2)**2 + (center_y1 - center_y2)**2)
-
-            # If close enough, merge them
-            if distance < distance_threshold:
-                used_indices.add(j)
-                merged_count += 1
-
-        # Only add if not merged with others (or it's the primary one)
-        if merged_count <= 1 or i not in used_indices:
-            merged_detections.append((current_rect, current_score))
-
-    return merged_detections
-
-# Function to process serial commands from the PC
-def process_commands():
-    if uart.any():
-        cmd = uart.readline().decode('utf-8').strip()
-        global min_confidence, delay_ms, is_running, threshold_list
-
-        if cmd == "start":
-            is_running = True
-            uart.write("Detection started\r\n".encode('utf-8'))
-        elif cmd == "stop":
-            is_running = False
-            uart.write("Detection stopped\r\n".encode('utf-8'))
-        elif cmd.startswith("conf="):
-            try:
-                min_confidence = float(cmd.split("=")[1])
-                threshold_list = [(math.ceil(min_confidence * 255), 255)]
-                uart.write(f"Confidence set to {min_confidence}\r\n".encode('utf-8'))
-            except:
-                uart.write("Invalid confidence value\r\n".encode('utf-8'))
-        elif cmd.startswith("delay="):
-            try:
-                delay_ms = int(cmd.split("=")[1])
-                uart.write(f"Delay set to {delay_ms}ms\r\n".encode('utf-8'))
-            except:
-                uart.write("Invalid delay value\r\n".encode('utf-8'))
-        elif cmd == "status":
-            status = "Running" if is_running else "Stopped"
-            uart.write(f"Status: {status}, Confidence: {min_confidence}, Delay: {delay_ms}ms\r\n".encode('utf-8'))
-        else:
-            uart.write(f"Unknown command: {cmd}\r\n".encode('utf-8'))
-
-# New function to send detections in the format from nicla_main.py
-def send_detection_nicla_format(detections_by_class):
-    if not detections_by_class:
-        return
-
-    # Start building the detection message
-    message = "DETECTION"
-
-    # For each class and its detections
-    for class_label, detections in detections_by_class.items():
-        # Use the highest confidence detection for this class
-        if not detections:
-            continue
-
-        # Sort by confidence (highest first)
-        detections.sort(key=lambda x: x[1], reverse=True)
-        highest_conf_detection = detections[0]
-        _, score = highest_conf_detection
-
-        # Add the item with format: |ItemName:Quantity:Confidence
-        quantity = len(detections)  # Use the count of detections as quantity
-        message += f"|{class_label}:{quantity}:{score:.2f}"
-
-    # Send the message
-    uart.write(f"{message}\r\n".encode('utf-8'))
-    print(f"Sent: {message}")
-
-# Function to print detection summary to terminal
-def print_detection_summary(detections_by_class):
-    if not detections_by_class:
-        print("No objects detected")
-        return
-
-    print("\n----- DETECTION SUMMARY -----")
-
-    # Count detections per class and track highest confidence
-    for class_label, detections in detections_by_class.items():
-        count = len(detections)
-        highest_confidence = max([score for (_, score) in detections]) if detections else 0
-
-        print(f"Object: {class_label}")
-        print(f"  Quantity: {count}")
-        print(f"  Confidence: {highest_confidence:.4f} ({int(highest_confidence * 100)}%)")
-
-    print("----------------------------\n")
-
-# Blink LED pattern to indicate script has started
-for i in range(3):
-    led.toggle()
-    time.sleep(0.2)
-    if led2:
-        led2.toggle()
-        time.sleep(0.2)
-
-# Indicate ready
-if led2:
-    led2.on()
-
-clock = time.clock()
-uart.write("Object detection system ready\r\n".encode('utf-8'))
-print("Object detection system ready")
-
-while True:
-    # Process any incoming commands
-    process_commands()
-
-    # Skip detection if not running
-    if not is_running:
-        time.sleep_ms(100)  # Small delay to prevent high CPU usage when idle
-        continue
-
-    # Flash LED for detection activity
-    led.on()
-
-    clock.tick()
-    img = sensor.snapshot()
-
-    # Start measuring processing time for object detection
-    start_time = time.ticks_ms()
-
-    # Create a dictionary to store detections by class
-    all_detections = {}
-
-    for i, detection_list in enumerate(model.predict([img], callback=fomo_post_process)):
-        if i == 0:
-            continue  # background class
-        if len(detection_list) == 0:
-            continue  # no detections for this class?
-
-        class_label = model.labels[i]
-
-        # Apply our custom merging with class-specific threshold
-        filtered_detections = merge_nearby_detections(detection_list, class_label)
-        all_detections[class_label] = filtered_detections
-
-        # Draw the detections on the image (keep your existing drawing code)
-        for (x, y, w, h), score in filtered_detections:
-            center_x = math.floor(x + (w / 2))
-            center_y = math.floor(y + (h / 2))
-
-            # Draw a square instead of circle
-            square_size = 24
-            img.draw_rectangle(
-                (center_x - square_size // 2, center_y - square_size // 2, square_size, square_size),
-                color=colors[i],
-                thickness=2
-            )
-
-            # Draw class name
-            img.draw_string(center_x - 20, center_y - 30, class_label, color=colors[i], scale=1.5)
-
-    # End measuring processing time
-    end_time = time.ticks_ms()
-    processing_time = time.ticks_diff(end_time, start_time)
-
-    # Print detection summary to terminal
-    print_detection_summary(all_detections)
-
-    # Print the processing latency
-    print("Detection latency: {} ms".format(processing_time))
-
-    # Send detections in the nicla_main.py format
-    send_detection_nicla_format(all_detections)
-
-    # Send the latency over UART
-    uart.write(f"LATENCY:{processing_time}ms\r\n".encode('utf-8'))
-
-    # Also print FPS to terminal
-    print("{} fps".format(clock.fps()))
-
-    # Visual feedback based on number of detections
-    num_detected = sum(len(detections) for detections in all_detections.values())
-    for i in range(num_detected):
-        led.toggle()
-        time.sleep(0.1)
-
-    led.off()
-
-    # Wait according to the configured delay
-    time.sleep_ms(delay_ms)
+# Edge Impulse - OpenMV FOMO Object Detection Example with Serial Communication
+#
+# This work is licensed under the MIT license.
+# Copyright (c) 2013-2024 OpenMV LLC. All rights reserved.
+# https://github.com/openmv/openmv/blob/master/LICENSE
+import sensor
+import time
+import ml
+from ml.utils import NMS
+import math
+import image
+import pyb  # For UART communication
+from detection_merge import merge_nearby_detections  # Copy detection_merge.py to the device too
+from binary_protocol import encode_detection_frame, FRAME_DETECTION, FRAME_HEARTBEAT  # Copy binary_protocol.py to the device too
+
+# Hardware abstraction: the rest of the script reaches the board only through
+# sensor, ml, image, pyb and the timing helpers below, and nothing touches the
+# hardware until init() runs. On a PC, src/tools/nicla_harness.py imports this
+# script with stand-in modules and drives run_once() itself.
+if hasattr(time, "ticks_ms"):
+    ticks_ms = time.ticks_ms
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+    ticks_add = time.ticks_add
+    sleep_ms = time.sleep_ms
+    new_clock = time.clock
+else:
+    # CPython: equivalents on top of the standard time module
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(end, start):
+        return end - start
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+    class Clock:
+        def __init__(self):
+            self.last = None
+            self.frame_time = 0
+
+        def tick(self):
+            now = time.monotonic()
+            if self.last is not None:
+                self.frame_time = now - self.last
+            self.last = now
+
+        def fps(self):
+            return 1 / self.frame_time if self.frame_time else 0.0
+
+    new_clock = Clock
+
+# Set by init()
+uart = None
+led = None
+led2 = None
+model = None
+label_ids = {}
+clock = None
+
+# Default parameters (can be modified via commands from PC)
+min_confidence = 0.6
+delay_ms = 1000  # Target time between the starts of two frames ("delay=" or "fps=")
+is_running = True
+use_binary_frames = False  # Negotiated by the PC with "proto=bin"
+frame_seq = 0  # Sequence number of the next report, in both formats
+
+# Cooperative scheduling: the loop never sleeps longer than COMMAND_POLL_MS, so
+# commands are answered and the LED is updated while waiting for the next frame
+COMMAND_POLL_MS = 10
+BLINK_MS = 100  # LED toggle interval, one toggle per detected object
+next_frame_at = None  # ticks_ms() at which the next frame is due, None for now
+led_deadline = None  # ticks_ms() of the next LED change, None when idle
+blinks_left = 0
+
+# Scene-change gating: a frame only goes through the model when its signature
+# (mean brightness of a SCENE_GRID of cells) differs from that of the last
+# inferred frame by at least scene_threshold levels on average, or when the
+# last inference is older than SCENE_REFRESH_MS. Otherwise the cached result is
+# reported again. Set with "scene=<levels>"; "scene=0" runs every frame.
+SCENE_GRID = (8, 6)
+SCENE_REFRESH_MS = 5000
+scene_threshold = 2.0
+scene_signature = None  # Signature of the last inferred frame, None to force inference
+scene_inferred_at = 0
+scene_detections = {}
+inference_skipped = 0
+
+# Change-only reporting ("report=change"): a frame's detections are only sent
+# when the per-class counts differ from the last report and the new counts
+# were seen on REPORT_HYSTERESIS consecutive frames, so a one-frame flicker is
+# not sent. When nothing was sent for HEARTBEAT_MS, a HEARTBEAT repeating the
+# last report is sent so the PC knows the device is alive.
+REPORT_HYSTERESIS = 2
+HEARTBEAT_MS = 2000
+report_changes_only = False
+reported_counts = None  # {class_label: quantity} of the last report, None to report the next frame
+reported_detections = {}
+pending_counts = None  # Counts waiting to be seen REPORT_HYSTERESIS times
+pending_frames = 0
+last_report_at = 0
+
+# Per-frame stage durations in microseconds. With "timing=on" they are sent
+# after each report as
+#   TIMING|<seq>|capture=<us>|scene=<us>|inference=<us>|postprocess=<us>|merge=<us>|uart=<us>
+# where seq is the report's sequence number (the binary frame's seq), so the
+# PC can line them up with its own receive, parse and render times.
+TIMING_STAGES = ("capture", "scene", "inference", "postprocess", "merge", "uart")
+timing_enabled = False
+stage_us = {}
+
+threshold_list = [(math.ceil(min_confidence * 255), 255)]
+
+colors = [  # Add more colors if you are detecting more than 7 types of classes at once.
+    (255, 0, 0),
+    (0, 255, 0),
+    (255, 255, 0),
+    (0, 0, 255),
+    (255, 0, 255),
+    (0, 255, 255),
+    (255, 255, 255),
+]
+
+def init_uart():
+    # Set up UART for communication (using configuration from nicla_main.py)
+    port = pyb.UART(1, 115200)
+    port.init(115200, bits=8, parity=None, stop=1)
+    return port
+
+def init_leds():
+    # Configure LED for visual feedback
+    red = pyb.LED(1)  # Usually red LED
+    green = pyb.LED(3) if hasattr(pyb.LED, '3') else None  # Green LED if available
+    return red, green
+
+def init_sensor():
+    sensor.reset()  # Reset and initialize the sensor.
+    sensor.set_pixformat(sensor.RGB565)  # Set pixel format to RGB565 (or GRAYSCALE)
+    sensor.set_framesize(sensor.QVGA)  # Set frame size to QVGA (320x240)
+    sensor.skip_frames(time=2000)  # Let the camera adjust.
+
+def init():
+    global uart, led, led2, model, label_ids, clock
+
+    uart = init_uart()
+    led, led2 = init_leds()
+    init_sensor()
+
+    # Load built-in model
+    model = ml.Model("trained")
+    print(model)
+
+    # Class IDs sent in binary frames are indices into model.labels
+    label_ids = {label: i for i, label in enumerate(model.labels)}
+
+    clock = new_clock()
+
+# FOMO outputs an image per class where each pixel in the image is the centroid of the trained
+# object. So, we will get those output images and then run find_blobs() on them to extract the
+# centroids. We will also run get_stats() on the detected blobs to determine their score.
+def fomo_post_process(model, inputs, outputs):
+    start = ticks_us()
+    n, oh, ow, oc = model.output_shape[0]
+    # Create NMS without custom parameters as they're not supported in this version
+    nms = NMS(ow, oh, inputs[0].roi)
+
+    for i in range(oc):
+        img = image.Image(outputs[0][0, :, :, i] * 255)
+        blobs = img.find_blobs(
+            threshold_list, x_stride=1, area_threshold=1, pixels_threshold=1, merge=True
+        )
+
+        for b in blobs:
+            rect = b.rect()
+            x, y, w, h = rect
+            score = (
+                img.get_statistics(thresholds=threshold_list, roi=rect).l_mean() / 255.0
+            )
+            nms.add_bounding_box(x, y, x + w, y + h, score, i)
+
+    boxes = nms.get_bounding_boxes()
+    stage_us["postprocess"] = ticks_diff(ticks_us(), start)
+    return boxes
+
+# Function to process serial commands from the PC. A command may start with a
+# correlation tag, "#<id> <command>"; the reply is then sent as "#<id> <reply>",
+# so the PC can have several commands in flight and match each reply to its
+# command. Untagged commands are answered as they always were. Up to
+# MAX_COMMANDS_PER_POLL commands are handled per poll, so a batch sent at once
+# is answered within one poll.
+MAX_COMMANDS_PER_POLL = 8
+
+def process_commands():
+    handled = 0
+    while uart.any() and handled < MAX_COMMANDS_PER_POLL:
+        cmd = uart.readline().decode('utf-8').strip()
+        handled += 1
+        tag = ""
+        if cmd.startswith("#"):
+            parts = cmd.split(" ", 1)
+            tag = parts[0] + " "
+            cmd = parts[1].strip() if len(parts) > 1 else ""
+        uart.write(f"{tag}{execute_command(cmd)}\r\n".encode('utf-8'))
+
+# Apply one command and return the reply line (without the line ending)
+def execute_command(cmd):
+    global min_confidence, delay_ms, is_running, threshold_list, use_binary_frames, next_frame_at
+    global scene_threshold, scene_signature, report_changes_only, reported_counts, timing_enabled
+
+    if cmd == "start":
+        is_running = True
+        return "Detection started"
+    elif cmd == "stop":
+        is_running = False
+        return "Detection stopped"
+    elif cmd.startswith("conf="):
+        try:
+            min_confidence = float(cmd.split("=")[1])
+            threshold_list = [(math.ceil(min_confidence * 255), 255)]
+            scene_signature = None  # Cached detections used the old threshold
+            return f"Confidence set to {min_confidence}"
+        except:
+            return "Invalid confidence value"
+    elif cmd.startswith("delay="):
+        try:
+            delay_ms = int(cmd.split("=")[1])
+            next_frame_at = None  # Apply the new rate from the next pass
+            return f"Delay set to {delay_ms}ms"
+        except:
+            return "Invalid delay value"
+    elif cmd.startswith("fps="):
+        # Frame rate target; fps=0 runs frames back to back
+        try:
+            fps = float(cmd.split("=")[1])
+            delay_ms = int(round(1000 / fps)) if fps > 0 else 0
+            next_frame_at = None
+            return f"Delay set to {delay_ms}ms"
+        except:
+            return "Invalid fps value"
+    elif cmd.startswith("scene="):
+        try:
+            scene_threshold = float(cmd.split("=")[1])
+            scene_signature = None
+            return f"Scene threshold set to {scene_threshold}"
+        except:
+            return "Invalid scene value"
+    elif cmd == "report=change":
+        # Reply with the heartbeat interval so the PC knows how long silence is normal
+        report_changes_only = True
+        reported_counts = None
+        return f"REPORT|change|{HEARTBEAT_MS}"
+    elif cmd == "report=every":
+        report_changes_only = False
+        return "REPORT|every"
+    elif cmd == "timing=on":
+        timing_enabled = True
+        return "Timing on"
+    elif cmd == "timing=off":
+        timing_enabled = False
+        return "Timing off"
+    elif cmd == "proto=bin":
+        # Reply with the labels so the PC can map class IDs back to names
+        use_binary_frames = True
+        return f"PROTO|bin|{','.join(model.labels)}"
+    elif cmd == "proto=text":
+        use_binary_frames = False
+        return "PROTO|text"
+    elif cmd == "status":
+        status = "Running" if is_running else "Stopped"
+        protocol = "bin" if use_binary_frames else "text"
+        report = "change" if report_changes_only else "every"
+        return (
+            f"Status: {status}, Confidence: {min_confidence}, Delay: {delay_ms}ms, "
+            f"Protocol: {protocol}, Scene: {scene_threshold}, Report: {report}"
+        )
+    else:
+        return f"Unknown command: {cmd}"
+
+# New function to send detections in the format from nicla_main.py. kind is
+# "DETECTION" or "HEARTBEAT"; with send_empty an empty result is sent as
+# "DETECTION|" so the PC clears its list.
+def send_detection_nicla_format(detections_by_class, kind="DETECTION", send_empty=False):
+    if not detections_by_class and not send_empty:
+        return
+
+    # Start building the detection message
+    message = kind
+
+    # For each class and its detections
+    for class_label, detections in detections_by_class.items():
+        # Use the highest confidence detection for this class
+        if not detections:
+            continue
+
+        # Sort by confidence (highest first)
+        detections.sort(key=lambda x: x[1], reverse=True)
+        highest_conf_detection = detections[0]
+        _, score = highest_conf_detection
+
+        # Add the item with format: |ItemName:Quantity:Confidence
+        quantity = len(detections)  # Use the count of detections as quantity
+        message += f"|{class_label}:{quantity}:{score:.2f}"
+
+    if message == kind:
+        message += "|"
+
+    # Send the message
+    uart.write(f"{message}\r\n".encode('utf-8'))
+    print(f"Sent: {message}")
+
+# Send detections as one binary frame (see binary_protocol.py). Unlike the text
+# format, a frame is sent even when nothing was detected so the PC can clear its
+# list and notice dropped frames from gaps in the sequence number.
+def send_detection_binary(detections_by_class, processing_time, frame_type=FRAME_DETECTION):
+    entries = []
+    for class_label, detections in detections_by_class.items():
+        if not detections:
+            continue
+        score = max(score for (_, score) in detections)
+        entries.append((label_ids[class_label], len(detections), score))
+
+    uart.write(encode_detection_frame(frame_seq, processing_time, entries, frame_type))
+    print(f"Sent: frame {frame_seq} with {len(entries)} classes")
+
+# Function to print detection summary to terminal
+def print_detection_summary(detections_by_class):
+    if not detections_by_class:
+        print("No objects detected")
+        return
+
+    print("\n----- DETECTION SUMMARY -----")
+
+    # Count detections per class and track highest confidence
+    for class_label, detections in detections_by_class.items():
+        count = len(detections)
+        highest_confidence = max([score for (_, score) in detections]) if detections else 0
+
+        print(f"Object: {class_label}")
+        print(f"  Quantity: {count}")
+        print(f"  Confidence: {highest_confidence:.4f} ({int(highest_confidence * 100)}%)")
+
+    print("----------------------------\n")
+
+# Run the model on one snapshot and merge nearby detections per class.
+# Returns {class_label: [((x, y, w, h), score), ...]}.
+def detect_objects(img):
+    all_detections = {}
+
+    # fomo_post_process() runs inside predict() and times itself
+    start = ticks_us()
+    stage_us["postprocess"] = 0
+    results = model.predict([img], callback=fomo_post_process)
+    stage_us["inference"] = ticks_diff(ticks_us(), start) - stage_us["postprocess"]
+
+    start = ticks_us()
+    for i, detection_list in enumerate(results):
+        if i == 0:
+            continue  # background class
+        if len(detection_list) == 0:
+            continue  # no detections for this class?
+
+        class_label = model.labels[i]
+
+        # Apply our custom merging with class-specific threshold
+        all_detections[class_label] = merge_nearby_detections(detection_list, class_label)
+
+    stage_us["merge"] = ticks_diff(ticks_us(), start)
+    return all_detections
+
+# Draw the detections on the image
+def draw_detections(img, all_detections):
+    for class_label, detections in all_detections.items():
+        color = colors[label_ids[class_label] % len(colors)]
+        for (x, y, w, h), score in detections:
+            center_x = math.floor(x + (w / 2))
+            center_y = math.floor(y + (h / 2))
+
+            # Draw a square instead of circle
+            square_size = 24
+            img.draw_rectangle(
+                (center_x - square_size // 2, center_y - square_size // 2, square_size, square_size),
+                color=color,
+                thickness=2
+            )
+
+            # Draw class name
+            img.draw_string(center_x - 20, center_y - 30, class_label, color=color, scale=1.5)
+
+# Cheap signature of a snapshot for scene-change gating
+def compute_scene_signature(img):
+    columns, rows = SCENE_GRID
+    cell_w = img.width() // columns
+    cell_h = img.height() // rows
+    return [img.get_statistics(roi=(x * cell_w, y * cell_h, cell_w, cell_h)).l_mean()
+            for y in range(rows) for x in range(columns)]
+
+# Whether a frame with this signature needs inference (see SCENE_GRID)
+def scene_changed(signature, now):
+    if scene_signature is None or ticks_diff(now, scene_inferred_at) >= SCENE_REFRESH_MS:
+        return True
+    difference = sum(abs(a - b) for a, b in zip(signature, scene_signature))
+    return difference >= scene_threshold * len(signature)
+
+# Detections for this snapshot: from the model when the scene changed, or
+# the cached ones from the last inferred frame
+def detect_if_changed(img, now):
+    global scene_signature, scene_inferred_at, scene_detections, inference_skipped
+
+    if scene_threshold <= 0:
+        scene_signature = None
+        return detect_objects(img)
+
+    start = ticks_us()
+    signature = compute_scene_signature(img)
+    stage_us["scene"] = ticks_diff(ticks_us(), start)
+    if not scene_changed(signature, now):
+        inference_skipped += 1
+        return scene_detections
+
+    scene_detections = detect_objects(img)
+    scene_signature = signature
+    scene_inferred_at = now
+    return scene_detections
+
+# In change-only mode: "DETECTION" when this frame's counts are to be
+# reported, "HEARTBEAT" when the last report is due to be repeated, else None
+def report_kind(all_detections, now):
+    global reported_counts, pending_counts, pending_frames
+
+    counts = {label: len(detections) for label, detections in all_detections.items() if detections}
+    if counts == reported_counts:
+        pending_counts = None
+        pending_frames = 0
+    elif counts == pending_counts:
+        pending_frames += 1
+    else:
+        pending_counts = counts
+        pending_frames = 1
+
+    if pending_counts is not None and (reported_counts is None or pending_frames >= REPORT_HYSTERESIS):
+        reported_counts = pending_counts
+        pending_counts = None
+        pending_frames = 0
+        return "DETECTION"
+    if ticks_diff(now, last_report_at) >= HEARTBEAT_MS:
+        return "HEARTBEAT"
+    return None
+
+# Send one frame's detections and latency to the PC in the negotiated format
+# (and the stage timings when enabled)
+def report_detections(all_detections, processing_time):
+    global reported_detections, last_report_at, frame_seq
+
+    # Print detection summary to terminal
+    print_detection_summary(all_detections)
+
+    # Print the processing latency
+    print("Detection latency: {} ms".format(processing_time))
+
+    kind = "DETECTION"
+    if report_changes_only:
+        now = ticks_ms()
+        kind = report_kind(all_detections, now)
+        if kind is None:
+            return
+        if kind == "DETECTION":
+            reported_detections = all_detections
+        else:
+            all_detections = reported_detections
+        last_report_at = now
+
+    start = ticks_us()
+    if use_binary_frames:
+        # The frame carries the latency, no separate LATENCY line needed
+        frame_type = FRAME_HEARTBEAT if kind == "HEARTBEAT" else FRAME_DETECTION
+        send_detection_binary(all_detections, processing_time, frame_type)
+    else:
+        # Send detections in the nicla_main.py format; in change-only mode an
+        # empty result is a change too
+        send_detection_nicla_format(all_detections, kind, report_changes_only)
+
+        # Send the latency over UART
+        uart.write(f"LATENCY:{processing_time}ms\r\n".encode('utf-8'))
+    stage_us["uart"] = ticks_diff(ticks_us(), start)
+
+    if timing_enabled:
+        fields = "".join(f"|{stage}={stage_us.get(stage, 0)}" for stage in TIMING_STAGES)
+        uart.write(f"TIMING|{frame_seq}{fields}\r\n".encode('utf-8'))
+    frame_seq = (frame_seq + 1) & 0xFFFF
+
+# LED feedback without blocking: the LED is lit while a frame is processed,
+# then toggled once per detected object every BLINK_MS and switched off.
+# update_leds() applies the changes that are due; a new frame restarts it.
+def start_blinks(count, now):
+    global blinks_left, led_deadline
+    blinks_left = count
+    led_deadline = now
+
+def update_leds(now):
+    global blinks_left, led_deadline
+    if led_deadline is None or ticks_diff(now, led_deadline) < 0:
+        return
+    if blinks_left > 0:
+        led.toggle()
+        blinks_left -= 1
+        led_deadline = ticks_add(led_deadline, BLINK_MS)
+    else:
+        led.off()
+        led_deadline = None
+
+# Answer commands and update the LED; called between the stages of a frame
+def poll():
+    process_commands()
+    update_leds(ticks_ms())
+
+# Sleep until deadline, the next LED change or COMMAND_POLL_MS, whichever is first
+def idle_until(deadline, now):
+    wait = COMMAND_POLL_MS
+    if deadline is not None:
+        wait = min(wait, ticks_diff(deadline, now))
+    if led_deadline is not None:
+        wait = min(wait, ticks_diff(led_deadline, now))
+    if wait > 0:
+        sleep_ms(wait)
+
+# One pass of the main loop: poll commands and the LED, and run a frame when
+# one is due. Returns True if a frame was processed. Frames start every
+# delay_ms (or back to back when processing takes longer), however many
+# objects are on the tray.
+def run_once():
+    global next_frame_at, led_deadline
+
+    poll()
+    now = ticks_ms()
+
+    # Skip detection if not running
+    if not is_running:
+        idle_until(None, now)
+        return False
+
+    if next_frame_at is not None and ticks_diff(next_frame_at, now) > 0:
+        idle_until(next_frame_at, now)
+        return False
+
+    # Flash LED for detection activity, cutting short the previous frame's blinks
+    led_deadline = None
+    led.on()
+
+    clock.tick()
+    stage_us.clear()
+    start = ticks_us()
+    img = sensor.snapshot()
+    stage_us["capture"] = ticks_diff(ticks_us(), start)
+
+    # Start measuring processing time for object detection
+    start_time = ticks_ms()
+    next_frame_at = ticks_add(start_time, delay_ms)
+
+    all_detections = detect_if_changed(img, start_time)
+    draw_detections(img, all_detections)
+
+    # End measuring processing time
+    end_time = ticks_ms()
+    processing_time = ticks_diff(end_time, start_time)
+
+    poll()
+    report_detections(all_detections, processing_time)
+
+    # Also print FPS to terminal
+    print("{} fps".format(clock.fps()))
+
+    # Visual feedback based on number of detections
+    num_detected = sum(len(detections) for detections in all_detections.values())
+    start_blinks(num_detected, ticks_ms())
+    return True
+
+def main():
+    init()
+
+    # Blink LED pattern to indicate script has started
+    for i in range(3):
+        led.toggle()
+        sleep_ms(200)
+        if led2:
+            led2.toggle()
+            sleep_ms(200)
+
+    # Indicate ready
+    if led2:
+        led2.on()
+
+    uart.write("Object detection system ready\r\n".encode('utf-8'))
+    print("Object detection system ready")
+
+    while True:
+        run_once()
+
+if __name__ == "__main__":
+    main()
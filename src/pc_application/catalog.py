@@ -0,0 +1,255 @@
+# Product catalog of the Smart Retail Verification System
+#
+# Kept out of the GUI module so headless tools (lane_manager.py, benchmarks)
+# can load it without importing tkinter.
+#
+# Large catalogs live in an SQLite file (set SMART_RETAIL_CATALOG or pass
+# --catalog) that is queried on demand through indexes, so opening it and
+# looking items up take the same time for 10 or 100k+ SKUs. Without a file the
+# built-in product_catalog below is used. Build a catalog file from a CSV with
+#
+#   python catalog.py build catalog.db --csv products.csv
+#
+# where the CSV has the columns sku,name,price[,label[,aliases]]; label is the
+# class label the Nicla Vision reports for the product and aliases is a
+# ";"-separated list of other names to find it by.
+import argparse
+import csv
+import os
+import random
+import sqlite3
+from collections import namedtuple
+from decimal import Decimal
+
+# Define the product catalog with prices
+product_catalog = [
+    {"name": "Apple", "price": 00.00},
+    {"name": "Banana", "price": 00.00},
+    {"name": "Orange", "price": 00.00},
+    {"name": "Water", "price": 00.00},
+    {"name": "Soda", "price": 00.00},
+    {"name": "Chips", "price": 00.00},
+    {"name": "KitKat", "price": 25.00},
+    {"name": "goodday", "price": 25.00},
+    {"name": "HidenSeek", "price": 30.00},
+    {"name": "Unibic", "price": 30.00},
+]
+
+CATALOG_PATH = os.environ.get("SMART_RETAIL_CATALOG")
+
+# Items shown by the item picker for one prefix
+SEARCH_LIMIT = 50
+
+# Lookups are cached; the cache is dropped on reload or when it grows past this
+CACHE_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    sku TEXT PRIMARY KEY,
+    name TEXT NOT NULL COLLATE NOCASE,
+    price TEXT NOT NULL,
+    label TEXT COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS products_name ON products(name);
+CREATE INDEX IF NOT EXISTS products_label ON products(label);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT NOT NULL COLLATE NOCASE,
+    sku TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS aliases_alias ON aliases(alias);
+CREATE INDEX IF NOT EXISTS aliases_sku ON aliases(sku);
+"""
+
+# One catalog entry; price is a Decimal
+Product = namedtuple("Product", ["sku", "name", "price", "label"])
+
+
+def _like_prefix(prefix):
+    """LIKE pattern matching names that start with prefix"""
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+class CatalogStore:
+    """
+    Indexed product catalog backed by SQLite.
+
+    Also works as a read-only {item: price} mapping (get, [], in), so it can
+    be handed to VerificationSession in place of a dict of prices. Items are
+    found by product name, by the class label the device reports or by alias,
+    ignoring case.
+
+    Args:
+        path: SQLite catalog file, or None for an in-memory catalog holding
+            the built-in product_catalog
+        check_same_thread: False to open the catalog on one thread and hand it
+            over to another that uses it from then on
+    """
+
+    def __init__(self, path=None, check_same_thread=True):
+        self.path = path
+        if path is None:
+            self.connection = sqlite3.connect(":memory:", check_same_thread=check_same_thread)
+            self.connection.executescript(SCHEMA)
+            self.add_products((product["name"], product["name"], product["price"], product["name"], [])
+                              for product in product_catalog)
+        else:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Catalog not found: {path}")
+            self.connection = sqlite3.connect(path, check_same_thread=check_same_thread)
+            self.connection.executescript(SCHEMA)
+        self.cache = {}
+        self.data_version = self._data_version()
+
+    def _data_version(self):
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def add_products(self, rows):
+        """Insert or replace (sku, name, price, label, aliases) rows"""
+        with self.connection:
+            for sku, name, price, label, aliases in rows:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO products (sku, name, price, label) VALUES (?, ?, ?, ?)",
+                    (str(sku), name, str(Decimal(str(price))), label or None))
+                self.connection.execute("DELETE FROM aliases WHERE sku = ?", (str(sku),))
+                self.connection.executemany("INSERT INTO aliases (alias, sku) VALUES (?, ?)",
+                                            [(alias, str(sku)) for alias in aliases])
+        self.cache = {}
+
+    def reload_if_changed(self):
+        """
+        Drop cached lookups if the catalog file was changed by another process
+        (e.g. a price update), so new lookups see the new prices.
+
+        Returns True if the catalog changed. Cheap enough to call every second.
+        """
+        version = self._data_version()
+        if version == self.data_version:
+            return False
+        self.data_version = version
+        self.cache = {}
+        return True
+
+    def lookup(self, key):
+        """The Product with this name, class label or alias, or None"""
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+
+        execute = self.connection.execute
+        row = execute("SELECT sku, name, price, label FROM products WHERE name = ? LIMIT 1", (key,)).fetchone()
+        if row is None:
+            row = execute("SELECT sku, name, price, label FROM products WHERE label = ? LIMIT 1", (key,)).fetchone()
+        if row is None:
+            row = execute("SELECT p.sku, p.name, p.price, p.label FROM aliases a JOIN products p ON p.sku = a.sku "
+                          "WHERE a.alias = ? LIMIT 1", (key,)).fetchone()
+        product = None if row is None else Product(row[0], row[1], Decimal(row[2]), row[3])
+
+        if len(self.cache) >= CACHE_SIZE:
+            self.cache = {}
+        self.cache[key] = product
+        return product
+
+    def search(self, prefix, limit=SEARCH_LIMIT):
+        """Product names starting with prefix (ignoring case), then names with a matching alias"""
+        pattern = _like_prefix(prefix)
+        names = [row[0] for row in self.connection.execute(
+            "SELECT name FROM products WHERE name LIKE ? ESCAPE '\\' ORDER BY name LIMIT ?", (pattern, limit))]
+        if prefix and len(names) < limit:
+            seen = set(names)
+            for (name,) in self.connection.execute(
+                    "SELECT p.name FROM aliases a JOIN products p ON p.sku = a.sku "
+                    "WHERE a.alias LIKE ? ESCAPE '\\' ORDER BY a.alias LIMIT ?", (pattern, limit)):
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+                    if len(names) >= limit:
+                        break
+        return names
+
+    def get(self, key, default=None):
+        product = self.lookup(key)
+        return default if product is None else product.price
+
+    def __getitem__(self, key):
+        product = self.lookup(key)
+        if product is None:
+            raise KeyError(key)
+        return product.price
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+def open_catalog(path=CATALOG_PATH, check_same_thread=True):
+    """The catalog at path, or the built-in one when no path is configured"""
+    return CatalogStore(path or None, check_same_thread)
+
+
+def read_csv_products(csv_path):
+    """(sku, name, price, label, aliases) rows from a catalog CSV"""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            aliases = [alias.strip() for alias in (row.get("aliases") or "").split(";") if alias.strip()]
+            yield row["sku"], row["name"], row["price"], row.get("label") or None, aliases
+
+
+def synthetic_products(count, seed=0):
+    """The built-in products plus count generated SKUs, for benchmarks"""
+    rng = random.Random(seed)
+    for product in product_catalog:
+        yield product["name"], product["name"], product["price"], product["name"], []
+    for i in range(count):
+        name = f"Product {i:07d} {rng.choice(['Biscuits', 'Soap', 'Juice', 'Rice', 'Tea'])}"
+        yield f"SKU{i:07d}", name, f"{rng.randint(5, 5000)}.{rng.randint(0, 99):02d}", None, [f"P{i:07d}"]
+
+
+def build_catalog(db_path, rows):
+    """Create or update the SQLite catalog at db_path from product rows"""
+    connection = sqlite3.connect(db_path)
+    connection.executescript(SCHEMA)
+    connection.close()
+    store = CatalogStore(db_path)
+    store.add_products(rows)
+    count = len(store)
+    store.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the product catalog")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Create or update a catalog file")
+    build.add_argument("db", help="SQLite catalog file")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV with sku,name,price[,label[,aliases]] columns")
+    source.add_argument("--builtin", action="store_true", help="The built-in product list")
+    source.add_argument("--synthetic", type=int, metavar="COUNT", help="Generated SKUs, for benchmarks")
+    search = subparsers.add_parser("search", help="Search a catalog by prefix")
+    search.add_argument("db")
+    search.add_argument("prefix")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.csv:
+            rows = read_csv_products(args.csv)
+        elif args.synthetic is not None:
+            rows = synthetic_products(args.synthetic)
+        else:
+            rows = ((p["name"], p["name"], p["price"], p["name"], []) for p in product_catalog)
+        print(f"{build_catalog(args.db, rows)} products in {args.db}")
+    else:
+        store = CatalogStore(args.db)
+        for name in store.search(args.prefix):
+            print(f"{name}: {store.get(name)}")
+
+
+if __name__ == "__main__":
+    main()
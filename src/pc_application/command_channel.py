@@ -0,0 +1,228 @@
+# Request/response commands over the device link
+#
+# A CommandChannel tags every command with an ID ("#<id> <command>"), which
+# the device repeats in front of its reply ("#<id> <reply>"), and returns a
+# future for it. The future resolves with the parsed CommandReply, or fails
+# with CommandTimeout when no reply came in time. Any number of commands can
+# be in flight at once, and send_many() writes a batch in one go; replies are
+# matched by ID, not by order.
+#
+# The channel does no I/O of its own: it writes through the write callable it
+# is given, and feed_line() is called with every text line read from the
+# device. Futures come from new_future, concurrent.futures.Future by default
+# (thread-safe, for the GUI's serial thread) or loop.create_future under
+# asyncio, in which case feed_line() and expire() must run on the loop.
+#
+# Firmware from before the tags answers "Unknown command: #<id> <command>".
+# The channel then stops tagging and sends every tagged command without a
+# reply again without the tag, including ones that already timed out (slow
+# firmware may reject a batch after its deadline); futures of untagged
+# commands resolve with None, as their replies can't be told apart.
+import itertools
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+from nicla_protocol import parse_proto_reply, parse_report_reply
+
+# Seconds to wait for a reply
+DEFAULT_TIMEOUT = 2.0
+
+# Timed-out commands remembered for sending again untagged
+MAX_EXPIRED = 64
+
+TAGGED_REPLY = re.compile(r"#(\d+) (.*)$")
+LEGACY_REJECT = re.compile(r"Unknown command: #(\d+)\b")
+SETTING_REPLY = re.compile(r"(.+) set to (\S+)$")
+
+# A reply to one command: the reply line without its tag, whether the device
+# accepted the command, the values it reported (see parse_reply()) and the
+# time from sending the command to reading the reply
+CommandReply = namedtuple("CommandReply", ["command", "text", "ok", "fields", "elapsed_ms"])
+
+
+class CommandTimeout(Exception):
+    """No reply to a command within its timeout"""
+
+
+def parse_reply(text):
+    """
+    Parse a reply line of the device.
+
+    Returns:
+        (ok, fields): ok is False for "Unknown command" and "Invalid ..."
+        replies; fields holds what the reply reports, e.g. {"confidence":
+        "0.5"} for "Confidence set to 0.5", {"status": "Running", "delay":
+        "1000ms", ...} for a status line, {"protocol": "bin", "labels": [...]}
+        or {"report": "change", "heartbeat_ms": 2000}
+    """
+    if text.startswith("Unknown command") or text.startswith("Invalid"):
+        return False, {}
+
+    proto_reply = parse_proto_reply(text)
+    if proto_reply:
+        return True, {"protocol": proto_reply[0], "labels": proto_reply[1]}
+
+    report_reply = parse_report_reply(text)
+    if report_reply:
+        return True, {"report": report_reply[0], "heartbeat_ms": report_reply[1]}
+
+    fields = {}
+    if text.startswith("Status: "):
+        for part in text.split(", "):
+            key, _, value = part.partition(": ")
+            fields[key.lower()] = value
+        return True, fields
+
+    match = SETTING_REPLY.match(text)
+    if match:
+        fields[match.group(1).lower().replace(" ", "_")] = match.group(2)
+    return True, fields
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _fail(future, error):
+    if not future.done():
+        future.set_exception(error)
+
+
+class CommandChannel:
+    """
+    Tagged commands to one device, with a future per command.
+
+    Args:
+        write: Callable writing bytes to the device; its exceptions are
+            raised by send() and send_many()
+        new_future: Factory for the returned futures
+        timeout: Default seconds to wait for a reply
+        tagged: False to send commands as plain lines from the start
+    """
+
+    def __init__(self, write, new_future=Future, timeout=DEFAULT_TIMEOUT, tagged=True):
+        self.write = write
+        self.new_future = new_future
+        self.timeout = timeout
+        self.tagged = tagged
+        # {id: (command, future, sent_at, deadline)}
+        self.pending = {}
+        # {id: command} of the commands that timed out, oldest first
+        self.expired = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def send(self, command, timeout=None):
+        """Send one command; returns a future for its CommandReply"""
+        return self.send_many([command], timeout)[0]
+
+    def send_many(self, commands, timeout=None):
+        """Send several commands in one write, without waiting in between; returns a future per command"""
+        now = time.monotonic()
+        deadline = now + (self.timeout if timeout is None else timeout)
+        futures = []
+        sent = []
+        untagged = []
+        lines = []
+        with self._lock:
+            for command in commands:
+                future = self.new_future()
+                futures.append(future)
+                if self.tagged:
+                    command_id = next(self._ids)
+                    self.pending[command_id] = (command, future, now, deadline)
+                    sent.append(command_id)
+                    lines.append(f"#{command_id} {command}\r\n")
+                else:
+                    untagged.append(future)
+                    lines.append(f"{command}\r\n")
+
+        try:
+            self.write("".join(lines).encode('utf-8'))
+        except Exception:
+            with self._lock:
+                for command_id in sent:
+                    self.pending.pop(command_id, None)
+            raise
+
+        for future in untagged:
+            _resolve(future, None)
+        return futures
+
+    def feed_line(self, line):
+        """
+        Match a decoded text line from the device to a pending command.
+
+        Returns:
+            (line, is_reply): the line without its tag, for the usual handling
+            of replies, and whether it was the reply to a tagged command
+        """
+        if not line.startswith("#"):
+            match = LEGACY_REJECT.match(line)
+            if match:
+                self._legacy_reject()
+            return line, False
+
+        match = TAGGED_REPLY.match(line)
+        if not match:
+            return line, False
+        text = match.group(2)
+        command_id = int(match.group(1))
+        with self._lock:
+            entry = self.pending.pop(command_id, None)
+            self.expired.pop(command_id, None)
+        if entry is not None:
+            command, future, sent_at, _ = entry
+            ok, fields = parse_reply(text)
+            _resolve(future, CommandReply(command, text, ok, fields, (time.monotonic() - sent_at) * 1000.0))
+        return text, True
+
+    def _legacy_reject(self):
+        """The device doesn't know the tags: send every unanswered tagged command again without one"""
+        with self._lock:
+            self.tagged = False
+            resend = [(pending_id, command, future) for pending_id, (command, future, _, _) in self.pending.items()]
+            resend += [(expired_id, command, None) for expired_id, command in self.expired.items()]
+            self.pending.clear()
+            self.expired.clear()
+        if not resend:
+            return  # Already sent again after an earlier reject
+        resend.sort(key=lambda entry: entry[0])
+        futures = [future for _, _, future in resend if future is not None]
+        try:
+            self.write("".join(f"{command}\r\n" for _, command, _ in resend).encode('utf-8'))
+        except Exception as e:
+            for future in futures:
+                _fail(future, e)
+            return
+        for future in futures:
+            _resolve(future, None)
+
+    def expire(self, now=None):
+        """Fail the commands whose reply is overdue; returns how many"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self.pending:
+                return 0
+            overdue = [command_id for command_id, entry in self.pending.items() if entry[3] <= now]
+            expired = [self.pending.pop(command_id) for command_id in overdue]
+            for command_id, entry in zip(overdue, expired):
+                self.expired[command_id] = entry[0]
+            while len(self.expired) > MAX_EXPIRED:
+                del self.expired[next(iter(self.expired))]
+        for command, future, sent_at, deadline in expired:
+            _fail(future, CommandTimeout(f"No reply to '{command}' within {deadline - sent_at:.1f} s"))
+        return len(expired)
+
+    def close(self, reason="connection closed"):
+        """Fail every pending command, e.g. when the port is closed"""
+        with self._lock:
+            expired = list(self.pending.values())
+            self.pending.clear()
+            self.expired.clear()
+        for command, future, _, _ in expired:
+            _fail(future, ConnectionError(f"'{command}': {reason}"))
@@ -0,0 +1,96 @@
+# Parser for the DETECTION lines sent by the Nicla Vision
+#
+# Pure functions with no logging or Tk access, so the serial thread can call
+# them on every line and benchmarks can drive them directly. Accepted formats:
+#
+#   [Sent: ]DETECTION|ItemName:Quantity:Confidence|...   (current firmware)
+#   [Sent: ]DETECTION|ItemName:Confidence|...            (legacy, quantity 1)
+#
+# HEARTBEAT|... lines, sent in change-only reporting mode, repeat the last
+# DETECTION report in the same format.
+from collections import namedtuple
+
+# One detected class of a frame
+Detection = namedtuple("Detection", ["item", "quantity", "score"])
+
+# A part of a DETECTION line that could not be parsed
+ParseError = namedtuple("ParseError", ["part", "reason"])
+
+DETECTION_PREFIX = "DETECTION|"
+HEARTBEAT_PREFIX = "HEARTBEAT|"
+ECHO_PREFIX = "Sent:"
+
+# Build records without going through the namedtuple __new__ signature
+_new_detection = tuple.__new__
+
+
+def detection_body(line):
+    """
+    Return the part of a line after "DETECTION|", or None if it is not a DETECTION line.
+
+    Both the bare UART line and the "Sent: DETECTION|..." echo printed by the
+    device script are recognised.
+    """
+    if line.startswith(DETECTION_PREFIX):
+        return line[len(DETECTION_PREFIX):]
+    if line.startswith(ECHO_PREFIX):
+        rest = line[len(ECHO_PREFIX):].lstrip()
+        if rest.startswith(DETECTION_PREFIX):
+            return rest[len(DETECTION_PREFIX):]
+    return None
+
+
+def parse_detection_body(body):
+    """
+    Parse the "|"-separated parts that follow "DETECTION|".
+
+    Returns:
+        (detections, errors): a list of Detection records and a list of
+        ParseError for the parts that were skipped. Empty parts are ignored.
+    """
+    detections = []
+    errors = []
+    for part in body.split("|"):
+        if not part:
+            continue
+        fields = part.split(":")
+        try:
+            if len(fields) == 3:
+                detections.append(_new_detection(Detection, (fields[0], int(fields[1]), float(fields[2]))))
+            elif len(fields) == 2:
+                # Legacy format: item:score, quantity is always 1
+                detections.append(_new_detection(Detection, (fields[0], 1, float(fields[1]))))
+            elif len(fields) == 1:
+                errors.append(ParseError(part, "missing ':'"))
+            else:
+                errors.append(ParseError(part, "too many ':'"))
+        except ValueError as e:
+            errors.append(ParseError(part, str(e)))
+    return detections, errors
+
+
+def parse_detection_line(line):
+    """
+    Parse one decoded, stripped line from the device.
+
+    Returns:
+        None if the line is not a DETECTION message, otherwise
+        (detections, errors) as returned by parse_detection_body().
+    """
+    body = detection_body(line)
+    if body is None:
+        return None
+    return parse_detection_body(body)
+
+
+def parse_heartbeat_line(line):
+    """
+    Parse one decoded, stripped HEARTBEAT line.
+
+    Returns:
+        None if the line is not a HEARTBEAT message, otherwise
+        (detections, errors) as returned by parse_detection_body().
+    """
+    if not line.startswith(HEARTBEAT_PREFIX):
+        return None
+    return parse_detection_body(line[len(HEARTBEAT_PREFIX):])
@@ -0,0 +1,603 @@
+# asyncio controller for many checkout lanes in one process
+#
+# Each lane is one Nicla Vision (a serial port, an emulated PTY from
+# src/tools/nicla_emulator.py or a "replay:<file>" recording) with its own
+# decoder, VerificationSession and latency statistics. All lanes share a single
+# event loop and thread: serial ports are watched with loop.add_reader() and
+# read without blocking, ports without a file descriptor (replays, or any port
+# on Windows) are polled. A lane whose device goes away is reopened with
+# backoff (see port_watcher.py), off the event loop, and right away when the
+# port is listed again. configure() sends commands to every lane at once
+# and gathers the replies (see command_channel.py).
+#
+# Usage (headless):
+#   python lane_manager.py /dev/ttyACM0 /dev/ttyACM1 [--binary] [--duration 60]
+#   python lane_manager.py --emulators [--report-every 5] [--change-only] [--no-reconnect]
+#   python lane_manager.py --emulators --configure conf=0.5 fps=10 --duration 5
+import argparse
+import asyncio
+import glob
+import time
+
+import serial
+
+from catalog import open_catalog, CATALOG_PATH
+from command_channel import CommandChannel
+from detection_parser import Detection, parse_detection_line, parse_heartbeat_line
+from latency_stats import LatencyWindow, format_ms, parse_latency_line
+from nicla_protocol import (StreamDecoder, SequenceTracker, Keepalive, FRAME_HEARTBEAT, parse_proto_reply,
+                            parse_report_reply)
+from port_watcher import PortWatcher, Reconnector, EMULATOR_PORT_GLOB
+from serial_session import ReplayPort, REPLAY_PREFIX
+from verification_core import VerificationSession
+
+DEFAULT_BAUDRATE = 115200
+
+# How often ports without a file descriptor are checked for data
+POLL_INTERVAL = 0.01
+
+# Event loop lag is sampled this often
+LAG_SAMPLE_INTERVAL = 0.1
+
+# How often lanes waiting to reconnect are checked for a due attempt
+RECONNECT_CHECK_INTERVAL = 0.05
+
+# How often commands are checked for an overdue reply
+COMMAND_CHECK_INTERVAL = 0.05
+
+
+class Lane:
+    """
+    One checkout lane: a device connection and the state derived from it.
+
+    Args:
+        name: Label used in reports
+        port_name: Serial port, emulator link or "replay:<file>"
+        prices: {item: price} catalog for the lane's VerificationSession
+        on_update: Optional callback(lane) after each detection update, so a
+            view can follow the lane; called on the event loop thread
+        consensus: window_frames, window_ms and statistic for the lane's
+            DetectionState
+    """
+
+    def __init__(self, name, port_name, prices, on_update=None, **consensus):
+        self.name = name
+        self.port_name = port_name
+        self.on_update = on_update
+        self.consensus = consensus
+        self.session = VerificationSession(prices, **consensus)
+
+        self.port = None
+        self.connected = False
+        self.error = None
+        self.poll_task = None
+        self.reconnector = Reconnector()
+        self.reopen_task = None
+        self.commands = None
+        self.negotiate_task = None
+        # Why the last negotiation left the device on a default, per command
+        self.negotiation_failures = {}
+        self.device_status = {}
+
+        # Wire protocol state, as in RetailVerificationSystem
+        self.protocol = "text"
+        self.class_labels = []
+        self.decoder = StreamDecoder()
+        self.sequence_tracker = SequenceTracker()
+        self.keepalive = Keepalive()
+
+        self.bytes_received = 0
+        self.updates = 0
+        self.heartbeats = 0
+        self.parse_errors = 0
+        self.first_update = None
+        self.last_update = None
+
+        # Processing latency reported by the device and time from read() to
+        # the lane state being updated on the host
+        self.device_latency = LatencyWindow()
+        self.host_latency = LatencyWindow()
+
+    def feed(self, data, received_at):
+        """Handle bytes read from the port at perf_counter() time received_at"""
+        self.bytes_received += len(data)
+        for kind, payload in self.decoder.feed(data):
+            if kind == "frame":
+                self.handle_frame(payload, received_at)
+            else:
+                self.handle_line(payload, received_at)
+
+    def handle_frame(self, frame, received_at):
+        self.keepalive.heard()
+        self.sequence_tracker.update(frame.seq)
+        self.device_latency.add(frame.latency_ms)
+        labels = self.class_labels
+        detections = [
+            Detection(labels[class_id] if class_id < len(labels) else f"class_{class_id}", quantity, score)
+            for class_id, quantity, score in frame.entries
+        ]
+        if frame.frame_type == FRAME_HEARTBEAT:
+            self.heartbeat(detections)
+        else:
+            self.apply(detections, received_at)
+
+    def handle_line(self, line, received_at):
+        decoded_line = line.decode('utf-8', errors='replace').strip()
+
+        parsed = parse_detection_line(decoded_line)
+        if parsed is not None:
+            detections, errors = parsed
+            self.parse_errors += len(errors)
+            self.keepalive.heard()
+            self.apply(detections, received_at)
+            return
+
+        latency_ms = parse_latency_line(decoded_line)
+        if latency_ms is not None:
+            self.device_latency.add(latency_ms)
+            return
+
+        parsed = parse_heartbeat_line(decoded_line)
+        if parsed is not None:
+            self.keepalive.heard()
+            self.heartbeat(parsed[0])
+            return
+
+        if "No objects detected" in decoded_line:
+            self.apply([], received_at)
+            return
+
+        # Replies to tagged commands complete their futures, then count as usual
+        if self.commands is not None:
+            decoded_line, _ = self.commands.feed_line(decoded_line)
+
+        proto_reply = parse_proto_reply(decoded_line)
+        if proto_reply:
+            self.protocol, labels = proto_reply
+            if labels:
+                self.class_labels = labels
+            self.sequence_tracker.reset()
+            return
+
+        report_reply = parse_report_reply(decoded_line)
+        if report_reply:
+            self.set_report_mode(*report_reply)
+
+    def follow_replies(self, commands, results):
+        """
+        Take over the protocol and report mode from the replies to commands
+        (results as gathered from their futures). PROTO and REPORT lines are
+        also applied by handle_line() as they are read, so the frames right
+        after them are decoded with the new labels. A command that was
+        rejected or not answered leaves the lane on its current setting.
+        """
+        for command, reply in zip(commands, results):
+            if isinstance(reply, Exception):
+                self.negotiation_failures[command] = str(reply)
+                continue
+            if reply is None:
+                continue  # Older firmware: the reply was handled as a plain line
+            if not reply.ok:
+                self.negotiation_failures[command] = reply.text
+                continue
+            self.negotiation_failures.pop(command, None)
+            fields = reply.fields
+            if "status" in fields:
+                self.device_status = fields
+            elif "protocol" in fields:
+                self.protocol = fields["protocol"]
+                if fields["labels"]:
+                    self.class_labels = fields["labels"]
+            elif "report" in fields:
+                self.set_report_mode(fields["report"], fields["heartbeat_ms"])
+
+    def set_report_mode(self, mode, heartbeat_ms):
+        """Follow the device's reporting mode, as RetailVerificationSystem does"""
+        if mode == "change":
+            # The device debounces counts, every report is the new state
+            self.session.detections.set_window(1)
+            self.keepalive.set_heartbeat(heartbeat_ms)
+        else:
+            self.session.detections.set_window(self.consensus.get("window_frames", 1),
+                                               self.consensus.get("window_ms"))
+            self.keepalive.set_heartbeat(None)
+        self.keepalive.heard()
+
+    def reset_protocol(self):
+        """Start over in text mode, as a (possibly restarted) device does after reopening the port"""
+        self.protocol = "text"
+        self.class_labels = []
+        self.decoder = StreamDecoder()
+        self.sequence_tracker = SequenceTracker()
+        self.set_report_mode("every", None)
+
+    def reported(self):
+        """A report or heartbeat arrived; the first one after reopening the port ends the recovery"""
+        if self.reconnector.recovering:
+            self.reconnector.recovered()
+
+    def heartbeat(self, detections):
+        """A repeated report: the device is alive and the state unchanged"""
+        self.heartbeats += 1
+        self.reported()
+        # Also repairs the state if a report was lost on the way
+        counts = self.session.detections.counts
+        self.session.detections.update(detections)
+        if self.session.detections.counts != counts and self.on_update:
+            self.on_update(self)
+
+    def apply(self, detections, received_at):
+        """Add one frame of detections to the lane's state"""
+        self.session.detections.update(detections)
+        self.reported()
+
+        now = time.perf_counter()
+        self.host_latency.add((now - received_at) * 1000.0)
+        self.updates += 1
+        if self.first_update is None:
+            self.first_update = now
+        self.last_update = now
+
+        if self.on_update:
+            self.on_update(self)
+
+    def update_rate(self):
+        """Detection updates per second since the first one"""
+        if self.first_update is None or self.last_update == self.first_update:
+            return 0.0
+        return (self.updates - 1) / (self.last_update - self.first_update)
+
+
+class LaneManager:
+    """
+    Owns the connections of many lanes and drives them from one event loop.
+
+    Args:
+        prices: {item: price} catalog shared by all lanes
+        baudrate: Baud rate for real serial ports
+        use_binary: Ask every device for binary detection frames
+        changes_only: Ask every device to only report changes (plus heartbeats)
+        reconnect: Reopen the port of a lane whose device went away
+        consensus: window_frames, window_ms and statistic for every lane
+    """
+
+    def __init__(self, prices, baudrate=DEFAULT_BAUDRATE, use_binary=False, changes_only=False, reconnect=True,
+                 **consensus):
+        self.prices = prices
+        self.baudrate = baudrate
+        self.use_binary = use_binary
+        self.changes_only = changes_only
+        self.reconnect = reconnect
+        self.consensus = consensus
+        self.lanes = []
+        self.loop = None
+        self.loop_lag = LatencyWindow()
+        self.lag_task = None
+        self.reconnect_task = None
+        self.port_watcher = None
+        self.command_task = None
+
+    def add_lane(self, port_name, name=None, on_update=None):
+        lane = Lane(name or f"lane{len(self.lanes) + 1}", port_name, self.prices, on_update, **self.consensus)
+        self.lanes.append(lane)
+        if self.loop is not None:
+            self.open_lane(lane)
+        return lane
+
+    async def start(self):
+        """Open every lane and start watching them"""
+        self.loop = asyncio.get_running_loop()
+        for lane in self.lanes:
+            self.open_lane(lane)
+        self.lag_task = self.loop.create_task(self._sample_loop_lag())
+        self.command_task = self.loop.create_task(self._expire_commands())
+        if self.reconnect:
+            self.reconnect_task = self.loop.create_task(self._reconnect_lanes())
+            self.port_watcher = PortWatcher(
+                lambda ports, added, removed: self.loop.call_soon_threadsafe(self._ports_added, added)).start()
+
+    def _open_port(self, lane):
+        if lane.port_name.startswith(REPLAY_PREFIX):
+            return ReplayPort(lane.port_name[len(REPLAY_PREFIX):], speed=1.0, timeout=0)
+        # timeout=0: read() returns what is buffered and never blocks the loop
+        return serial.Serial(lane.port_name, self.baudrate, timeout=0)
+
+    def open_lane(self, lane):
+        try:
+            port = self._open_port(lane)
+        except (OSError, ValueError, serial.SerialException) as e:
+            lane.error = str(e)
+            return False
+        self._attach(lane, port)
+        return True
+
+    def _attach(self, lane, port):
+        """Start reading an opened port and negotiate with its device"""
+        lane.port = port
+        lane.connected = True
+        # Replays can't answer, so their commands aren't tagged
+        lane.commands = CommandChannel(port.write, new_future=self.loop.create_future,
+                                       tagged=not lane.port_name.startswith(REPLAY_PREFIX))
+        lane.error = None
+        try:
+            self.loop.add_reader(lane.port.fileno(), self._on_readable, lane)
+        except (AttributeError, NotImplementedError, serial.SerialException):
+            lane.poll_task = self.loop.create_task(self._poll(lane))
+        lane.negotiate_task = self.loop.create_task(self._negotiate(lane))
+
+    async def _negotiate(self, lane):
+        """Ask a freshly attached device for its status and the wire protocol options, in one write"""
+        commands = ["status"]
+        if self.use_binary:
+            commands.append("proto=bin")
+        if self.changes_only:
+            commands.append("report=change")
+        port = lane.port
+        futures = self.request(lane, commands)
+        if futures is None:
+            return
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        if lane.port is port:
+            # Rejected or unanswered, the lane stays on text and every-frame reports
+            lane.follow_replies(commands, results)
+
+    async def _reopen(self, lane):
+        """One attempt to open a lost lane's port again, in a worker thread"""
+        try:
+            port = await self.loop.run_in_executor(None, self._open_port, lane)
+        except (OSError, ValueError, serial.SerialException) as e:
+            lane.error = str(e)
+            lane.reconnector.failed(lane.error)
+            return
+        if not lane.reconnector.reopened():
+            # Closed on purpose while the port was being opened
+            port.close()
+            return
+        lane.reset_protocol()
+        self._attach(lane, port)
+
+    async def _reconnect_lanes(self):
+        """Start an attempt for every lost lane whose backoff has run out"""
+        while True:
+            for lane in self.lanes:
+                if (lane.reopen_task is None or lane.reopen_task.done()) and lane.reconnector.due():
+                    lane.reopen_task = self.loop.create_task(self._reopen(lane))
+            await asyncio.sleep(RECONNECT_CHECK_INTERVAL)
+
+    def _ports_added(self, added):
+        """Ports the watcher saw appear; lanes waiting for them try at once"""
+        for lane in self.lanes:
+            if lane.port_name in added:
+                lane.reconnector.port_appeared()
+
+    def close_lane(self, lane, error=None):
+        if lane.port is None:
+            return
+        if lane.poll_task is not None:
+            lane.poll_task.cancel()
+            lane.poll_task = None
+        else:
+            try:
+                self.loop.remove_reader(lane.port.fileno())
+            except (AttributeError, ValueError, OSError, serial.SerialException):
+                pass
+        try:
+            lane.port.close()
+        except (OSError, serial.SerialException):
+            pass
+        lane.port = None
+        lane.connected = False
+        lane.error = error
+        lane.commands.close(error or "lane closed")
+        lane.commands = None
+        if lane.negotiate_task is not None:
+            lane.negotiate_task.cancel()
+            lane.negotiate_task = None
+        if error is not None and self.reconnect and not lane.port_name.startswith(REPLAY_PREFIX):
+            lane.reconnector.lost(error)
+        else:
+            lane.reconnector.cancel()
+
+    def _read(self, lane):
+        port = lane.port
+        try:
+            data = port.read(port.in_waiting or 1)
+        except (OSError, serial.SerialException) as e:
+            # The device went away (unplugged, emulator stopped)
+            self.close_lane(lane, str(e))
+            return
+        if data:
+            lane.feed(data, time.perf_counter())
+
+    def _on_readable(self, lane):
+        if lane.port is not None:
+            self._read(lane)
+
+    async def _poll(self, lane):
+        while lane.port is not None:
+            if lane.port.in_waiting:
+                self._read(lane)
+            elif getattr(lane.port, "finished", False):
+                self.close_lane(lane, "replay finished")
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _expire_commands(self):
+        """Fail the commands whose reply is overdue"""
+        while True:
+            for lane in self.lanes:
+                if lane.commands is not None:
+                    lane.commands.expire()
+            await asyncio.sleep(COMMAND_CHECK_INTERVAL)
+
+    async def _sample_loop_lag(self):
+        """How late the loop wakes up, i.e. how long lanes wait to be served"""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+            self.loop_lag.add(max(0.0, time.perf_counter() - start - LAG_SAMPLE_INTERVAL) * 1000.0)
+
+    def send(self, lane, command):
+        """Send a command to one lane's device without waiting; the lane follows the reply when it comes"""
+        futures = self.request(lane, [command])
+        if futures is None:
+            return False
+        futures[0].add_done_callback(lambda done: lane.follow_replies([command], [done.exception() or done.result()]))
+        return True
+
+    def broadcast(self, command):
+        for lane in self.lanes:
+            self.send(lane, command)
+
+    def request(self, lane, commands, timeout=None):
+        """Send commands to one lane in one write; returns a future per command, or None if the lane is down"""
+        if lane.commands is None:
+            return None
+        try:
+            return lane.commands.send_many(commands, timeout)
+        except (OSError, serial.SerialException) as e:
+            self.close_lane(lane, str(e))
+            return None
+
+    async def configure(self, commands, timeout=None):
+        """
+        Send commands to every connected lane at once and wait for the replies.
+
+        Returns:
+            {lane: [CommandReply, None (older firmware) or the exception,
+            one per command]} for the lanes the commands were sent to
+        """
+        requests = {}
+        for lane in self.lanes:
+            futures = self.request(lane, commands, timeout)
+            if futures is not None:
+                requests[lane] = futures
+        results = {}
+        for lane, futures in requests.items():
+            results[lane] = await asyncio.gather(*futures, return_exceptions=True)
+            lane.follow_replies(commands, results[lane])
+        return results
+
+    def close(self):
+        for task in (self.lag_task, self.reconnect_task, self.command_task):
+            if task is not None:
+                task.cancel()
+        self.lag_task = self.reconnect_task = self.command_task = None
+        if self.port_watcher is not None:
+            self.port_watcher.stop()
+            self.port_watcher = None
+        for lane in self.lanes:
+            self.close_lane(lane)
+            lane.reconnector.cancel()
+
+    def report(self):
+        """One line per lane plus the shared event loop lag"""
+        lines = [f"{'lane':<10} {'port':<24} {'state':<10} {'upd/s':>7} {'hb':>5} {'dropped':>7} "
+                 f"{'dev p50':>8} {'dev p95':>8} {'host p50':>8} {'host p95':>8} {'host max':>8} "
+                 f"{'recov':>5} {'rec max':>8}  items"]
+        recoveries = 0
+        for lane in self.lanes:
+            device = lane.device_latency.summary()
+            host = lane.host_latency.summary()
+            recovery = lane.reconnector.recoveries.summary()
+            recoveries += recovery["count"]
+            if lane.reconnector.reconnecting:
+                state = "retrying"
+            elif lane.connected:
+                state = "silent" if lane.keepalive.silent() else "connected"
+            else:
+                state = "down" if lane.error else "closed"
+            lines.append(f"{lane.name:<10} {lane.port_name[-24:]:<24} {state:<10} {lane.update_rate():>7.1f} "
+                         f"{lane.heartbeats:>5} {lane.sequence_tracker.dropped:>7} {format_ms(device['p50']):>8} "
+                         f"{format_ms(device['p95']):>8} {format_ms(host['p50']):>8} "
+                         f"{format_ms(host['p95']):>8} {format_ms(host['max']):>8} "
+                         f"{recovery['count']:>5} {format_ms(recovery['max']):>8}  "
+                         f"{lane.session.detections.counts}")
+        for lane in self.lanes:
+            for command, reason in lane.negotiation_failures.items():
+                lines.append(f"{lane.name}: '{command}' not accepted ({reason}), staying on the default")
+        lag = self.loop_lag.summary()
+        lines.append(f"{len(self.lanes)} lanes, event loop lag p50 {format_ms(lag['p50'])} ms, "
+                     f"p99 {format_ms(lag['p99'])} ms, max {format_ms(lag['max'])} ms, {recoveries} reconnects")
+        return lines
+
+    async def run(self, duration=None, report_every=None, report=print, configure=None):
+        """Start the lanes, send them the configure commands and serve them for duration seconds (forever if None)"""
+        await self.start()
+        if configure:
+            start = time.perf_counter()
+            results = await self.configure(configure)
+            report("\n".join(format_replies(configure, results, (time.perf_counter() - start) * 1000.0)))
+        end = None if duration is None else time.monotonic() + duration
+        try:
+            while end is None or time.monotonic() < end:
+                wait = report_every or 1.0
+                if end is not None:
+                    wait = min(wait, max(0.0, end - time.monotonic()))
+                await asyncio.sleep(wait)
+                if report_every:
+                    report("\n".join(self.report()))
+        finally:
+            self.close()
+
+
+def format_replies(commands, results, elapsed_ms):
+    """One line per lane and command for the results of LaneManager.configure()"""
+    lines = []
+    for lane, replies in results.items():
+        for command, reply in zip(commands, replies):
+            if isinstance(reply, Exception):
+                outcome = f"failed: {reply}"
+            elif reply is None:
+                outcome = "sent (no reply IDs on this firmware)"
+            elif not reply.ok:
+                outcome = f"rejected: {reply.text}"
+            else:
+                outcome = f"{reply.text} ({format_ms(reply.elapsed_ms)} ms)"
+            lines.append(f"{lane.name:<10} {command:<16} {outcome}")
+    lines.append(f"Configured {len(results)} lanes with {len(commands)} commands in {format_ms(elapsed_ms)} ms")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve many checkout lanes from one process")
+    parser.add_argument("ports", nargs="*", help="Serial ports, emulator links or replay:<file>")
+    parser.add_argument("--emulators", action="store_true",
+                        help=f"Add every emulated device matching {EMULATOR_PORT_GLOB}")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="SQLite product catalog (see catalog.py)")
+    parser.add_argument("--baudrate", type=int, default=DEFAULT_BAUDRATE)
+    parser.add_argument("--binary", action="store_true", help="Use binary detection frames")
+    parser.add_argument("--change-only", action="store_true",
+                        help="Ask the devices to only report changes, with heartbeats while idle")
+    parser.add_argument("--window-frames", type=int, default=1,
+                        help="Report the consensus of this many recent frames per lane")
+    parser.add_argument("--window-ms", type=float, default=None, help="Also drop frames older than this")
+    parser.add_argument("--statistic", choices=["mode", "median"], default="mode")
+    parser.add_argument("--no-reconnect", action="store_true", help="Leave a lane down when its device goes away")
+    parser.add_argument("--configure", nargs="+", metavar="COMMAND",
+                        help="Send these commands to every lane after connecting and show the replies")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--report-every", type=float, default=5.0)
+    args = parser.parse_args()
+
+    ports = list(args.ports)
+    if args.emulators:
+        ports += sorted(glob.glob(EMULATOR_PORT_GLOB))
+    if not ports:
+        parser.error("no ports given")
+
+    manager = LaneManager(open_catalog(args.catalog), baudrate=args.baudrate, use_binary=args.binary,
+                          changes_only=args.change_only, reconnect=not args.no_reconnect,
+                          window_frames=args.window_frames, window_ms=args.window_ms, statistic=args.statistic)
+    for port in ports:
+        manager.add_lane(port)
+
+    try:
+        asyncio.run(manager.run(args.duration, args.report_every, configure=args.configure))
+    except KeyboardInterrupt:
+        pass
+    print("\n".join(manager.report()))
+
+
+if __name__ == "__main__":
+    main()
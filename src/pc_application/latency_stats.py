@@ -0,0 +1,244 @@
+# Rolling latency statistics
+#
+# Keeps the most recent samples of one latency (in milliseconds) and reports
+# percentiles over them. Adding a sample is O(1); percentiles sort a copy of
+# the window, which is only done when a report is shown.
+#
+# LatencyBreakdown follows each detection report from the device to the
+# screen: the stage times the device sends in TIMING lines ("timing=on")
+# and the host's own parse, queue and render times, lined up by the report's
+# sequence number, with one window per stage.
+import csv
+import math
+import re
+import threading
+import time
+from collections import deque
+
+# Stages timed on the device, in the order of the TIMING line
+DEVICE_STAGES = ("capture", "scene", "inference", "postprocess", "merge", "uart")
+
+# Stages timed on the host: parse (bytes read until the detections are
+# parsed, serial thread), queue (waiting for the Tk main loop) and render
+# (consensus update and Treeview update; Tk paints at its next idle time)
+HOST_STAGES = ("parse", "queue", "render")
+
+# Every window of a LatencyBreakdown; "reported" is the LATENCY:<ms> line
+STAGES = DEVICE_STAGES + ("device_total", "reported") + HOST_STAGES + ("host_total",)
+
+TIMING_PREFIX = "TIMING|"
+LATENCY_LINE = re.compile(r"LATENCY:(\d+)ms")
+
+# Reports whose TIMING line has not arrived yet, by sequence number
+MAX_PENDING = 256
+
+
+class LatencyWindow:
+    """The last size latency samples, in milliseconds"""
+
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.maximum = 0.0
+
+    def add(self, ms):
+        self.samples.append(ms)
+        self.count += 1
+        if ms > self.maximum:
+            self.maximum = ms
+
+    def percentile(self, p, ordered=None):
+        """Nearest-rank percentile of the window, None without samples"""
+        if ordered is None:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        rank = min(len(ordered), max(1, math.ceil(p / 100.0 * len(ordered)))) - 1
+        return ordered[rank]
+
+    def summary(self):
+        """{"count", "p50", "p95", "p99", "max"} over the window (max is over all samples)"""
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "p50": self.percentile(50, ordered),
+            "p95": self.percentile(95, ordered),
+            "p99": self.percentile(99, ordered),
+            "max": self.maximum if self.count else None,
+        }
+
+    def clear(self):
+        self.samples.clear()
+        self.count = 0
+        self.maximum = 0.0
+
+
+def format_ms(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+def parse_latency_line(line):
+    """The milliseconds of a "LATENCY:<ms>ms" line, or None"""
+    match = LATENCY_LINE.search(line)
+    return int(match.group(1)) if match else None
+
+
+def parse_timing_line(line):
+    """
+    Parse a "TIMING|<seq>|<stage>=<us>|..." line.
+
+    Returns:
+        (seq, {stage: milliseconds}) or None if the line is not a valid
+        TIMING line. Unknown stages are kept.
+    """
+    if not line.startswith(TIMING_PREFIX):
+        return None
+    parts = line[len(TIMING_PREFIX):].split("|")
+    try:
+        seq = int(parts[0])
+        stages = {}
+        for part in parts[1:]:
+            stage, _, value = part.partition("=")
+            stages[stage] = int(value) / 1000.0
+    except ValueError:
+        return None
+    return seq, stages
+
+
+class FrameTrace:
+    """Timestamps (perf_counter() seconds) and device stage times of one report"""
+
+    __slots__ = ("seq", "received_at", "parsed_at", "dequeued_at", "rendered_at", "device")
+
+    def __init__(self, seq=None, received_at=None):
+        self.seq = seq
+        self.received_at = received_at
+        self.parsed_at = None
+        self.dequeued_at = None
+        self.rendered_at = None
+        self.device = None
+
+    def host_stages(self):
+        """{stage: ms} for the host stages whose timestamps are known"""
+        stages = {}
+        if self.received_at is not None and self.parsed_at is not None:
+            stages["parse"] = (self.parsed_at - self.received_at) * 1000.0
+        if self.parsed_at is not None and self.dequeued_at is not None:
+            stages["queue"] = (self.dequeued_at - self.parsed_at) * 1000.0
+        if self.dequeued_at is not None and self.rendered_at is not None:
+            stages["render"] = (self.rendered_at - self.dequeued_at) * 1000.0
+        if self.received_at is not None and self.rendered_at is not None:
+            stages["host_total"] = (self.rendered_at - self.received_at) * 1000.0
+        return stages
+
+
+class LatencyBreakdown:
+    """
+    Per-stage latency of detection reports, from the camera to the screen.
+
+    The serial thread calls begin() and parsed() for each report and
+    device_timing() for each TIMING line; the main loop calls rendered().
+    Binary frames are matched to their TIMING line by sequence number; in the
+    text format the TIMING line follows its report, so it is matched to the
+    latest report that has none yet.
+
+    Args:
+        size: Samples kept per stage for the percentiles
+        history: Reports kept for export()
+    """
+
+    def __init__(self, size=1000, history=5000):
+        self.lock = threading.Lock()
+        self.windows = {stage: LatencyWindow(size) for stage in STAGES}
+        self.traces = deque(maxlen=history)
+        self.pending = {}
+        self.last_trace = None
+        self.superseded = 0
+
+    def clear(self):
+        with self.lock:
+            for window in self.windows.values():
+                window.clear()
+            self.traces.clear()
+            self.pending.clear()
+            self.last_trace = None
+            self.superseded = 0
+
+    def begin(self, received_at, seq=None):
+        """Start the trace of a report whose bytes were read at received_at"""
+        trace = FrameTrace(seq, received_at)
+        with self.lock:
+            self.traces.append(trace)
+            self.last_trace = trace
+            if seq is not None:
+                self.pending[seq] = trace
+                if len(self.pending) > MAX_PENDING:
+                    del self.pending[next(iter(self.pending))]
+        return trace
+
+    def parsed(self, trace, now=None):
+        trace.parsed_at = time.perf_counter() if now is None else now
+
+    def reported(self, ms):
+        """The processing time of a LATENCY line"""
+        with self.lock:
+            self.windows["reported"].add(ms)
+
+    def device_timing(self, seq, stages):
+        """Record the stage times of a TIMING line and attach them to their report"""
+        with self.lock:
+            trace = self.pending.pop(seq, None)
+            if trace is None:
+                last = self.last_trace
+                if last is not None and last.seq is None and last.device is None:
+                    trace = last
+                    trace.seq = seq
+                else:
+                    # Report not seen (e.g. an empty text frame), keep the device side
+                    trace = FrameTrace(seq)
+                    self.traces.append(trace)
+            trace.device = stages
+            for stage, ms in stages.items():
+                window = self.windows.get(stage)
+                if window is not None:
+                    window.add(ms)
+            self.windows["device_total"].add(sum(stages.values()))
+
+    def rendered(self, trace, dequeued_at, now=None):
+        """The report is on screen; dequeued_at is when the main loop picked it up"""
+        trace.dequeued_at = dequeued_at
+        trace.rendered_at = time.perf_counter() if now is None else now
+        with self.lock:
+            for stage, ms in trace.host_stages().items():
+                self.windows[stage].add(ms)
+
+    def skipped(self):
+        """A report was replaced by a newer one before it was rendered"""
+        with self.lock:
+            self.superseded += 1
+
+    def summary(self):
+        """[(stage, summary)] for every stage with samples, see LatencyWindow.summary()"""
+        with self.lock:
+            return [(stage, self.windows[stage].summary()) for stage in STAGES if self.windows[stage].count]
+
+    def export_csv(self, path):
+        """
+        Write one row per recent report: its sequence number and the time of
+        every stage in milliseconds (empty when unknown). Returns the number
+        of rows.
+        """
+        with self.lock:
+            traces = list(self.traces)
+        columns = DEVICE_STAGES + ("device_total",) + HOST_STAGES + ("host_total",)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("seq",) + columns)
+            for trace in traces:
+                stages = dict(trace.device or {})
+                if trace.device:
+                    stages["device_total"] = sum(trace.device.values())
+                stages.update(trace.host_stages())
+                writer.writerow([trace.seq if trace.seq is not None else ""] +
+                                ["" if stages.get(column) is None else f"{stages[column]:.3f}" for column in columns])
+        return len(traces)
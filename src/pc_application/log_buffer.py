@@ -0,0 +1,136 @@
+# Bounded log storage for the debug and raw-data panes
+#
+# RingLog keeps the newest entries up to a line and/or byte cap and can spill
+# evicted entries to a rotating file on disk. LogView shows a RingLog in a Tk
+# Text widget and trims the widget by the same amount, so inserting and
+# scrolling cost the same after 12 hours as after 12 seconds. The view keeps
+# how many widget lines each entry took when it was inserted and deletes
+# evicted entries by those counts, so entries with several lines or none
+# don't leave the widget and the log out of step.
+import logging
+import logging.handlers
+import tkinter as tk
+from collections import deque
+
+# Defaults for a log pane
+DEFAULT_MAX_LINES = 2000
+DEFAULT_SPILL_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_SPILL_BACKUPS = 5
+
+
+class RingLog:
+    """
+    Keep the newest log entries in memory, optionally spilling older ones to disk.
+
+    Args:
+        max_lines: Maximum number of entries kept (None for no line cap)
+        max_bytes: Maximum UTF-8 size of the kept entries (None for no byte cap)
+        spill_path: If set, evicted entries are appended to this file, which is
+            rotated when it grows past spill_max_bytes
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, max_bytes=None, spill_path=None,
+                 spill_max_bytes=DEFAULT_SPILL_MAX_BYTES, spill_backups=DEFAULT_SPILL_BACKUPS):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.entries = deque()
+        self.sizes = deque()
+        self.total_bytes = 0
+
+        self.spill_handler = None
+        if spill_path:
+            self.spill_handler = logging.handlers.RotatingFileHandler(
+                spill_path, maxBytes=spill_max_bytes, backupCount=spill_backups, encoding="utf-8"
+            )
+            self.spill_handler.setFormatter(logging.Formatter("%(message)s"))
+            self.spill_handler.terminator = ""  # Entries carry their own newlines
+
+    def __len__(self):
+        return len(self.entries)
+
+    def append(self, entry):
+        """Add one entry and return the list of entries evicted to make room"""
+        return self.extend((entry,))
+
+    def extend(self, entries):
+        """Add several entries and return the list of entries evicted to make room"""
+        for entry in entries:
+            size = len(entry.encode("utf-8"))
+            self.entries.append(entry)
+            self.sizes.append(size)
+            self.total_bytes += size
+
+        evicted = []
+        while self.entries and (
+            (self.max_lines is not None and len(self.entries) > self.max_lines) or
+            (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            evicted.append(self.entries.popleft())
+            self.total_bytes -= self.sizes.popleft()
+
+        self._spill(evicted)
+        return evicted
+
+    def clear(self):
+        """Drop all entries (spilling them first) and return them"""
+        evicted = list(self.entries)
+        self.entries.clear()
+        self.sizes.clear()
+        self.total_bytes = 0
+        self._spill(evicted)
+        return evicted
+
+    def close(self):
+        """Spill whatever is still in memory and close the spill file"""
+        if self.spill_handler:
+            self._spill(list(self.entries))
+            self.spill_handler.close()
+            self.spill_handler = None
+
+    def _spill(self, entries):
+        if self.spill_handler and entries:
+            # One record per batch; rotation is checked once per write
+            record = logging.makeLogRecord({"msg": "".join(entries)})
+            self.spill_handler.emit(record)
+
+
+class LogView:
+    """Show a RingLog in a Tk Text widget, keeping the widget the same size as the log"""
+
+    def __init__(self, widget, log):
+        self.widget = widget
+        self.log = log
+        self.line_counts = deque()  # Widget lines of each entry in the log, oldest first
+
+    def append(self, entry):
+        self.extend((entry,))
+
+    def extend(self, entries):
+        """Append entries to the log and the widget, trimming both from the top"""
+        if not entries:
+            return
+        # An entry without a trailing newline still gets lines of its own, so
+        # the next entry can't share (and later be deleted with) its last line
+        text = []
+        for entry in entries:
+            if not entry.endswith("\n"):
+                entry += "\n"
+            text.append(entry)
+            self.line_counts.append(entry.count("\n"))
+        evicted = self.log.extend(entries)
+        self.widget.insert(tk.END, "".join(text))
+
+        if evicted:
+            lines = sum(self.line_counts.popleft() for _ in evicted)
+            self.widget.delete("1.0", f"{lines + 1}.0")
+
+        self.widget.see(tk.END)
+
+    def clear(self):
+        """Empty the log (spilling it if configured) and the widget"""
+        self.log.clear()
+        self.line_counts.clear()
+        self.widget.delete("1.0", tk.END)
+
+    def close(self):
+        self.log.close()
@@ -0,0 +1,306 @@
+# Decoder for the data stream coming from the Nicla Vision
+#
+# The device sends text lines (DETECTION|..., LATENCY:..., command replies)
+# and, once "proto=bin" has been negotiated, compact binary detection frames
+# (type FRAME_DETECTION, or FRAME_HEARTBEAT for a repeated report):
+#
+#   sync (2) | type (1) | seq (2) | latency_ms (2) | count (1) |
+#   count x [class_id (1) | quantity (1) | score (1)] | crc16 (2)
+#
+# The layout must match src/nicla/binary_protocol.py on the device. The sync
+# word starts with 0xA5, which can never start a UTF-8 character, and the CRC
+# confirms each frame, so frames and text lines can be told apart in the same
+# byte stream.
+import struct
+import time
+from collections import namedtuple
+
+SYNC = b'\xa5\x5a'
+SYNC_BYTE = SYNC[0]
+FRAME_DETECTION = 0x01
+FRAME_HEARTBEAT = 0x02
+FRAME_TYPES = (FRAME_DETECTION, FRAME_HEARTBEAT)
+
+HEADER = struct.Struct("<BHHB")
+CRC = struct.Struct("<H")
+ENTRY_SIZE = 3
+CRC_SIZE = 2
+# Sync word + header + CRC of a frame without entries
+MIN_FRAME_SIZE = len(SYNC) + HEADER.size + CRC_SIZE
+
+# Longest text line kept while waiting for its newline
+MAX_LINE_LENGTH = 4096
+
+# In change-only reporting the device is considered silent after missing this
+# many heartbeats
+HEARTBEAT_MISSES = 3
+
+# A decoded binary detection frame. entries is a list of
+# (class_id, quantity, score) tuples with the score back in 0..1.
+DetectionFrame = namedtuple("DetectionFrame", ["seq", "latency_ms", "entries", "frame_type"],
+                            defaults=(FRAME_DETECTION,))
+
+
+def _make_crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC_TABLE = _make_crc_table()
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE of a bytes-like object"""
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[((crc >> 8) ^ byte) & 0xFF]
+    return crc
+
+
+def encode_detection_frame(seq, latency_ms, entries, frame_type=FRAME_DETECTION):
+    """Build a detection frame exactly as the device does (used by tools and emulators)"""
+    body = bytearray(HEADER.pack(frame_type, seq & 0xFFFF,
+                                 min(max(int(latency_ms), 0), 0xFFFF), len(entries)))
+    for class_id, quantity, score in entries:
+        body.append(class_id & 0xFF)
+        body.append(min(quantity, 255))
+        body.append(min(max(int(score * 255 + 0.5), 0), 255))
+    return SYNC + bytes(body) + CRC.pack(crc16(body))
+
+
+def parse_proto_reply(line):
+    """
+    Parse the device reply to a "proto=..." command.
+
+    Returns:
+        ("bin", labels), ("text", []) or None if the line is not a PROTO reply
+    """
+    if not line.startswith("PROTO|"):
+        return None
+    parts = line.split("|", 2)
+    if len(parts) >= 2 and parts[1] == "bin":
+        labels = parts[2].split(",") if len(parts) == 3 and parts[2] else []
+        return ("bin", labels)
+    return ("text", [])
+
+
+def parse_report_reply(line):
+    """
+    Parse the device reply to a "report=..." command.
+
+    Returns:
+        ("change", heartbeat_ms), ("every", None) or None if the line is not
+        a REPORT reply
+    """
+    if not line.startswith("REPORT|"):
+        return None
+    parts = line.split("|")
+    if len(parts) >= 2 and parts[1] == "change":
+        try:
+            return ("change", int(parts[2]))
+        except (IndexError, ValueError):
+            return ("change", None)
+    return ("every", None)
+
+
+class StreamDecoder:
+    """
+    Split the raw serial byte stream into text lines and binary frames.
+
+    feed() takes whatever bytes were read and returns a list of events, either
+    ("line", bytes) or ("frame", DetectionFrame). Partial lines and frames are
+    kept in one reusable bytearray until the rest arrives; bytes of a partial
+    line that were already searched are not searched again.
+
+    A sync word only starts a frame if the frame type and CRC that follow it
+    check out. Anything else is text up to the next newline or valid frame,
+    so a 0xA5 inside a text line (it is also a UTF-8 continuation byte, e.g.
+    in the yen sign, C2 A5) stays in the line, and after a dropped or corrupt
+    byte the decoder is in step again at the next intact frame.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.scanned = 0  # Leading bytes of buffer known to hold no newline or frame
+        self.crc_errors = 0
+
+    def _frame_at(self, buffer, view, pos, size):
+        """
+        Check for a frame starting at buffer[pos].
+
+        Returns:
+            (frame_size, frame) for a valid frame, (0, None) if there is no
+            frame at pos, or (None, None) while more bytes are needed to tell
+        """
+        if size - pos < len(SYNC) + 1:
+            return None, None
+        if buffer[pos + 1] != SYNC[1] or buffer[pos + 2] not in FRAME_TYPES:
+            return 0, None
+        if size - pos < MIN_FRAME_SIZE:
+            return None, None  # Wait for the rest of the header
+
+        frame_type, seq, latency_ms, count = HEADER.unpack_from(buffer, pos + len(SYNC))
+        frame_size = MIN_FRAME_SIZE + count * ENTRY_SIZE
+        if size - pos < frame_size:
+            return None, None  # Wait for the rest of the frame
+
+        body_start = pos + len(SYNC)
+        crc_start = pos + frame_size - CRC_SIZE
+        expected = CRC.unpack_from(buffer, crc_start)[0]
+        if crc16(view[body_start:crc_start]) != expected:
+            self.crc_errors += 1
+            return 0, None
+
+        entries = []
+        entry_pos = body_start + HEADER.size
+        for _ in range(count):
+            entries.append((buffer[entry_pos], buffer[entry_pos + 1], buffer[entry_pos + 2] / 255.0))
+            entry_pos += ENTRY_SIZE
+        return frame_size, DetectionFrame(seq, latency_ms, entries, frame_type)
+
+    def feed(self, data):
+        """Add received bytes and return the complete events found so far"""
+        buffer = self.buffer
+        buffer.extend(data)
+        events = []
+        pos = 0
+        size = len(buffer)
+        scan_from = self.scanned
+        self.scanned = 0
+
+        view = memoryview(buffer)
+        try:
+            while pos < size:
+                if buffer[pos] == SYNC_BYTE and pos >= scan_from:
+                    frame_size, frame = self._frame_at(buffer, view, pos, size)
+                    if frame_size is None:
+                        break
+                    if frame_size:
+                        events.append(("frame", frame))
+                        pos += frame_size
+                        continue
+                    # Not a frame: the sync byte starts a text line
+
+                # Text: everything up to the next newline, or up to a valid
+                # frame that starts before it
+                newline = buffer.find(b'\n', max(pos, scan_from))
+                line_end = size if newline == -1 else newline + 1
+                search = max(pos + 1, scan_from)
+                waiting = False
+                while True:
+                    sync = buffer.find(SYNC[:1], search, line_end)
+                    if sync == -1:
+                        break
+                    frame_size, frame = self._frame_at(buffer, view, sync, size)
+                    if frame_size is None:
+                        # Can't tell yet, keep the text until the rest is here
+                        self.scanned = sync - pos
+                        waiting = True
+                        break
+                    if frame_size:
+                        # Text interrupted by a frame, hand over what we have
+                        events.append(("line", bytes(view[pos:sync])))
+                        events.append(("frame", frame))
+                        pos = sync + frame_size
+                        break
+                    search = sync + 1
+                if waiting:
+                    break
+                if sync != -1:
+                    continue
+
+                if newline == -1:
+                    if size - pos > MAX_LINE_LENGTH:
+                        # No newline in sight, flush what we have as a line
+                        events.append(("line", bytes(view[pos:])))
+                        pos = size
+                    else:
+                        # Partial line, remember how much of it was searched
+                        self.scanned = size - pos
+                    break
+
+                events.append(("line", bytes(view[pos:newline + 1])))
+                pos = newline + 1
+        finally:
+            # The bytearray can't be resized while a view of it exists
+            view.release()
+
+        del buffer[:pos]
+        return events
+
+
+class SequenceTracker:
+    """Count frames lost on the link from gaps in the 16-bit sequence number"""
+
+    def __init__(self):
+        self.last_seq = None
+        self.received = 0
+        self.dropped = 0
+
+    def reset(self):
+        self.last_seq = None
+
+    def update(self, seq):
+        """Record a received sequence number and return how many frames were skipped"""
+        missing = 0
+        if self.last_seq is not None:
+            missing = (seq - self.last_seq - 1) & 0xFFFF
+            # A huge gap means the device restarted its counter, not 60k lost frames
+            if missing > 0x8000:
+                missing = 0
+        self.last_seq = seq
+        self.received += 1
+        self.dropped += missing
+        return missing
+
+
+class Keepalive:
+    """
+    When the device was last heard from, and whether it has gone silent.
+
+    heard() is called for every report or heartbeat; with a timeout set,
+    silent() becomes true once nothing arrived for that long. Without a
+    timeout (every frame is reported) the device is never considered silent.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.last_heard = None
+
+    def heard(self, now=None):
+        self.last_heard = time.monotonic() if now is None else now
+
+    def set_heartbeat(self, heartbeat_ms):
+        """Expect a heartbeat every heartbeat_ms (None stops watching)"""
+        self.timeout = None if heartbeat_ms is None else heartbeat_ms * HEARTBEAT_MISSES / 1000.0
+
+    def silence(self, now=None):
+        """Seconds since the device was last heard from, None if never"""
+        if self.last_heard is None:
+            return None
+        return (time.monotonic() if now is None else now) - self.last_heard
+
+    def silent(self, now=None):
+        if self.timeout is None or self.last_heard is None:
+            return False
+        return self.silence(now) > self.timeout
+
+
+def read_available(port):
+    """
+    Block until data arrives on a serial port and return everything available.
+
+    The first read waits for one byte (up to the port timeout) inside the
+    driver instead of polling in_waiting, then whatever else has arrived is
+    picked up with a second non-blocking read. Returns b'' on timeout.
+    """
+    data = port.read(port.in_waiting or 1)
+    if data:
+        waiting = port.in_waiting
+        if waiting:
+            data += port.read(waiting)
+    return data
@@ -0,0 +1,237 @@
+# Hot-plug port discovery and reconnection
+#
+# PortWatcher lists the serial ports (and emulated devices) on a background
+# thread every interval and reports the ports that appeared or went away, so
+# nothing on the Tk thread or the lane event loop waits for the OS. When a
+# device's link breaks, a Reconnector decides when the next attempt to open
+# the port again is due: at once, then with exponential backoff (with some
+# jitter, so lanes that lost their ports together don't retry in lockstep),
+# and at once again when the watcher sees the port come back. The time from
+# losing the link to the first report after reopening it is kept as the
+# recovery time. A Reconnector is shared by the thread that reads the port and
+# the one that closes it on request, so its state changes under a lock.
+import glob
+import os
+import random
+import threading
+import time
+
+from latency_stats import LatencyWindow
+
+# Devices emulated by src/tools/nicla_emulator.py are listed with the real ports
+EMULATOR_PORT_GLOB = os.environ.get("SMART_RETAIL_EMULATOR_GLOB", "/tmp/nicla-emulator-*")
+
+# How often the watcher lists the ports
+WATCH_INTERVAL = 1.0
+
+# Delay before the second attempt to reopen a lost port, doubled after every
+# failed attempt up to BACKOFF_MAX (all in seconds)
+BACKOFF_INITIAL = 0.25
+BACKOFF_FACTOR = 2.0
+BACKOFF_MAX = 5.0
+BACKOFF_JITTER = 0.1
+
+
+def discover_ports(emulator_glob=EMULATOR_PORT_GLOB):
+    """Names of the serial ports and emulated devices; slow on some systems, so called off the Tk thread"""
+    # Imported here so the import is paid on a background thread, not before the splash screen
+    import serial.tools.list_ports
+    ports = [port.device for port in serial.tools.list_ports.comports()]
+    return ports + sorted(glob.glob(emulator_glob))
+
+
+class Backoff:
+    """Delays between retries: initial, then factor times longer each time up to maximum, +/- jitter"""
+
+    def __init__(self, initial=BACKOFF_INITIAL, maximum=BACKOFF_MAX, factor=BACKOFF_FACTOR, jitter=BACKOFF_JITTER,
+                 rng=None):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.attempts = 0
+
+    def next_delay(self):
+        """Seconds to wait before the next attempt"""
+        delay = min(self.maximum, self.initial * self.factor ** self.attempts)
+        self.attempts += 1
+        return delay * (1.0 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def reset(self):
+        self.attempts = 0
+
+
+class Reconnector:
+    """
+    Reconnection state of one device link.
+
+    lost() when the link breaks; the first attempt is due at once. Every
+    failed() attempt pushes the next one back by the backoff delay, and
+    port_appeared() (the watcher saw the port again) makes it due at once.
+    reopened() once the port is open again, and recovered() at the first
+    report after that, which returns the recovery time in milliseconds.
+    All methods may be called from any thread.
+    """
+
+    def __init__(self, backoff=None):
+        self.lock = threading.RLock()
+        self.backoff = backoff or Backoff()
+        self.lost_at = None
+        self.next_attempt = None
+        self.reopened_at = None
+        self.reason = None
+        self.attempts = 0
+        self.recoveries = LatencyWindow()
+
+    @property
+    def reconnecting(self):
+        """The link is lost and the port not open again yet"""
+        with self.lock:
+            return self.lost_at is not None and self.reopened_at is None
+
+    @property
+    def recovering(self):
+        """The port is open again, waiting for the first report"""
+        with self.lock:
+            return self.reopened_at is not None
+
+    def lost(self, reason=None, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.lost_at is None:
+                self.lost_at = now
+                self.attempts = 0
+            self.reason = reason
+            self.reopened_at = None
+            self.next_attempt = now
+            self.backoff.reset()
+
+    def due(self, now=None):
+        """Whether an attempt to reopen the port should be made now"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return self.reconnecting and now >= self.next_attempt
+
+    def wait(self, now=None):
+        """Seconds until the next attempt is due (0 when due, None when not reconnecting)"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if not self.reconnecting:
+                return None
+            return max(0.0, self.next_attempt - now)
+
+    def failed(self, reason=None, now=None):
+        """An attempt failed; returns the seconds until the next one"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.attempts += 1
+            self.reason = reason
+            delay = self.backoff.next_delay()
+            self.next_attempt = now + delay
+            return delay
+
+    def port_appeared(self, now=None):
+        """The port is listed again, so try it without waiting out the backoff"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.reconnecting:
+                self.next_attempt = now
+
+    def reopened(self, now=None):
+        """
+        The port is open again.
+
+        Returns False, and records nothing, if the link was closed on purpose
+        (cancel()) while the port was being opened; the caller closes it again.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if not self.reconnecting:
+                return False
+            self.attempts += 1
+            self.reopened_at = now
+            return True
+
+    def recovered(self, now=None):
+        """The first report since reopen(); returns the recovery time in ms (None if nothing was lost)"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.reopened_at is None:
+                return None
+            ms = (now - self.lost_at) * 1000.0
+            self.recoveries.add(ms)
+            self.cancel()
+            return ms
+
+    def cancel(self):
+        """Stop reconnecting (the link was closed on purpose)"""
+        with self.lock:
+            self.lost_at = None
+            self.next_attempt = None
+            self.reopened_at = None
+            self.reason = None
+
+
+class PortWatcher:
+    """
+    Lists the ports every interval on a daemon thread and calls
+    on_change(ports, added, removed) from that thread when the list changed
+    (the first listing counts as every port being added).
+
+    Args:
+        on_change: Callback; must hand the result to its own thread
+        on_error: Optional callback(exception) when listing fails, once per
+            distinct error
+        interval: Seconds between listings
+        discover: Function returning the port names
+    """
+
+    def __init__(self, on_change, on_error=None, interval=WATCH_INTERVAL, discover=discover_ports):
+        self.on_change = on_change
+        self.on_error = on_error
+        self.interval = interval
+        self.discover = discover
+        self.ports = None
+        self.error = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def refresh(self):
+        """List the ports now instead of at the next interval"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            forced = self._wake.is_set()
+            self._wake.clear()
+            self.check(forced)
+            self._wake.wait(self.interval)
+
+    def check(self, forced=False):
+        """List the ports once and report the changes (or every port, when forced)"""
+        try:
+            ports = self.discover()
+        except Exception as e:
+            if str(e) != self.error:
+                self.error = str(e)
+                if self.on_error:
+                    self.on_error(e)
+            return
+        self.error = None
+        previous = set(self.ports or [])
+        added = [port for port in ports if port not in previous]
+        removed = [port for port in (self.ports or []) if port not in ports]
+        if self.ports is None or added or removed or forced:
+            self.ports = ports
+            self.on_change(ports, added, removed)
@@ -0,0 +1,162 @@
+# Recording and replay of serial sessions with the Nicla Vision
+#
+# SessionRecorder appends every chunk of bytes received from the device to a
+# compact binary file together with a monotonic timestamp. ReplayPort reads
+# such a file back and behaves enough like serial.Serial for the reader thread
+# (read, in_waiting, write, close), so a recorded counter session goes through
+# the real reader, parser and GUI pipeline at 1x, Nx or maximum speed.
+#
+# File format: the 8 byte magic b"SRVREC1\n" followed by records of
+#   elapsed_ns (u64) | length (u32) | data (length bytes)
+# with elapsed_ns counted from the start of the recording, little-endian.
+import os
+import struct
+import time
+
+MAGIC = b"SRVREC1\n"
+RECORD = struct.Struct("<QI")
+
+# Largest chunk handed out by ReplayPort.in_waiting at maximum speed
+MAX_REPLAY_CHUNK = 64 * 1024
+
+# File extension used for recordings
+SESSION_EXTENSION = ".srec"
+
+# A port named "replay:<file>" plays a recording back instead
+REPLAY_PREFIX = "replay:"
+
+
+class SessionRecorder:
+    """Append received bytes with their arrival time to a session file"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.start_ns = time.monotonic_ns()
+        self.bytes_recorded = 0
+
+    def record(self, data):
+        """Store one chunk of received bytes"""
+        if not data or self.file is None:
+            return
+        elapsed_ns = time.monotonic_ns() - self.start_ns
+        self.file.write(RECORD.pack(elapsed_ns, len(data)))
+        self.file.write(data)
+        self.bytes_recorded += len(data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_session(path):
+    """Yield (elapsed_ns, data) records from a session file"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a serial session recording")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            elapsed_ns, length = RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return  # Truncated last record (recording was interrupted)
+            yield elapsed_ns, data
+
+
+class ReplayPort:
+    """
+    Play a session file back through a serial.Serial-like interface.
+
+    Args:
+        path: Session file written by SessionRecorder
+        speed: Playback speed factor (1 = real time); 0 or None replays as
+            fast as the reader can consume the data
+        timeout: Longest a read() blocks waiting for data, like serial.Serial
+    """
+
+    def __init__(self, path, speed=1.0, timeout=1.0):
+        self.path = path
+        self.port = f"{REPLAY_PREFIX}{path}"
+        self.speed = speed or 0
+        self.timeout = timeout
+        self.is_open = True
+        self.finished = False
+
+        self.records = read_session(path)
+        self.next_record = None
+        self.pending = bytearray()
+
+        self.start_time = time.monotonic()
+        self.bytes_replayed = 0
+        self.written = []  # Commands the application sent, for inspection
+
+    def _due_time(self, elapsed_ns):
+        if not self.speed:
+            return 0.0
+        return self.start_time + elapsed_ns / 1e9 / self.speed
+
+    def _peek(self):
+        if self.next_record is None and not self.finished:
+            self.next_record = next(self.records, None)
+            if self.next_record is None:
+                self.finished = True
+        return self.next_record
+
+    def _collect_due(self):
+        """Move every record whose time has come into the pending buffer"""
+        now = time.monotonic()
+        while len(self.pending) < MAX_REPLAY_CHUNK:
+            record = self._peek()
+            if record is None or self._due_time(record[0]) > now:
+                break
+            self.pending.extend(record[1])
+            self.next_record = None
+
+    @property
+    def in_waiting(self):
+        self._collect_due()
+        return len(self.pending)
+
+    def read(self, size=1):
+        """Return up to size bytes, blocking until they are due or the timeout expires"""
+        if not self.is_open:
+            raise OSError("Replay port is closed")
+
+        self._collect_due()
+        if not self.pending:
+            record = self._peek()
+            if record is None:
+                # End of the recording: behave like an idle port
+                time.sleep(self.timeout)
+                return b""
+            wait = self._due_time(record[0]) - time.monotonic()
+            if wait > self.timeout:
+                time.sleep(self.timeout)
+                return b""
+            if wait > 0:
+                time.sleep(wait)
+            self._collect_due()
+
+        data = bytes(self.pending[:size])
+        del self.pending[:size]
+        self.bytes_replayed += len(data)
+        return data
+
+    def write(self, data):
+        # The recording can't react to commands; keep them for inspection
+        self.written.append(bytes(data))
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+        self.records.close()
+
+    def elapsed(self):
+        return time.monotonic() - self.start_time
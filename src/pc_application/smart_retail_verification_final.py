@@ -1,837 +1,1547 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
-import serial
-import serial.tools.list_ports
-import threading
-import time
-from PIL import Image, ImageTk  # For handling the splash image
-import os
-
-# Define the product catalog with prices
-product_catalog = [
-    {"name": "Apple", "price": 00.00},
-    {"name": "Banana", "price": 00.00},
-    {"name": "Orange", "price": 00.00},
-    {"name": "Water", "price": 00.00},
-    {"name": "Soda", "price": 00.00},
-    {"name": "Chips", "price": 00.00},
-    {"name": "KitKat", "price": 25.00},
-    {"name": "goodday", "price": 25.00},
-    {"name": "HidenSeek", "price": 30.00},
-    {"name": "Unibic", "price": 30.00},
-]
-
-class SplashScreen:
-    def __init__(self, root):
-        self.root = root
-        self.root.overrideredirect(True)  # Remove window decorations for splash screen
-        self.root.geometry("800x600")  # Set a size for the splash screen
-        self.root.configure(bg="#f0f0f0")
-        
-        # Center the window on the screen
-        screen_width = root.winfo_screenwidth()
-        screen_height = root.winfo_screenheight()
-        x = (screen_width - 800) // 2
-        y = (screen_height - 600) // 2
-        self.root.geometry(f"800x600+{x}+{y}")
-        
-        try:
-            # Load the splash image
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            img_path = os.path.join(script_dir, "init.jpg")
-            
-            # Check if the file exists
-            if not os.path.exists(img_path):
-                raise FileNotFoundError(f"Splash image not found at {img_path}")
-                
-            # Open the original image
-            img = Image.open(img_path)
-            
-            # Calculate the aspect ratio
-            original_width, original_height = img.size
-            aspect_ratio = original_width / original_height
-            
-            # Set splash window size maintaining aspect ratio
-            window_width = 800
-            window_height = int(window_width / aspect_ratio)
-            
-            # Update the window size
-            self.root.geometry(f"{window_width}x{window_height}")
-            
-            # Resize the image to fit the splash window while maintaining aspect ratio
-            img = img.resize((window_width, window_height), Image.LANCZOS)
-            self.splash_img = ImageTk.PhotoImage(img)
-            
-            # Create a label with the image
-            splash_label = tk.Label(self.root, image=self.splash_img)
-            splash_label.pack(fill=tk.BOTH, expand=True)
-            
-            # Update the window to show the splash image
-            self.root.update()
-            
-            # Schedule the transition to main application after 4 seconds
-            self.root.after(4000, self.close_splash)
-            
-        except Exception as e:
-            # If there's an error loading the splash image, log it and proceed to main app
-            print(f"Error loading splash screen: {str(e)}")
-            self.root.after(100, self.close_splash)
-    
-    def close_splash(self):
-        """Close the splash screen and initialize the main application"""
-        # Hide the splash screen
-        self.root.withdraw()
-        
-        # Restore normal window behavior
-        self.root.overrideredirect(False)
-        
-        # Create a new toplevel window for the main application
-        main_window = tk.Toplevel(self.root)
-        main_window.title("Smart Retail Verification System | Edge_AI_CP_330 | Tanisha Bhatia | Shubham Lanjewar | Prof. Pandarasamy Arjunan")
-        main_window.geometry("1000x700")  # Slightly larger to accommodate prices
-        
-        # Make this window behave like a main window
-        main_window.protocol("WM_DELETE_WINDOW", self.root.destroy)
-        
-        # Create and show the main application window
-        app = RetailVerificationSystem(main_window)
-        
-        # Show the main window and hide the root window
-        main_window.deiconify()
-        self.root.withdraw()
-        
-        # Keep a reference to the main window and app to prevent garbage collection
-        self.main_window = main_window
-        self.app = app
-
-
-class RetailVerificationSystem:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Smart Retail Verification System | Edge_AI_CP_330 | Tanisha Bhatia | Shubham Lanjewar | Prof. Pandarasamy Arjunan")
-        self.root.geometry("1000x700")  # Increased to accommodate prices
-        self.root.configure(bg="#f0f0f0")
-        
-        # Create a main canvas with scrollbar
-        self.main_canvas = tk.Canvas(self.root, bg="#f0f0f0")
-        self.scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=self.main_canvas.yview)
-        
-        # Place canvas and scrollbar in root window using grid
-        self.main_canvas.grid(row=0, column=0, sticky="nsew")
-        self.scrollbar.grid(row=0, column=1, sticky="ns")
-        
-        # Configure the canvas to work with the scrollbar
-        self.main_canvas.configure(yscrollcommand=self.scrollbar.set)
-        
-        # Create a frame inside the canvas to hold all widgets
-        self.content_frame = ttk.Frame(self.main_canvas)
-        
-        # Add the content frame to the canvas
-        self.canvas_frame = self.main_canvas.create_window((0, 0), window=self.content_frame, anchor="nw")
-        
-        # Configure root window grid
-        self.root.grid_rowconfigure(0, weight=1)
-        self.root.grid_columnconfigure(0, weight=1)
-        
-        # Serial connection variables
-        self.serial_port = None
-        self.is_connected = False
-        self.detected_items = []
-        
-        # Raw data buffer for debugging
-        self.raw_data_buffer = []
-        
-        # Create a dictionary of product names -> prices for easy lookup
-        self.product_prices = {product["name"]: product["price"] for product in product_catalog}
-        
-        # Create GUI components
-        self.create_widgets()
-        
-        # Start a thread to listen for serial data
-        self.should_stop = False
-        self.serial_thread = None
-        
-        # Automatically find available ports
-        self.refresh_ports()
-        
-        # Bind events for scrolling
-        self.content_frame.bind("<Configure>", self.on_frame_configure)
-        self.main_canvas.bind("<Configure>", self.on_canvas_configure)
-        
-        # Bind mousewheel for scrolling
-        self.main_canvas.bind_all("<MouseWheel>", self.on_mousewheel)
-        
-        # Update idletasks to ensure content_frame has the correct size
-        self.content_frame.update_idletasks()
-        
-        # Update the scrollable region
-        self.main_canvas.configure(scrollregion=self.main_canvas.bbox("all"))
-        
-        # Calculate the initial total (which should be 0)
-        self.calculate_total()
-    
-    def on_frame_configure(self, event):
-        """Reset the scroll region to encompass the inner frame"""
-        self.main_canvas.configure(scrollregion=self.main_canvas.bbox("all"))
-    
-    def on_canvas_configure(self, event):
-        """When canvas is resized, update the window size"""
-        # Update the width of the content frame to match the canvas
-        canvas_width = event.width
-        self.main_canvas.itemconfig(self.canvas_frame, width=canvas_width)
-    
-    def on_mousewheel(self, event):
-        """Handle mousewheel scrolling"""
-        self.main_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-    
-    def create_widgets(self):
-        # Main frame
-        main_frame = ttk.Frame(self.content_frame, padding=20)
-        main_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Connection frame
-        connection_frame = ttk.LabelFrame(main_frame, text="Device Connection", padding=10)
-        connection_frame.pack(fill=tk.X, pady=10)
-        
-        # Port selection
-        ttk.Label(connection_frame, text="Port:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
-        
-        self.port_var = tk.StringVar()
-        self.port_combo = ttk.Combobox(connection_frame, textvariable=self.port_var, width=20)
-        self.port_combo.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
-        
-        self.refresh_button = ttk.Button(connection_frame, text="Refresh", command=self.refresh_ports)
-        self.refresh_button.grid(row=0, column=2, padx=5, pady=5)
-        
-        self.connect_button = ttk.Button(connection_frame, text="Connect", command=self.toggle_connection)
-        self.connect_button.grid(row=0, column=3, padx=5, pady=5)
-        
-        # Baud rate selection
-        ttk.Label(connection_frame, text="Baud Rate:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
-        self.baud_var = tk.StringVar(value="115200")
-        baud_rates = ["9600", "19200", "38400", "57600", "115200", "230400"]
-        self.baud_combo = ttk.Combobox(connection_frame, textvariable=self.baud_var, values=baud_rates, width=20)
-        self.baud_combo.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
-        
-        # Status indicator
-        self.status_label = ttk.Label(connection_frame, text="Status: Disconnected", foreground="red")
-        self.status_label.grid(row=0, column=4, padx=5, pady=5, rowspan=2)
-        
-        # Manual entry frame
-        manual_frame = ttk.LabelFrame(main_frame, text="Biller Item Entry", padding=10)
-        manual_frame.pack(fill=tk.X, pady=10)
-        
-        # Item entry - REPLACED text entry with combobox
-        ttk.Label(manual_frame, text="Item:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
-        
-        # Create item combobox with product catalog names
-        product_names = [product["name"] for product in product_catalog]
-        self.item_var = tk.StringVar()
-        self.item_combo = ttk.Combobox(manual_frame, textvariable=self.item_var, values=product_names, width=20)
-        self.item_combo.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
-        
-        # When an item is selected, show its price
-        self.item_combo.bind("<<ComboboxSelected>>", self.display_selected_price)
-        
-        # Price display
-        ttk.Label(manual_frame, text="Price (₹):").grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
-        self.price_var = tk.StringVar(value="0.00")
-        price_display = ttk.Label(manual_frame, textvariable=self.price_var)
-        price_display.grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
-        
-        # Quantity entry
-        ttk.Label(manual_frame, text="Quantity:").grid(row=0, column=4, padx=5, pady=5, sticky=tk.W)
-        self.quantity_entry = ttk.Spinbox(manual_frame, from_=1, to=100, width=5)
-        self.quantity_entry.grid(row=0, column=5, padx=5, pady=5, sticky=tk.W)
-        self.quantity_entry.delete(0, tk.END)
-        self.quantity_entry.insert(0, "1")
-        
-        # Add item button
-        self.add_button = ttk.Button(manual_frame, text="Add Item", command=self.add_item)
-        self.add_button.grid(row=0, column=6, padx=5, pady=5)
-        
-        # Display frames
-        display_frame = ttk.Frame(main_frame)
-        display_frame.pack(fill=tk.BOTH, expand=True, pady=10)
-        
-        # Biller items frame
-        biller_frame = ttk.LabelFrame(display_frame, text="Biller Items", padding=10)
-        biller_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
-        
-        # Biller items treeview - added Price and Total columns
-        self.biller_tree = ttk.Treeview(biller_frame, columns=("Item", "Price", "Quantity", "Total"), show="headings", height=6)
-        self.biller_tree.heading("Item", text="Item")
-        self.biller_tree.heading("Price", text="Price (₹)")
-        self.biller_tree.heading("Quantity", text="Qty")
-        self.biller_tree.heading("Total", text="Total (₹)")
-        self.biller_tree.column("Item", width=150)
-        self.biller_tree.column("Price", width=70)
-        self.biller_tree.column("Quantity", width=50)
-        self.biller_tree.column("Total", width=80)
-        self.biller_tree.pack(fill=tk.BOTH, expand=True)
-        
-        biller_scrollbar = ttk.Scrollbar(biller_frame, orient="vertical", command=self.biller_tree.yview)
-        biller_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.biller_tree.configure(yscrollcommand=biller_scrollbar.set)
-        
-        # Total price frame below the biller items
-        total_frame = ttk.Frame(biller_frame)
-        total_frame.pack(fill=tk.X, pady=5)
-        
-        # Total price label
-        ttk.Label(total_frame, text="TOTAL:", font=("Arial", 12, "bold")).pack(side=tk.LEFT, padx=5)
-        self.total_price_var = tk.StringVar(value="₹0.00")
-        ttk.Label(total_frame, textvariable=self.total_price_var, font=("Arial", 12, "bold")).pack(side=tk.RIGHT, padx=5)
-        
-        # Detected items frame
-        detected_frame = ttk.LabelFrame(display_frame, text="Detected Items", padding=10)
-        detected_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5)
-        
-        # Detected items treeview - added Price column
-        self.detected_tree = ttk.Treeview(detected_frame, columns=("Item", "Count", "Price", "Confidence"), show="headings", height=6)
-        self.detected_tree.heading("Item", text="Item")
-        self.detected_tree.heading("Count", text="Count")
-        self.detected_tree.heading("Price", text="Price (₹)")
-        self.detected_tree.heading("Confidence", text="Confidence")
-        self.detected_tree.column("Item", width=150)
-        self.detected_tree.column("Count", width=50)
-        self.detected_tree.column("Price", width=70)
-        self.detected_tree.column("Confidence", width=100)
-        self.detected_tree.pack(fill=tk.BOTH, expand=True)
-        
-        detected_scrollbar = ttk.Scrollbar(detected_frame, orient="vertical", command=self.detected_tree.yview)
-        detected_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.detected_tree.configure(yscrollcommand=detected_scrollbar.set)
-        
-        # Control buttons frame
-        button_frame = ttk.Frame(main_frame)
-        button_frame.pack(fill=tk.X, pady=10)
-        
-        # Clear button
-        self.clear_button = ttk.Button(button_frame, text="Clear All", command=self.clear_all)
-        self.clear_button.pack(side=tk.LEFT, padx=5)
-        
-        # Command buttons frame for Nicla Vision controls
-        command_frame = ttk.Frame(button_frame)
-        command_frame.pack(side=tk.LEFT, padx=20)
-        
-        # Start/Stop/Status buttons
-        self.start_button = ttk.Button(command_frame, text="Start Detection", command=lambda: self.send_command("start"))
-        self.start_button.pack(side=tk.LEFT, padx=5)
-        
-        self.stop_button = ttk.Button(command_frame, text="Stop Detection", command=lambda: self.send_command("stop"))
-        self.stop_button.pack(side=tk.LEFT, padx=5)
-        
-        self.status_button = ttk.Button(command_frame, text="Get Status", command=lambda: self.send_command("status"))
-        self.status_button.pack(side=tk.LEFT, padx=5)
-        
-        # Test Connection button
-        self.test_button = ttk.Button(command_frame, text="Test Connection", command=self.test_connection)
-        self.test_button.pack(side=tk.LEFT, padx=5)
-        
-        # DEBUG: Force update button to manually trigger detection update
-        self.force_update_button = ttk.Button(command_frame, text="DEBUG: Force Update", command=self.force_update)
-        self.force_update_button.pack(side=tk.LEFT, padx=5)
-        
-        # VERY PROMINENT Verify button - moved above Raw Data section
-        verify_frame = ttk.Frame(main_frame)
-        verify_frame.pack(fill=tk.X, pady=10)
-        
-        self.verify_button = tk.Button(
-            verify_frame, 
-            text="VERIFY ITEMS", 
-            command=self.verify_items,
-            bg="green",
-            fg="white",
-            font=("Arial", 14, "bold"),
-            height=2,
-            width=20
-        )
-        self.verify_button.pack(side=tk.TOP, pady=10)
-        
-        # Raw data display frame - now below the VERIFY ITEMS button
-        raw_data_frame = ttk.LabelFrame(main_frame, text="Raw Data from Nicla Vision", padding=10)
-        raw_data_frame.pack(fill=tk.X, pady=10)
-        
-        # Raw data text area
-        self.raw_data_text = scrolledtext.ScrolledText(raw_data_frame, height=5, width=80, wrap=tk.WORD)
-        self.raw_data_text.pack(fill=tk.BOTH, expand=True)
-        
-        # Debug output frame
-        debug_frame = ttk.LabelFrame(main_frame, text="Debug Output", padding=10)
-        debug_frame.pack(fill=tk.X, pady=10)
-        
-        # Debug text
-        self.debug_text = scrolledtext.ScrolledText(debug_frame, height=5, width=80, wrap=tk.WORD)
-        self.debug_text.pack(fill=tk.BOTH, expand=True)
-        
-        # Status message
-        self.message_var = tk.StringVar()
-        self.message_var.set("Ready for verification")
-        self.message_label = ttk.Label(main_frame, textvariable=self.message_var, font=("Arial", 12), foreground="blue")
-        self.message_label.pack(fill=tk.X, pady=5)
-    
-    def display_selected_price(self, event=None):
-        """Update the price display when an item is selected"""
-        selected_item = self.item_var.get()
-        if selected_item in self.product_prices:
-            price = self.product_prices[selected_item]
-            self.price_var.set(f"{price:.2f}")
-        else:
-            self.price_var.set("0.00")
-    
-    def calculate_total(self):
-        """Calculate the total price of all items in the biller tree"""
-        total = 0.0
-        for item_id in self.biller_tree.get_children():
-            values = self.biller_tree.item(item_id, 'values')
-            if len(values) >= 4:  # Make sure we have enough values (including total)
-                try:
-                    item_total = float(values[3])  # Total column
-                    total += item_total
-                except (ValueError, TypeError):
-                    self.log_debug(f"Error calculating total for item: {values}")
-        
-        # Update the total price display
-        self.total_price_var.set(f"₹{total:.2f}")
-        self.log_debug(f"Total price updated: ₹{total:.2f}")
-    
-    def force_update(self):
-        """Debug function to manually trigger an update with test data"""
-        self.log_debug("Forcing update with test data")
-        test_detections = [
-            {"class": "Apple", "quantity": 2, "score": 0.95},
-            {"class": "KitKat", "quantity": 1, "score": 0.85},
-            {"class": "Chips", "quantity": 3, "score": 0.75}
-        ]
-        self.process_detections(test_detections)
-    
-    def test_connection(self):
-        """Test the connection with a simple command"""
-        if not self.is_connected or not self.serial_port:
-            messagebox.showwarning("Connection Required", "Please connect to the Nicla Vision device first")
-            return
-        
-        try:
-            # Send a newline character to trigger a response
-            self.serial_port.write(b'\r\n')
-            self.log_debug("Sent test newline character")
-            self.log_raw_data('\r\n', is_incoming=False)
-        except Exception as e:
-            self.log_debug(f"Error sending test: {str(e)}")
-    
-    def refresh_ports(self):
-        """Find all available serial ports"""
-        available_ports = [port.device for port in serial.tools.list_ports.comports()]
-        self.port_combo['values'] = available_ports
-        
-        if available_ports:
-            self.port_var.set(available_ports[0])
-            self.log_debug(f"Found ports: {available_ports}")
-        else:
-            self.port_var.set("")
-            self.log_debug("No serial ports found! Check your device connection.")
-    
-    def log_debug(self, message):
-        """Add a message to the debug output"""
-        timestamp = time.strftime("%H:%M:%S")
-        self.debug_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.debug_text.see(tk.END)
-        print(message)  # Also print to console
-    
-    def log_raw_data(self, data, is_incoming=True):
-        """Add raw data to the raw data display"""
-        timestamp = time.strftime("%H:%M:%S")
-        direction = "<<" if is_incoming else ">>"
-        
-        # Make sure we have a string
-        if isinstance(data, bytes):
-            data = data.decode('utf-8', errors='replace')
-            
-        entry = f"[{timestamp}] {direction} {data}"
-        
-        # Update display
-        self.raw_data_text.insert(tk.END, entry + "\n")
-        self.raw_data_text.see(tk.END)
-        
-        # Also print to console for debugging
-        print(f"RAW: {entry}")
-    
-    def toggle_connection(self):
-        if not self.is_connected:
-            self.connect_device()
-        else:
-            self.disconnect_device()
-    
-    def connect_device(self):
-        try:
-            port = self.port_var.get()
-            baud_rate = int(self.baud_var.get())
-            
-            if not port:
-                self.log_debug("Error: No port selected!")
-                messagebox.showerror("Connection Error", "No port selected")
-                return
-            
-            self.log_debug(f"Attempting to connect to {port} at {baud_rate} baud...")
-            
-            # Try to open the serial port
-            self.serial_port = serial.Serial(port, baud_rate, timeout=1)
-            self.is_connected = True
-            self.status_label.config(text="Status: Connected", foreground="green")
-            self.connect_button.config(text="Disconnect")
-            
-            self.log_debug(f"Successfully connected to {port}")
-            self.message_var.set(f"Connected to {port}")
-            
-            # Clear the raw data display
-            self.raw_data_text.delete(1.0, tk.END)
-            
-            # Start the serial thread
-            self.should_stop = False
-            self.serial_thread = threading.Thread(target=self.read_serial_data)
-            self.serial_thread.daemon = True
-            self.serial_thread.start()
-            
-            # Send a status command to test the connection
-            self.root.after(500, lambda: self.send_command("status"))
-            
-        except Exception as e:
-            self.log_debug(f"Connection error: {str(e)}")
-            messagebox.showerror("Connection Error", f"Failed to connect: {str(e)}")
-    
-    def disconnect_device(self):
-        if self.serial_port:
-            # Stop the serial thread
-            self.should_stop = True
-            if self.serial_thread:
-                self.serial_thread.join(timeout=1.0)
-            
-            self.serial_port.close()
-            self.serial_port = None
-            self.log_debug("Disconnected from device")
-        
-        self.is_connected = False
-        self.status_label.config(text="Status: Disconnected", foreground="red")
-        self.connect_button.config(text="Connect")
-        self.message_var.set("Device disconnected")
-    
-    def send_command(self, command):
-        """Send a command to the Nicla Vision"""
-        if not self.is_connected or not self.serial_port:
-            messagebox.showwarning("Connection Required", "Please connect to the Nicla Vision device first")
-            return
-        
-        try:
-            cmd_with_newline = f"{command}\r\n"
-            self.serial_port.write(cmd_with_newline.encode('utf-8'))
-            self.log_debug(f"Sent command: {command}")
-            self.log_raw_data(cmd_with_newline, is_incoming=False)
-        except Exception as e:
-            self.log_debug(f"Error sending command: {str(e)}")
-    
-    def read_serial_data(self):
-        """Thread function to read serial data from Nicla Vision"""
-        self.log_debug("Serial reading thread started")
-        
-        while not self.should_stop:
-            try:
-                if self.serial_port and self.serial_port.is_open and self.serial_port.in_waiting:
-                    # Read one line at a time
-                    line = self.serial_port.readline()
-                    
-                    # Log the raw bytes data
-                    self.log_raw_data(line, is_incoming=True)
-                    
-                    # Try to decode and process the line
-                    try:
-                        decoded_line = line.decode('utf-8', errors='replace').strip()
-                        
-                        # Check for "No objects detected" message
-                        if "No objects detected" in decoded_line:
-                            self.log_debug("No objects detected - clearing detected items list")
-                            # Clear the detected items list
-                            self.detected_items = []
-                            # Update the tree view on the main thread
-                            self.root.after(10, self._update_detected_tree)
-                            continue
-                        
-                        # DEBUG: Print the exact line we're processing
-                        self.log_debug(f"Processing line: '{decoded_line}'")
-                        
-                        # Check if this is a detection message
-                        if "Sent:" in decoded_line and "DETECTION|" in decoded_line:
-                            self.log_debug(f"Found detection in: '{decoded_line}'")
-                            
-                            # Extract the detection part after "Sent: "
-                            detection_part = decoded_line.split("Sent:", 1)[1].strip()
-                            self.log_debug(f"Detection part: '{detection_part}'")
-                            
-                            if detection_part.startswith("DETECTION|"):
-                                parts = detection_part.split("|")
-                                self.log_debug(f"Split parts: {parts}")
-                                
-                                # Create detections list
-                                detections = []
-                                for part in parts[1:]:  # Skip the "DETECTION" part
-                                    self.log_debug(f"Processing part: '{part}'")
-                                    if ":" in part:
-                                        try:
-                                            # New format: item:quantity:score
-                                            if part.count(":") == 2:
-                                                item, quantity_str, score_str = part.split(":", 2)
-                                                self.log_debug(f"Found item: '{item}', quantity: '{quantity_str}', score: '{score_str}'")
-                                                quantity = int(quantity_str)
-                                                score = float(score_str)
-                                                detections.append({
-                                                    "class": item,
-                                                    "quantity": quantity,
-                                                    "score": score
-                                                })
-                                            # Handle old format just in case: item:score
-                                            else:
-                                                item, score_str = part.split(":", 1)
-                                                self.log_debug(f"Found item (old format): '{item}', score: '{score_str}'")
-                                                score = float(score_str)
-                                                detections.append({
-                                                    "class": item,
-                                                    "quantity": 1,  # Default quantity is 1 for old format
-                                                    "score": score
-                                                })
-                                        except ValueError as ve:
-                                            self.log_debug(f"Error parsing part '{part}': {str(ve)}")
-                                
-                                if detections:
-                                    self.log_debug(f"Found {len(detections)} valid detections. Processing...")
-                                    self.process_detections(detections)
-                                else:
-                                    self.log_debug("No valid detections found in the line.")
-                                    # Clear detection list when DETECTION message has no items
-                                    self.detected_items = []
-                                    self.root.after(10, self._update_detected_tree)
-                            else:
-                                self.log_debug(f"Not a DETECTION message: {detection_part}")
-                        else:
-                            # Just log other messages
-                            if decoded_line.strip():  # Only log non-empty lines
-                                self.log_debug(f"Received message: {decoded_line}")
-                            
-                    except Exception as e:
-                        self.log_debug(f"Error processing data: {str(e)}")
-                else:
-                    # No data available, sleep briefly
-                    time.sleep(0.01)
-                    
-            except Exception as e:
-                self.log_debug(f"Serial reading error: {str(e)}")
-                time.sleep(0.1)  # Add a small delay before retrying
-        
-        self.log_debug("Serial reading thread stopped")
-    
-    def process_detections(self, detections):
-        """Process the detection data from Nicla Vision"""
-        # Check if the detections list is empty
-        if not detections:
-            self.log_debug("Empty detections list - clearing detected items")
-            self.detected_items = []
-            self.root.after(10, self._update_detected_tree)
-            return
-            
-        # Create a dictionary to count occurrences of each class and calculate average confidence
-        detection_counts = {}
-        confidence_sums = {}
-        
-        self.log_debug(f"Processing {len(detections)} detections")
-        
-        for detection in detections:
-            class_name = detection.get('class', 'Unknown')
-            quantity = detection.get('quantity', 1)  # Get quantity, default to 1 if not present
-            confidence = detection.get('score', 0.0)
-            
-            self.log_debug(f"Processing detection: class={class_name}, quantity={quantity}, confidence={confidence}")
-            
-            # Add to counts and sum confidence
-            if class_name in detection_counts:
-                detection_counts[class_name] += quantity  # Add the quantity instead of 1
-                confidence_sums[class_name] += confidence
-            else:
-                detection_counts[class_name] = quantity  # Set the initial count to the quantity
-                confidence_sums[class_name] = confidence
-        
-        # Update the detected items list
-        self.detected_items = []
-        for class_name, count in detection_counts.items():
-            avg_confidence = confidence_sums[class_name] / (count if count > 0 else 1)
-            
-            # Get the price for this item, default to 0.00 if not found
-            price = self.product_prices.get(class_name, 0.00)
-            
-            self.detected_items.append({
-                'item': class_name,
-                'count': count,
-                'price': price,
-                'confidence': avg_confidence
-            })
-        
-        # Debug output
-        self.log_debug(f"Detection counts: {detection_counts}")
-        self.log_debug(f"Confidence sums: {confidence_sums}")
-        self.log_debug(f"Detected items to display: {self.detected_items}")
-        
-        # Use explicit function to update the detected items treeview
-        self.root.after(10, self._update_detected_tree)
-    
-    def update_detected_tree(self):
-        """Schedule an update of the treeview"""
-        self.log_debug("Scheduling update of detected tree")
-        # Use after to ensure we're on the main thread
-        self.root.after(0, self._update_detected_tree)
-    
-    def _update_detected_tree(self):
-        """Internal function to update the detected tree on the main thread"""
-        try:
-            self.log_debug("Executing tree update with items: " + str(self.detected_items))
-            
-            # Clear the current items
-            for item in self.detected_tree.get_children():
-                self.detected_tree.delete(item)
-            
-            # Add the new items
-            item_count = 0
-            for item in self.detected_items:
-                item_count += 1
-                try:
-                    # Include price in the detected tree
-                    self.detected_tree.insert('', tk.END, values=(
-                        item['item'],
-                        item['count'],
-                        f"{item['price']:.2f}",
-                        f"{item['confidence']:.2f}"
-                    ))
-                    self.log_debug(f"Added item to tree: {item['item']}")
-                except Exception as e:
-                    self.log_debug(f"Error adding item {item} to tree: {str(e)}")
-            
-            self.log_debug(f"Updated detected items tree with {item_count} items")
-            
-            # Force a refresh of the tree
-            self.detected_tree.update()
-            
-        except Exception as e:
-            self.log_debug(f"Error updating detected tree: {str(e)}")
-    
-    def add_item(self):
-        """Add item to the biller's list"""
-        # Get the selected item from the combobox instead of text entry
-        item_name = self.item_var.get().strip()
-        quantity = self.quantity_entry.get()
-        
-        if not item_name:
-            messagebox.showwarning("Input Error", "Please select an item from the dropdown")
-            return
-        
-        try:
-            quantity = int(quantity)
-            if quantity <= 0:
-                raise ValueError("Quantity must be positive")
-        except ValueError:
-            messagebox.showwarning("Input Error", "Please enter a valid quantity")
-            return
-        
-        # Get the price for this item
-        price = self.product_prices.get(item_name, 0.00)
-        total = price * quantity
-        
-        # Add to the treeview with price and total
-        self.biller_tree.insert('', tk.END, values=(item_name, f"{price:.2f}", quantity, f"{total:.2f}"))
-        
-        # Reset the combobox and quantity entry
-        self.item_var.set("")  # Clear the combobox selection
-        self.price_var.set("0.00")  # Reset price display
-        self.quantity_entry.delete(0, tk.END)
-        self.quantity_entry.insert(0, "1")  # Reset quantity to 1
-        
-        self.log_debug(f"Added item: {quantity} x {item_name} @ ₹{price:.2f} = ₹{total:.2f}")
-        
-        # Calculate and update the total price
-        self.calculate_total()
-    
-    def clear_all(self):
-        """Clear all entered and detected items"""
-        # Clear the biller items
-        for item in self.biller_tree.get_children():
-            self.biller_tree.delete(item)
-        
-        # Clear the detected items
-        for item in self.detected_tree.get_children():
-            self.detected_tree.delete(item)
-        
-        # Clear the detected items list
-        self.detected_items = []
-        
-        # Reset the combobox selection and price display
-        self.item_var.set("")
-        self.price_var.set("0.00")
-        
-        # Reset the total price
-        self.total_price_var.set("₹0.00")
-        
-        self.log_debug("Cleared all items")
-    
-    def verify_items(self):
-        """Verify if biller items match detected items"""
-        self.log_debug("Running verification process...")
-        
-        if not self.is_connected:
-            messagebox.showwarning("Connection Required", "Please connect to the Nicla Vision device first")
-            return
-        
-        # Get biller items
-        biller_items = {}
-        for item_id in self.biller_tree.get_children():
-            values = self.biller_tree.item(item_id, 'values')
-            item_name = values[0]
-            quantity = int(values[2])  # Now quantity is in the third column
-            
-            if item_name in biller_items:
-                biller_items[item_name] += quantity
-            else:
-                biller_items[item_name] = quantity
-        
-        # Get detected items
-        detected_items = {}
-        for item in self.detected_items:
-            detected_items[item['item']] = item['count']
-        
-        self.log_debug(f"Verifying - Billed items: {biller_items}")
-        self.log_debug(f"Verifying - Detected items: {detected_items}")
-        
-        # Check if counts match
-        mismatches = []
-        for item_name, biller_count in biller_items.items():
-            detected_count = detected_items.get(item_name, 0)
-            if biller_count != detected_count:
-                mismatches.append(f"{item_name}: Billed {biller_count}, Detected {detected_count}")
-        
-        # Check for items detected but not billed
-        for item_name, detected_count in detected_items.items():
-            if item_name not in biller_items:
-                mismatches.append(f"{item_name}: Billed 0, Detected {detected_count}")
-        
-        # Show the result
-        if not mismatches:
-            self.log_debug("Verification successful - all items match")
-            self.message_var.set("✓ VERIFICATION SUCCESSFUL: All items match!")
-            messagebox.showinfo("Verification Result", "All items have been verified successfully!")
-        else:
-            self.log_debug(f"Verification failed - {len(mismatches)} mismatches found")
-            mismatch_message = "The following items do not match:\n\n" + "\n".join(mismatches)
-            self.message_var.set("✗ VERIFICATION FAILED: Mismatches found")
-            messagebox.showerror("Verification Failed", mismatch_message)
-
-
-if __name__ == "__main__":
-    root = tk.Tk()
-    # Start with the splash screen
-    splash = SplashScreen(root)
+import time
+
+# Taken before the other imports so the reported time-to-ready includes them
+STARTED_AT = time.perf_counter()
+
+import tkinter as tk
+from tkinter import ttk, messagebox, scrolledtext, filedialog
+import threading
+import queue
+import os
+import atexit
+import argparse
+import json
+from nicla_protocol import (StreamDecoder, SequenceTracker, Keepalive, FRAME_HEARTBEAT, parse_proto_reply,
+                            parse_report_reply, read_available)
+from log_buffer import RingLog, LogView
+from tree_view import KeyedTreeView
+from latency_stats import (LatencyBreakdown, parse_latency_line, parse_timing_line, format_ms,
+                           DEVICE_STAGES)
+from detection_parser import Detection, parse_detection_line, parse_heartbeat_line
+from serial_session import SessionRecorder, ReplayPort, SESSION_EXTENSION, REPLAY_PREFIX
+from port_watcher import PortWatcher, Reconnector, discover_ports
+from command_channel import CommandChannel, CommandTimeout
+from verification_core import VerificationSession, format_mismatch
+from catalog import open_catalog, CATALOG_PATH
+
+# How often the Tk main loop drains events posted by the serial thread, and
+# the most events handled per tick so a burst can't freeze the UI
+EVENT_TICK_MS = 50
+MAX_EVENTS_PER_TICK = 1000
+
+# The serial thread blocks in the driver for at most this long per read, which
+# is also how quickly it notices a disconnect request
+SERIAL_READ_TIMEOUT = 0.2
+
+# The debug and raw-data panes keep only the newest lines (and/or bytes).
+# Set SMART_RETAIL_LOG_DIR to a folder to keep the older lines in rotating
+# log files there instead of dropping them.
+LOG_MAX_LINES = 2000
+LOG_MAX_BYTES = None
+LOG_SPILL_DIR = os.environ.get("SMART_RETAIL_LOG_DIR")
+
+# Recorded sessions go here; a port named "replay:<file>" plays one back
+SESSION_DIR = os.environ.get("SMART_RETAIL_SESSION_DIR",
+                             os.path.join(os.path.expanduser("~"), "smart_retail_sessions"))
+REPLAY_SPEEDS = ["1x", "2x", "4x", "10x", "max"]
+
+# Detected quantities are the mode of the last CONSENSUS_FRAMES frames (no
+# older than CONSENSUS_WINDOW_MS), so a one-frame flicker doesn't change the
+# verdict. Set CONSENSUS_FRAMES to 1 to show every frame as it arrives.
+CONSENSUS_FRAMES = 5
+CONSENSUS_WINDOW_MS = 3000
+CONSENSUS_STATISTIC = "mode"
+
+# How often the catalog is checked for price changes made by other programs
+CATALOG_RELOAD_MS = 2000
+
+# With change-only reports ("report=change") the device debounces counts and
+# sends a heartbeat when idle; the consensus window is then a single report,
+# and the link is flagged once no heartbeat arrived for a while (checked
+# every KEEPALIVE_CHECK_MS)
+KEEPALIVE_CHECK_MS = 1000
+
+# The latency breakdown table is refreshed this often
+LATENCY_REFRESH_MS = 1000
+LATENCY_STAGE_NAMES = {"device_total": "device total", "reported": "LATENCY line", "host_total": "host total"}
+
+# The last port connected to is remembered here and connected to again at the
+# next start (unless --no-auto-connect is given)
+SETTINGS_PATH = os.environ.get("SMART_RETAIL_SETTINGS",
+                               os.path.join(os.path.expanduser("~"), ".smart_retail_settings.json"))
+
+# How often the splash screen checks on the background startup work
+STARTUP_POLL_MS = 10
+
+# Splash image, scaled to SPLASH_WIDTH pixels wide
+SPLASH_IMAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "init.jpg")
+SPLASH_WIDTH = 800
+SPLASH_HEIGHT = 600
+
+
+def load_settings():
+    try:
+        with open(SETTINGS_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_settings(settings):
+    try:
+        with open(SETTINGS_PATH, "w") as f:
+            json.dump(settings, f, indent=2)
+    except OSError as e:
+        print(f"Could not save settings to {SETTINGS_PATH}: {str(e)}")
+
+
+class StartupTasks:
+    """
+    The startup work that doesn't need Tk, each on its own background thread
+    while the splash screen is shown: opening the catalog, listing the
+    serial ports and loading the splash image (PIL is imported there, not on
+    the Tk thread). Every result is set before its event. timings holds the
+    milliseconds since STARTED_AT at which each step finished.
+    """
+    
+    def __init__(self, catalog_path):
+        self.catalog_path = catalog_path
+        self.catalog = None
+        self.catalog_error = None
+        self.ports = []
+        self.ports_error = None
+        self.splash_image = None
+        self.splash_error = None
+        self.timings = {}
+        self.catalog_ready = threading.Event()
+        self.ports_ready = threading.Event()
+        self.splash_ready = threading.Event()
+        for target in (self.open_catalog, self.find_ports, self.load_splash_image):
+            threading.Thread(target=target, daemon=True).start()
+    
+    def mark(self, step):
+        self.timings[step] = (time.perf_counter() - STARTED_AT) * 1000
+    
+    def open_catalog(self):
+        try:
+            # Handed over to the Tk thread, which is its only user from then on
+            self.catalog = open_catalog(self.catalog_path, check_same_thread=False)
+        except Exception as e:
+            self.catalog_error = e
+        self.mark("catalog")
+        self.catalog_ready.set()
+    
+    def find_ports(self):
+        try:
+            self.ports = discover_ports()
+        except Exception as e:
+            self.ports_error = e
+        self.mark("ports")
+        self.ports_ready.set()
+    
+    def load_splash_image(self):
+        """Decode the splash image and scale it to SPLASH_WIDTH, keeping its aspect ratio"""
+        try:
+            from PIL import Image
+            
+            if not os.path.exists(SPLASH_IMAGE_PATH):
+                raise FileNotFoundError(f"Splash image not found at {SPLASH_IMAGE_PATH}")
+            img = Image.open(SPLASH_IMAGE_PATH)
+            original_width, original_height = img.size
+            height = int(SPLASH_WIDTH / (original_width / original_height))
+            self.splash_image = img.resize((SPLASH_WIDTH, height), Image.LANCZOS)
+        except Exception as e:
+            self.splash_error = e
+        self.splash_ready.set()
+
+
+class SplashScreen:
+    def __init__(self, root, replay_path=None, replay_speed=None, catalog_path=CATALOG_PATH, auto_connect=True,
+                 exit_when_ready=False):
+        self.root = root
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        self.catalog_path = catalog_path
+        self.auto_connect = auto_connect
+        self.exit_when_ready = exit_when_ready
+        self.app = None
+        self.splash_img = None
+        self.splash_image_checked = False
+        
+        # Start the work that doesn't need Tk before anything is drawn
+        self.tasks = StartupTasks(catalog_path)
+        
+        self.root.overrideredirect(True)  # Remove window decorations for splash screen
+        self.root.configure(bg="#f0f0f0")
+        
+        # Center the window on the screen
+        screen_width = root.winfo_screenwidth()
+        screen_height = root.winfo_screenheight()
+        x = (screen_width - SPLASH_WIDTH) // 2
+        y = (screen_height - SPLASH_HEIGHT) // 2
+        self.root.geometry(f"{SPLASH_WIDTH}x{SPLASH_HEIGHT}+{x}+{y}")
+        
+        # Drawn with plain Tk right away; the image replaces the title once the
+        # background task has decoded it
+        self.splash_label = tk.Label(self.root, text="Smart Retail Verification System\n\nStarting...",
+                                     font=("Arial", 20, "bold"), bg="#f0f0f0")
+        self.splash_label.pack(fill=tk.BOTH, expand=True)
+        self.root.update()
+        self.tasks.mark("splash")
+        
+        # The splash screen stays up only until the application is ready
+        self.root.after(STARTUP_POLL_MS, self.poll_startup)
+    
+    def show_splash_image(self):
+        """Put the decoded splash image in the splash window (runs on the Tk thread)"""
+        if self.tasks.splash_error is not None:
+            # If there's an error loading the splash image, log it and keep the title
+            print(f"Error loading splash screen: {str(self.tasks.splash_error)}")
+            return
+        try:
+            from PIL import ImageTk
+            
+            img = self.tasks.splash_image
+            self.splash_img = ImageTk.PhotoImage(img)
+            self.root.geometry(f"{img.width}x{img.height}")
+            self.splash_label.config(image=self.splash_img, text="")
+            self.tasks.mark("splash_image")
+        except Exception as e:
+            print(f"Error loading splash screen: {str(e)}")
+    
+    def poll_startup(self):
+        """Build the main window once the catalog is open, show it once the ports are known"""
+        if not self.splash_image_checked and self.tasks.splash_ready.is_set():
+            self.splash_image_checked = True
+            self.show_splash_image()
+        if self.app is None and self.tasks.catalog_ready.is_set():
+            self.build_main_window()
+        if self.app is not None and self.tasks.ports_ready.is_set():
+            self.close_splash()
+            return
+        self.root.after(STARTUP_POLL_MS, self.poll_startup)
+    
+    def build_main_window(self):
+        """Create the main application window, hidden behind the splash screen"""
+        # Create a new toplevel window for the main application
+        main_window = tk.Toplevel(self.root)
+        main_window.withdraw()
+        main_window.title("Smart Retail Verification System | Edge_AI_CP_330 | Tanisha Bhatia | Shubham Lanjewar | Prof. Pandarasamy Arjunan")
+        main_window.geometry("1000x700")  # Slightly larger to accommodate prices
+        
+        # Make this window behave like a main window
+        main_window.protocol("WM_DELETE_WINDOW", self.root.destroy)
+        
+        # The catalog was opened in the background (None if that failed, and
+        # the application then reports the error); the ports follow later
+        self.app = RetailVerificationSystem(main_window, catalog_path=self.catalog_path, catalog=self.tasks.catalog,
+                                            find_ports=False)
+        self.tasks.mark("widgets")
+        
+        # Keep a reference to the main window to prevent garbage collection
+        self.main_window = main_window
+    
+    def close_splash(self):
+        """Close the splash screen and show the main application"""
+        # Hide the splash screen
+        self.root.withdraw()
+        
+        # Restore normal window behavior
+        self.root.overrideredirect(False)
+        
+        app = self.app
+        last_port = app.settings.get("last_port")
+        if self.tasks.ports_error is not None:
+            app.log_debug(f"Error listing ports: {str(self.tasks.ports_error)}")
+        app.set_ports(self.tasks.ports, last_port)
+        
+        # Show the main window
+        self.main_window.deiconify()
+        self.main_window.update_idletasks()
+        self.tasks.mark("ready")
+        app.report_startup(self.tasks.timings)
+        
+        if self.exit_when_ready:
+            self.root.after(0, self.root.destroy)
+            return
+        
+        # Play a recorded session straight away if one was given on the command
+        # line, otherwise reconnect to the device used last time
+        if self.replay_path:
+            app.start_replay(self.replay_path, self.replay_speed)
+        elif self.auto_connect and last_port:
+            if last_port in self.tasks.ports:
+                app.log_debug(f"Reconnecting to {last_port}, the port used last time")
+                app.connect_device(interactive=False)
+            else:
+                # Connect as soon as the port watcher sees it plugged in
+                app.log_debug(f"Waiting for {last_port}, the port used last time")
+                app.awaited_port = last_port
+
+
+class RetailVerificationSystem:
+    def __init__(self, root, catalog_path=CATALOG_PATH, catalog=None, find_ports=True):
+        self.root = root
+        self.root.title("Smart Retail Verification System | Edge_AI_CP_330 | Tanisha Bhatia | Shubham Lanjewar | Prof. Pandarasamy Arjunan")
+        self.root.geometry("1000x700")  # Increased to accommodate prices
+        self.root.configure(bg="#f0f0f0")
+        
+        # Create a main canvas with scrollbar
+        self.main_canvas = tk.Canvas(self.root, bg="#f0f0f0")
+        self.scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=self.main_canvas.yview)
+        
+        # Place canvas and scrollbar in root window using grid
+        self.main_canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        
+        # Configure the canvas to work with the scrollbar
+        self.main_canvas.configure(yscrollcommand=self.scrollbar.set)
+        
+        # Create a frame inside the canvas to hold all widgets
+        self.content_frame = ttk.Frame(self.main_canvas)
+        
+        # Add the content frame to the canvas
+        self.canvas_frame = self.main_canvas.create_window((0, 0), window=self.content_frame, anchor="nw")
+        
+        # Configure root window grid
+        self.root.grid_rowconfigure(0, weight=1)
+        self.root.grid_columnconfigure(0, weight=1)
+        
+        # Serial connection variables
+        self.serial_port = None
+        self.is_connected = False
+        self.recorder = None
+        
+        # Commands carry an ID the device repeats in its reply, so each one
+        # gets a future for its reply (see send_command())
+        self.commands = None
+        
+        # A device port that fails (cable pulled, device reset) is opened
+        # again by the serial thread with backoff; link_port and link_baud
+        # are what it reopens (None for replays)
+        self.reconnector = Reconnector()
+        self.link_port = None
+        self.link_baud = None
+        
+        # Raw data buffer for debugging
+        self.raw_data_buffer = []
+        
+        # The serial thread never touches Tk: it posts (kind, payload) events
+        # here and the main loop drains them in batches every EVENT_TICK_MS
+        self.event_queue = queue.Queue()
+        self.ui_thread = threading.current_thread()
+        
+        # Wire protocol state: "text" until the device accepts "proto=bin"
+        self.protocol = "text"
+        self.class_labels = []
+        self.stream_decoder = StreamDecoder()
+        self.sequence_tracker = SequenceTracker()
+        self.keepalive = Keepalive()
+        self.device_silent = False
+        
+        # Where the time goes between the camera and the screen, per stage
+        self.latency = LatencyBreakdown()
+        
+        # Product names -> prices; large catalogs are queried on demand from
+        # an SQLite file instead of being loaded at startup. The splash screen
+        # opens it in the background and passes it in.
+        try:
+            self.catalog = catalog if catalog is not None else open_catalog(catalog_path)
+        except Exception as e:
+            messagebox.showerror("Catalog Error", f"Could not open the catalog {catalog_path}: {str(e)}\n\n"
+                                 "Using the built-in product list instead.")
+            self.catalog = open_catalog(None)
+        self.product_prices = self.catalog
+        
+        # Cart, detections and verification live in the UI-free core; the
+        # widgets only display its state
+        self.session = VerificationSession(self.product_prices, window_frames=CONSENSUS_FRAMES,
+                                           window_ms=CONSENSUS_WINDOW_MS, statistic=CONSENSUS_STATISTIC)
+        
+        # Last port and baud rate used
+        self.settings = load_settings()
+        
+        # Create GUI components
+        self.create_widgets()
+        if "baud_rate" in self.settings:
+            self.baud_var.set(str(self.settings["baud_rate"]))
+        
+        # Start a thread to listen for serial data
+        self.should_stop = False
+        self.serial_thread = None
+        
+        # Held while the serial thread swaps in a reopened port or starts
+        # reconnecting, and while Disconnect stops it, so a manual disconnect
+        # during a reconnect attempt can't be followed by the port reopening
+        self.port_lock = threading.Lock()
+        
+        # The ports are listed in the background every second, so devices
+        # plugged in or out show up without a refresh; the splash screen
+        # lists them once itself and calls set_ports()
+        self.available_ports = None
+        self.ports_requested = False
+        self.awaited_port = None
+        self.port_watcher = PortWatcher(lambda ports, added, removed: self.event_queue.put(("ports", ports)),
+                                        on_error=lambda e: self.log_debug(f"Error listing ports: {str(e)}"))
+        if find_ports:
+            self.refresh_ports()
+        self.port_watcher.start()
+        
+        # Bind events for scrolling
+        self.content_frame.bind("<Configure>", self.on_frame_configure)
+        self.main_canvas.bind("<Configure>", self.on_canvas_configure)
+        
+        # Bind mousewheel for scrolling; the scrollable region is set by
+        # on_frame_configure() once Tk has laid the content out
+        self.main_canvas.bind_all("<MouseWheel>", self.on_mousewheel)
+        
+        # Calculate the initial total (which should be 0)
+        self.calculate_total()
+        
+        # Start draining events from the serial thread
+        self.root.after(EVENT_TICK_MS, self.drain_events)
+        
+        # Pick up price changes without a restart
+        self.root.after(CATALOG_RELOAD_MS, self.check_catalog)
+        
+        # Watch for a device that stopped sending heartbeats
+        self.root.after(KEEPALIVE_CHECK_MS, self.check_keepalive)
+        
+        # Keep the latency breakdown current
+        self.root.after(LATENCY_REFRESH_MS, self.refresh_latency)
+    
+    def on_frame_configure(self, event):
+        """Reset the scroll region to encompass the inner frame"""
+        self.main_canvas.configure(scrollregion=self.main_canvas.bbox("all"))
+    
+    def on_canvas_configure(self, event):
+        """When canvas is resized, update the window size"""
+        # Update the width of the content frame to match the canvas
+        canvas_width = event.width
+        self.main_canvas.itemconfig(self.canvas_frame, width=canvas_width)
+    
+    def on_mousewheel(self, event):
+        """Handle mousewheel scrolling"""
+        self.main_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+    
+    def create_widgets(self):
+        # Main frame
+        main_frame = ttk.Frame(self.content_frame, padding=20)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Connection frame
+        connection_frame = ttk.LabelFrame(main_frame, text="Device Connection", padding=10)
+        connection_frame.pack(fill=tk.X, pady=10)
+        
+        # Port selection
+        ttk.Label(connection_frame, text="Port:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        
+        self.port_var = tk.StringVar()
+        self.port_combo = ttk.Combobox(connection_frame, textvariable=self.port_var, width=20)
+        self.port_combo.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.refresh_button = ttk.Button(connection_frame, text="Refresh", command=self.refresh_ports)
+        self.refresh_button.grid(row=0, column=2, padx=5, pady=5)
+        
+        self.connect_button = ttk.Button(connection_frame, text="Connect", command=self.toggle_connection)
+        self.connect_button.grid(row=0, column=3, padx=5, pady=5)
+        
+        # Baud rate selection
+        ttk.Label(connection_frame, text="Baud Rate:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
+        self.baud_var = tk.StringVar(value="115200")
+        baud_rates = ["9600", "19200", "38400", "57600", "115200", "230400"]
+        self.baud_combo = ttk.Combobox(connection_frame, textvariable=self.baud_var, values=baud_rates, width=20)
+        self.baud_combo.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        # Ask the device for compact binary frames when connecting
+        self.binary_var = tk.BooleanVar(value=True)
+        self.binary_check = ttk.Checkbutton(connection_frame, text="Binary frames", variable=self.binary_var)
+        self.binary_check.grid(row=1, column=2, padx=5, pady=5, sticky=tk.W)
+        
+        # Ask the device to only report changes, plus a heartbeat when idle
+        self.report_var = tk.BooleanVar(value=True)
+        self.report_check = ttk.Checkbutton(connection_frame, text="Change-only reports", variable=self.report_var)
+        self.report_check.grid(row=1, column=3, padx=5, pady=5, sticky=tk.W)
+        
+        # Session recording and replay
+        self.record_var = tk.BooleanVar(value=False)
+        self.record_check = ttk.Checkbutton(connection_frame, text="Record session", variable=self.record_var)
+        self.record_check.grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        
+        self.replay_speed_var = tk.StringVar(value=REPLAY_SPEEDS[0])
+        self.replay_speed_combo = ttk.Combobox(connection_frame, textvariable=self.replay_speed_var,
+                                               values=REPLAY_SPEEDS, width=20, state="readonly")
+        self.replay_speed_combo.grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
+        
+        self.replay_button = ttk.Button(connection_frame, text="Replay...", command=self.choose_replay_file)
+        self.replay_button.grid(row=2, column=2, padx=5, pady=5)
+        
+        # Status indicator
+        self.status_label = ttk.Label(connection_frame, text="Status: Disconnected", foreground="red")
+        self.status_label.grid(row=0, column=4, padx=5, pady=5, rowspan=3)
+        
+        # Manual entry frame
+        manual_frame = ttk.LabelFrame(main_frame, text="Biller Item Entry", padding=10)
+        manual_frame.pack(fill=tk.X, pady=10)
+        
+        # Item entry - REPLACED text entry with combobox
+        ttk.Label(manual_frame, text="Item:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        
+        # Create item combobox with product catalog names
+        # The list holds only the catalog items matching what has been typed
+        self.item_var = tk.StringVar()
+        self.item_combo = ttk.Combobox(manual_frame, textvariable=self.item_var, values=self.catalog.search(""), width=20)
+        self.item_combo.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W)
+        self.item_combo.bind("<KeyRelease>", self.filter_items)
+        
+        # When an item is selected, show its price
+        self.item_combo.bind("<<ComboboxSelected>>", self.display_selected_price)
+        
+        # Price display
+        ttk.Label(manual_frame, text="Price (₹):").grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
+        self.price_var = tk.StringVar(value="0.00")
+        price_display = ttk.Label(manual_frame, textvariable=self.price_var)
+        price_display.grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
+        
+        # Quantity entry
+        ttk.Label(manual_frame, text="Quantity:").grid(row=0, column=4, padx=5, pady=5, sticky=tk.W)
+        self.quantity_entry = ttk.Spinbox(manual_frame, from_=1, to=100, width=5)
+        self.quantity_entry.grid(row=0, column=5, padx=5, pady=5, sticky=tk.W)
+        self.quantity_entry.delete(0, tk.END)
+        self.quantity_entry.insert(0, "1")
+        
+        # Add item button
+        self.add_button = ttk.Button(manual_frame, text="Add Item", command=self.add_item)
+        self.add_button.grid(row=0, column=6, padx=5, pady=5)
+        
+        # Remove the cart lines selected in the biller list
+        self.remove_button = ttk.Button(manual_frame, text="Remove Selected", command=self.remove_selected_items)
+        self.remove_button.grid(row=0, column=7, padx=5, pady=5)
+        
+        # Display frames
+        display_frame = ttk.Frame(main_frame)
+        display_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        
+        # Biller items frame
+        biller_frame = ttk.LabelFrame(display_frame, text="Biller Items", padding=10)
+        biller_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+        
+        # Biller items treeview - added Price and Total columns
+        self.biller_tree = ttk.Treeview(biller_frame, columns=("Item", "Price", "Quantity", "Total"), show="headings", height=6)
+        self.biller_tree.heading("Item", text="Item")
+        self.biller_tree.heading("Price", text="Price (₹)")
+        self.biller_tree.heading("Quantity", text="Qty")
+        self.biller_tree.heading("Total", text="Total (₹)")
+        self.biller_tree.column("Item", width=150)
+        self.biller_tree.column("Price", width=70)
+        self.biller_tree.column("Quantity", width=50)
+        self.biller_tree.column("Total", width=80)
+        self.biller_tree.pack(fill=tk.BOTH, expand=True)
+        
+        biller_scrollbar = ttk.Scrollbar(biller_frame, orient="vertical", command=self.biller_tree.yview)
+        biller_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.biller_tree.configure(yscrollcommand=biller_scrollbar.set)
+        
+        # Total price frame below the biller items
+        total_frame = ttk.Frame(biller_frame)
+        total_frame.pack(fill=tk.X, pady=5)
+        
+        # Total price label
+        ttk.Label(total_frame, text="TOTAL:", font=("Arial", 12, "bold")).pack(side=tk.LEFT, padx=5)
+        self.total_price_var = tk.StringVar(value="₹0.00")
+        ttk.Label(total_frame, textvariable=self.total_price_var, font=("Arial", 12, "bold")).pack(side=tk.RIGHT, padx=5)
+        
+        # Detected items frame
+        detected_frame = ttk.LabelFrame(display_frame, text="Detected Items", padding=10)
+        detected_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5)
+        
+        # Detected items treeview - added Price column
+        self.detected_tree = ttk.Treeview(detected_frame, columns=("Item", "Count", "Price", "Confidence"), show="headings", height=6)
+        self.detected_tree.heading("Item", text="Item")
+        self.detected_tree.heading("Count", text="Count")
+        self.detected_tree.heading("Price", text="Price (₹)")
+        self.detected_tree.heading("Confidence", text="Confidence")
+        self.detected_tree.column("Item", width=150)
+        self.detected_tree.column("Count", width=50)
+        self.detected_tree.column("Price", width=70)
+        self.detected_tree.column("Confidence", width=100)
+        self.detected_tree.pack(fill=tk.BOTH, expand=True)
+        
+        detected_scrollbar = ttk.Scrollbar(detected_frame, orient="vertical", command=self.detected_tree.yview)
+        detected_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.detected_tree.configure(yscrollcommand=detected_scrollbar.set)
+        
+        # Rows are keyed by item name so each frame only touches the rows that changed
+        self.detected_view = KeyedTreeView(self.detected_tree)
+        
+        # Latency breakdown: device stages from TIMING lines, host stages
+        # measured here, as rolling percentiles
+        latency_frame = ttk.LabelFrame(main_frame, text="Latency per Stage (ms)", padding=10)
+        latency_frame.pack(fill=tk.X, pady=5)
+        
+        latency_columns = ("Stage", "Reports", "p50", "p95", "p99", "Max")
+        self.latency_tree = ttk.Treeview(latency_frame, columns=latency_columns, show="headings", height=6)
+        for column in latency_columns:
+            self.latency_tree.heading(column, text=column)
+            if column == "Stage":
+                self.latency_tree.column(column, width=140)
+            else:
+                self.latency_tree.column(column, width=70, anchor=tk.E)
+        self.latency_tree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.latency_view = KeyedTreeView(self.latency_tree)
+        
+        latency_buttons = ttk.Frame(latency_frame)
+        latency_buttons.pack(side=tk.LEFT, padx=5)
+        ttk.Button(latency_buttons, text="Export...", command=self.export_latency).pack(fill=tk.X, pady=2)
+        ttk.Button(latency_buttons, text="Reset", command=self.latency.clear).pack(fill=tk.X, pady=2)
+        
+        # Control buttons frame
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=tk.X, pady=10)
+        
+        # Clear button
+        self.clear_button = ttk.Button(button_frame, text="Clear All", command=self.clear_all)
+        self.clear_button.pack(side=tk.LEFT, padx=5)
+        
+        # Command buttons frame for Nicla Vision controls
+        command_frame = ttk.Frame(button_frame)
+        command_frame.pack(side=tk.LEFT, padx=20)
+        
+        # Start/Stop/Status buttons
+        self.start_button = ttk.Button(command_frame, text="Start Detection", command=lambda: self.send_command("start"))
+        self.start_button.pack(side=tk.LEFT, padx=5)
+        
+        self.stop_button = ttk.Button(command_frame, text="Stop Detection", command=lambda: self.send_command("stop"))
+        self.stop_button.pack(side=tk.LEFT, padx=5)
+        
+        self.status_button = ttk.Button(command_frame, text="Get Status", command=lambda: self.send_command("status"))
+        self.status_button.pack(side=tk.LEFT, padx=5)
+        
+        # Test Connection button
+        self.test_button = ttk.Button(command_frame, text="Test Connection", command=self.test_connection)
+        self.test_button.pack(side=tk.LEFT, padx=5)
+        
+        # DEBUG: Force update button to manually trigger detection update
+        self.force_update_button = ttk.Button(command_frame, text="DEBUG: Force Update", command=self.force_update)
+        self.force_update_button.pack(side=tk.LEFT, padx=5)
+        
+        # VERY PROMINENT Verify button - moved above Raw Data section
+        verify_frame = ttk.Frame(main_frame)
+        verify_frame.pack(fill=tk.X, pady=10)
+        
+        self.verify_button = tk.Button(
+            verify_frame, 
+            text="VERIFY ITEMS", 
+            command=self.verify_items,
+            bg="green",
+            fg="white",
+            font=("Arial", 14, "bold"),
+            height=2,
+            width=20
+        )
+        self.verify_button.pack(side=tk.TOP, pady=10)
+        
+        # Raw data display frame - now below the VERIFY ITEMS button
+        raw_data_frame = ttk.LabelFrame(main_frame, text="Raw Data from Nicla Vision", padding=10)
+        raw_data_frame.pack(fill=tk.X, pady=10)
+        
+        # Raw data text area
+        self.raw_data_text = scrolledtext.ScrolledText(raw_data_frame, height=5, width=80, wrap=tk.WORD)
+        self.raw_data_text.pack(fill=tk.BOTH, expand=True)
+        self.raw_log = LogView(self.raw_data_text, self.create_ring_log("raw_data.log"))
+        
+        # Debug output frame
+        debug_frame = ttk.LabelFrame(main_frame, text="Debug Output", padding=10)
+        debug_frame.pack(fill=tk.X, pady=10)
+        
+        # Debug text
+        self.debug_text = scrolledtext.ScrolledText(debug_frame, height=5, width=80, wrap=tk.WORD)
+        self.debug_text.pack(fill=tk.BOTH, expand=True)
+        self.debug_log = LogView(self.debug_text, self.create_ring_log("debug.log"))
+        
+        # Keep whatever is still on screen when the application exits
+        atexit.register(self.raw_log.close)
+        atexit.register(self.debug_log.close)
+        
+        # Status message
+        self.message_var = tk.StringVar()
+        self.message_var.set("Ready for verification")
+        self.message_label = ttk.Label(main_frame, textvariable=self.message_var, font=("Arial", 12), foreground="blue")
+        self.message_label.pack(fill=tk.X, pady=5)
+    
+    def create_ring_log(self, file_name):
+        """Create the bounded log behind one of the text panes"""
+        spill_path = None
+        if LOG_SPILL_DIR:
+            os.makedirs(LOG_SPILL_DIR, exist_ok=True)
+            spill_path = os.path.join(LOG_SPILL_DIR, file_name)
+        return RingLog(max_lines=LOG_MAX_LINES, max_bytes=LOG_MAX_BYTES, spill_path=spill_path)
+    
+    def display_selected_price(self, event=None):
+        """Update the price display when an item is selected"""
+        selected_item = self.item_var.get()
+        if selected_item in self.product_prices:
+            price = self.product_prices[selected_item]
+            self.price_var.set(f"{price:.2f}")
+        else:
+            self.price_var.set("0.00")
+    
+    def filter_items(self, event=None):
+        """Show the catalog items starting with the typed text in the item list"""
+        self.item_combo['values'] = self.catalog.search(self.item_var.get().strip())
+    
+    def check_catalog(self):
+        """Drop cached prices if the catalog file changed (runs every CATALOG_RELOAD_MS)"""
+        try:
+            if self.catalog.reload_if_changed():
+                self.log_debug("Catalog changed - using the new prices for new items")
+                self.display_selected_price()
+        except Exception as e:
+            self.log_debug(f"Error checking the catalog: {str(e)}")
+        self.root.after(CATALOG_RELOAD_MS, self.check_catalog)
+    
+    def check_keepalive(self):
+        """Flag a device that stopped sending heartbeats (runs every KEEPALIVE_CHECK_MS)"""
+        silent = self.is_connected and not self.reconnector.reconnecting and self.keepalive.silent()
+        if silent != self.device_silent:
+            self.device_silent = silent
+            if silent:
+                self.log_debug(f"No data from the device for {self.keepalive.silence():.1f} s")
+                self.status_label.config(text="Status: Connected (device silent)", foreground="orange")
+            elif self.is_connected:
+                self.log_debug("Device is sending again")
+                self.status_label.config(text="Status: Connected", foreground="green")
+        self.root.after(KEEPALIVE_CHECK_MS, self.check_keepalive)
+    
+    def refresh_latency(self):
+        """Show the per-stage percentiles (runs every LATENCY_REFRESH_MS)"""
+        try:
+            rows = {}
+            for stage, summary in self.latency.summary():
+                name = LATENCY_STAGE_NAMES.get(stage, stage)
+                if stage in DEVICE_STAGES:
+                    name = f"device: {name}"
+                rows[stage] = (name, summary["count"], format_ms(summary["p50"]), format_ms(summary["p95"]),
+                               format_ms(summary["p99"]), format_ms(summary["max"]))
+            self.latency_view.render(rows)
+        except Exception as e:
+            self.log_debug(f"Error updating latency breakdown: {str(e)}")
+        self.root.after(LATENCY_REFRESH_MS, self.refresh_latency)
+    
+    def export_latency(self):
+        """Save the per-report stage times of recent reports as CSV"""
+        path = filedialog.asksaveasfilename(
+            title="Export latency breakdown",
+            defaultextension=".csv",
+            initialfile=time.strftime("latency_%Y%m%d_%H%M%S.csv"),
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            rows = self.latency.export_csv(path)
+            self.log_debug(f"Exported {rows} reports to {path}")
+            self.message_var.set(f"Latency breakdown saved to {path}")
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Could not save {path}: {str(e)}")
+    
+    def apply_report_mode(self, mode, heartbeat_ms):
+        """Follow the device's reporting mode (runs on the Tk thread)"""
+        if mode == "change":
+            # The device already debounces, every report is the new state
+            self.session.detections.set_window(1)
+            self.keepalive.set_heartbeat(heartbeat_ms)
+        else:
+            self.session.detections.set_window(CONSENSUS_FRAMES, CONSENSUS_WINDOW_MS)
+            self.keepalive.set_heartbeat(None)
+        self.keepalive.heard()
+        self.log_debug(f"Report mode set to {mode}" + (f" (heartbeat {heartbeat_ms} ms)" if heartbeat_ms else ""))
+    
+    def calculate_total(self):
+        """Show the total price of the cart"""
+        total = self.session.cart.total
+        
+        # Update the total price display
+        self.total_price_var.set(f"₹{total:.2f}")
+        self.log_debug(f"Total price updated: ₹{total:.2f}")
+    
+    def force_update(self):
+        """Debug function to manually trigger an update with test data"""
+        self.log_debug("Forcing update with test data")
+        test_detections = [
+            Detection("Apple", 2, 0.95),
+            Detection("KitKat", 1, 0.85),
+            Detection("Chips", 3, 0.75)
+        ]
+        self.process_detections(test_detections)
+    
+    def test_connection(self):
+        """Test the connection with a simple command"""
+        if not self.is_connected or not self.serial_port:
+            messagebox.showwarning("Connection Required", "Please connect to the Nicla Vision device first")
+            return
+        
+        try:
+            # Send a newline character to trigger a response
+            self.serial_port.write(b'\r\n')
+            self.log_debug("Sent test newline character")
+            self.log_raw_data('\r\n', is_incoming=False)
+        except Exception as e:
+            self.log_debug(f"Error sending test: {str(e)}")
+    
+    def refresh_ports(self):
+        """List all available serial ports now instead of at the port watcher's next check"""
+        self.ports_requested = True
+        self.port_watcher.refresh()
+    
+    def set_ports(self, available_ports, preferred=None):
+        """Show the found ports and select preferred (e.g. the last one used) if it is there"""
+        self.available_ports = list(available_ports)
+        self.port_combo['values'] = available_ports
+        
+        if available_ports:
+            # The connected port stays selected, even while it is unplugged
+            if not self.is_connected:
+                self.port_var.set(preferred if preferred in available_ports else available_ports[0])
+            self.log_debug(f"Found ports: {available_ports}")
+        else:
+            if not self.is_connected:
+                self.port_var.set("")
+            self.log_debug("No serial ports found! Check your device connection.")
+    
+    def update_ports(self, ports):
+        """Follow ports being plugged in and out, as listed by the port watcher (runs on the Tk thread)"""
+        if self.ports_requested:
+            # The Refresh button: show the whole list
+            self.ports_requested = False
+            self.set_ports(ports, self.port_var.get())
+            return
+        if self.available_ports is None or ports == self.available_ports:
+            # Not shown yet (the splash screen passes its own list) or unchanged
+            return
+        
+        added = [port for port in ports if port not in self.available_ports]
+        removed = [port for port in self.available_ports if port not in ports]
+        for port in removed:
+            self.log_debug(f"Port removed: {port}")
+        for port in added:
+            self.log_debug(f"Port added: {port}")
+        self.available_ports = ports
+        self.port_combo['values'] = ports
+        if not self.is_connected and self.port_var.get() not in ports:
+            self.port_var.set(ports[0] if ports else "")
+        
+        if self.is_connected and self.link_port in added:
+            # Plugged in again: try it now rather than when the backoff says
+            self.reconnector.port_appeared()
+        elif not self.is_connected and self.awaited_port in added:
+            self.log_debug(f"Connecting to {self.awaited_port}, the port used last time")
+            self.port_var.set(self.awaited_port)
+            self.awaited_port = None
+            self.connect_device(interactive=False)
+    
+    def link_changed(self, state, recovery_ms=None):
+        """Show the device link being lost, reopened and delivering detections again (runs on the Tk thread)"""
+        if not self.is_connected:
+            return
+        if state == "lost":
+            self.status_label.config(text="Status: Reconnecting...", foreground="orange")
+            self.message_var.set(f"Connection to {self.link_port} lost - reconnecting")
+        elif state == "reopened":
+            # Possibly a restarted device: negotiate again, as for a new connection
+            self.status_label.config(text="Status: Connected", foreground="green")
+            self.apply_report_mode("every", None)
+            self.negotiate()
+        elif state == "recovered":
+            summary = self.reconnector.recoveries.summary()
+            self.log_debug(f"Detections from {self.link_port} resumed {recovery_ms:.0f} ms after the link was lost "
+                           f"({summary['count']} recoveries, p50 {format_ms(summary['p50'])} ms, "
+                           f"max {format_ms(summary['max'])} ms)")
+            self.message_var.set(f"Reconnected to {self.link_port} in {recovery_ms / 1000:.1f} s")
+    
+    def report_startup(self, timings):
+        """Log when each startup step finished, in ms since the process started"""
+        steps = ", ".join(f"{step} {ms:.0f} ms" for step, ms in sorted(timings.items(), key=lambda t: t[1])
+                          if step != "ready")
+        self.log_debug(f"Ready in {timings['ready']:.0f} ms ({steps})")
+    
+    def log_debug(self, message):
+        """Add a message to the debug output"""
+        timestamp = time.strftime("%H:%M:%S")
+        entry = f"[{timestamp}] {message}\n"
+        print(message)  # Also print to console
+        
+        if threading.current_thread() is not self.ui_thread:
+            self.event_queue.put(("debug", entry))
+            return
+        
+        self.debug_log.append(entry)
+    
+    def log_raw_data(self, data, is_incoming=True):
+        """Add raw data to the raw data display"""
+        timestamp = time.strftime("%H:%M:%S")
+        direction = "<<" if is_incoming else ">>"
+        
+        # Make sure we have a string
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', errors='replace')
+            
+        entry = f"[{timestamp}] {direction} {data}"
+        
+        # Also print to console for debugging
+        print(f"RAW: {entry}")
+        
+        if threading.current_thread() is not self.ui_thread:
+            self.event_queue.put(("raw", entry + "\n"))
+            return
+        
+        # Update display
+        self.raw_log.append(entry + "\n")
+    
+    def post_detections(self, detections, trace=None, received_time=None):
+        """Hand a parsed detection list, its latency trace and receive time from the serial thread to the main loop"""
+        if self.reconnector.recovering:
+            # The first report since the port was reopened ends the recovery
+            recovery_ms = self.reconnector.recovered()
+            if recovery_ms is not None:
+                self.event_queue.put(("link", ("recovered", recovery_ms)))
+        if received_time is None:
+            received_time = time.monotonic()
+        self.event_queue.put(("detections", (detections, trace, received_time)))
+    
+    def drain_events(self):
+        """Apply the events posted by the serial thread (runs on the Tk thread)"""
+        debug_entries = []
+        raw_entries = []
+        frames = 0
+        latest_trace = None
+        dequeued_at = time.perf_counter()
+        
+        handled = 0
+        try:
+            while handled < MAX_EVENTS_PER_TICK:
+                kind, payload = self.event_queue.get_nowait()
+                handled += 1
+                if kind == "debug":
+                    debug_entries.append(payload)
+                elif kind == "raw":
+                    raw_entries.append(payload)
+                elif kind == "detections":
+                    # Every frame counts towards the consensus, at the time it
+                    # was received; only the display is updated once per tick
+                    detections, trace, received_time = payload
+                    self.session.detections.update(detections, now=received_time)
+                    frames += 1
+                    if trace is not None:
+                        if latest_trace is not None:
+                            self.latency.skipped()
+                        latest_trace = trace
+                elif kind == "report":
+                    self.apply_report_mode(*payload)
+                elif kind == "negotiated":
+                    self.negotiated(*payload)
+                elif kind == "ports":
+                    self.update_ports(payload)
+                elif kind == "link":
+                    self.link_changed(*payload)
+        except queue.Empty:
+            pass
+        except Exception as e:
+            self.log_debug(f"Error applying serial events: {str(e)}")
+        
+        try:
+            # One insert per widget per tick instead of one per line
+            self.debug_log.extend(debug_entries)
+            self.raw_log.extend(raw_entries)
+            if frames:
+                self.log_debug(f"Processed {frames} frame(s), consensus: {self.session.detections.counts}")
+                self._update_detected_tree()
+                if latest_trace is not None:
+                    self.latency.rendered(latest_trace, dequeued_at)
+        except Exception as e:
+            self.log_debug(f"Error applying serial events: {str(e)}")
+        
+        # Come back sooner when the queue still holds a backlog
+        delay = 1 if handled >= MAX_EVENTS_PER_TICK else EVENT_TICK_MS
+        self.root.after(delay, self.drain_events)
+    
+    def toggle_connection(self):
+        if not self.is_connected:
+            self.connect_device()
+        else:
+            self.disconnect_device()
+    
+    def connect_device(self, interactive=True):
+        """Connect to the selected port; errors are only logged when not interactive"""
+        try:
+            port = self.port_var.get()
+            baud_rate = int(self.baud_var.get())
+            
+            if not port:
+                self.log_debug("Error: No port selected!")
+                if interactive:
+                    messagebox.showerror("Connection Error", "No port selected")
+                return
+            
+            self.log_debug(f"Attempting to connect to {port} at {baud_rate} baud...")
+            self.link_port = None
+            self.awaited_port = None
+            self.reconnector.cancel()
+            
+            if port.startswith(REPLAY_PREFIX):
+                # Play a recorded session through the same pipeline
+                speed = self.get_replay_speed()
+                self.serial_port = ReplayPort(port[len(REPLAY_PREFIX):], speed=speed, timeout=SERIAL_READ_TIMEOUT)
+                self.log_debug(f"Replaying {port[len(REPLAY_PREFIX):]} at {self.replay_speed_var.get()}")
+                
+                # A recording can't answer, so nothing waits for replies
+                self.commands = CommandChannel(self.write_port, tagged=False)
+            else:
+                # Imported on first use to keep startup fast
+                import serial
+                
+                # Try to open the serial port
+                self.serial_port = serial.Serial(port, baud_rate, timeout=SERIAL_READ_TIMEOUT)
+                
+                # Connect to this port again at the next start
+                self.settings.update(last_port=port, baud_rate=baud_rate)
+                save_settings(self.settings)
+                
+                # Reopened by the serial thread if it fails
+                self.link_port = port
+                self.link_baud = baud_rate
+                self.commands = CommandChannel(self.write_port)
+                
+                if self.record_var.get():
+                    file_name = time.strftime("session_%Y%m%d_%H%M%S") + SESSION_EXTENSION
+                    self.recorder = SessionRecorder(os.path.join(SESSION_DIR, file_name))
+                    self.log_debug(f"Recording session to {self.recorder.path}")
+            self.is_connected = True
+            self.status_label.config(text="Status: Connected", foreground="green")
+            self.connect_button.config(text="Disconnect")
+            
+            self.log_debug(f"Successfully connected to {port}")
+            self.message_var.set(f"Connected to {port}")
+            
+            # Clear the raw data display
+            self.raw_log.clear()
+            
+            # Every connection starts in text mode until negotiated again
+            self.protocol = "text"
+            self.class_labels = []
+            self.stream_decoder = StreamDecoder()
+            self.sequence_tracker = SequenceTracker()
+            self.apply_report_mode("every", None)
+            self.latency.clear()
+            
+            # Start the serial thread
+            self.should_stop = False
+            self.serial_thread = threading.Thread(target=self.read_serial_data)
+            self.serial_thread.daemon = True
+            self.serial_thread.start()
+            self.negotiate()
+            
+        except Exception as e:
+            self.log_debug(f"Connection error: {str(e)}")
+            if interactive:
+                messagebox.showerror("Connection Error", f"Failed to connect: {str(e)}")
+    
+    def negotiate(self):
+        """Ask a freshly opened device for its status and the wire protocol options, all in one write"""
+        # The status reply tests the connection; binary frames and
+        # change-only reporting are only used if the device accepts them,
+        # and timing=on adds the per-stage timings to the latency breakdown
+        commands = ["status"]
+        if self.binary_var.get():
+            commands.append("proto=bin")
+        if self.report_var.get():
+            commands.append("report=change")
+        commands.append("timing=on")
+        
+        try:
+            futures = self.commands.send_many(commands)
+        except Exception as e:
+            self.log_debug(f"Error negotiating with the device: {str(e)}")
+            return
+        self.log_debug(f"Sent commands: {', '.join(commands)}")
+        self.log_raw_data("".join(f"{command}\r\n" for command in commands), is_incoming=False)
+        for command, future in zip(commands, futures):
+            future.add_done_callback(
+                lambda done, command=command: self.event_queue.put(("negotiated", (command, done))))
+    
+    def negotiated(self, command, future):
+        """Act on the reply to one of the negotiate() commands (runs on the Tk thread)"""
+        try:
+            reply = future.result()
+            reason = None if reply is None or reply.ok else reply.text
+        except Exception as e:
+            reply = None
+            reason = str(e)
+        
+        if reason is None:
+            # The accepted PROTO and REPORT replies were already applied by
+            # handle_line() as they were read; None comes from older firmware
+            if reply is not None:
+                self.log_debug(f"Reply to '{command}' after {reply.elapsed_ms:.0f} ms: {reply.text}")
+            return
+        
+        # Not accepted or no reply: the connection stays on the text format
+        # and every-frame reports it was opened with
+        if command == "proto=bin":
+            self.log_debug(f"Binary frames not negotiated ({reason}), staying on the text format")
+        elif command == "report=change":
+            self.log_debug(f"Change-only reports not negotiated ({reason}), staying on every-frame reports")
+        elif command == "status":
+            self.log_debug(f"No status from the device: {reason}")
+            self.message_var.set(f"No reply from {self.link_port}")
+        else:
+            self.log_debug(f"Command '{command}' failed: {reason}")
+    
+    def disconnect_device(self):
+        with self.port_lock:
+            # Closed on purpose, so don't reconnect
+            self.reconnector.cancel()
+            if self.serial_port:
+                # Stop the serial thread
+                self.should_stop = True
+        if self.commands:
+            self.commands.close()
+        if self.serial_port:
+            if self.serial_thread:
+                self.serial_thread.join(timeout=1.0)
+            
+            self.serial_port.close()
+            self.serial_port = None
+            self.log_debug("Disconnected from device")
+        
+        if self.recorder:
+            self.recorder.close()
+            self.log_debug(f"Saved session recording ({self.recorder.bytes_recorded} bytes) to {self.recorder.path}")
+            self.recorder = None
+        
+        self.is_connected = False
+        self.status_label.config(text="Status: Disconnected", foreground="red")
+        self.connect_button.config(text="Connect")
+        self.message_var.set("Device disconnected")
+    
+    def get_replay_speed(self):
+        """Replay speed factor from the speed box; 0 means as fast as possible"""
+        speed = self.replay_speed_var.get().strip().lower()
+        if speed == "max":
+            return 0
+        try:
+            return float(speed.rstrip("x"))
+        except ValueError:
+            return 1.0
+    
+    def choose_replay_file(self):
+        """Pick a recorded session and play it back"""
+        path = filedialog.askopenfilename(
+            title="Open session recording",
+            initialdir=SESSION_DIR if os.path.isdir(SESSION_DIR) else None,
+            filetypes=[("Session recordings", f"*{SESSION_EXTENSION}"), ("All files", "*.*")]
+        )
+        if path:
+            self.start_replay(path)
+    
+    def start_replay(self, path, speed=None):
+        """Connect to a recorded session instead of a device"""
+        if self.is_connected:
+            self.disconnect_device()
+        if speed:
+            self.replay_speed_var.set(speed)
+        self.port_var.set(f"{REPLAY_PREFIX}{path}")
+        self.connect_device()
+    
+    def send_command(self, command):
+        """
+        Send a command to the Nicla Vision without waiting for the reply.
+        
+        Returns a future that resolves with the CommandReply (None from older
+        firmware, whose replies can't be matched) or fails with
+        CommandTimeout; the reply is also logged. None if it wasn't sent.
+        """
+        if not self.is_connected or not self.serial_port:
+            messagebox.showwarning("Connection Required", "Please connect to the Nicla Vision device first")
+            return None
+        
+        try:
+            future = self.commands.send(command)
+            self.log_debug(f"Sent command: {command}")
+            self.log_raw_data(f"{command}\r\n", is_incoming=False)
+        except Exception as e:
+            self.log_debug(f"Error sending command: {str(e)}")
+            return None
+        future.add_done_callback(lambda done: self.command_done(command, done))
+        return future
+    
+    def write_port(self, data):
+        self.serial_port.write(data)
+    
+    def command_done(self, command, future):
+        """Log the reply to a command, or why there is none (called on the thread that completed it)"""
+        try:
+            reply = future.result()
+        except CommandTimeout as e:
+            self.log_debug(str(e))
+            return
+        except Exception as e:
+            self.log_debug(f"Command '{command}' failed: {str(e)}")
+            return
+        if reply is not None:
+            self.log_debug(f"Reply to '{command}' after {reply.elapsed_ms:.0f} ms: {reply.text}")
+    
+    def read_serial_data(self):
+        """Thread function to read serial data from Nicla Vision"""
+        self.log_debug("Serial reading thread started")
+        
+        # Throughput counters, reported when a replay reaches its end
+        start_time = time.monotonic()
+        bytes_received = 0
+        events_handled = 0
+        replay_reported = False
+        
+        while not self.should_stop:
+            try:
+                # Fail the commands whose reply is overdue
+                commands = self.commands
+                if commands is not None:
+                    commands.expire()
+                
+                if not (self.serial_port and self.serial_port.is_open):
+                    if self.reconnector.reconnecting:
+                        self.reconnect()
+                    else:
+                        time.sleep(0.1)
+                    continue
+                
+                # Wait in the driver for data instead of polling, then take
+                # everything available; text lines and binary frames are split
+                # out of the byte stream by the decoder
+                data = read_available(self.serial_port)
+                if not data:
+                    if getattr(self.serial_port, "finished", False) and not replay_reported:
+                        replay_reported = True
+                        elapsed = time.monotonic() - start_time
+                        self.log_debug(f"Replay finished: {bytes_received} bytes, {events_handled} lines/frames "
+                                       f"in {elapsed:.2f} s ({events_handled / max(elapsed, 1e-9):.0f} per s)")
+                    continue
+                
+                # perf_counter() for the latency trace, monotonic() for the
+                # consensus window, which ages frames by when they arrived
+                received_at = time.perf_counter()
+                received_time = time.monotonic()
+                bytes_received += len(data)
+                if self.recorder:
+                    self.recorder.record(data)
+                
+                for kind, payload in self.stream_decoder.feed(data):
+                    events_handled += 1
+                    try:
+                        if kind == "frame":
+                            self.handle_frame(payload, received_at, received_time)
+                        else:
+                            self.handle_line(payload, received_at, received_time)
+                    except Exception as e:
+                        self.log_debug(f"Error processing data: {str(e)}")
+                    
+            except Exception as e:
+                if self.link_port is None or self.should_stop:
+                    self.log_debug(f"Serial reading error: {str(e)}")
+                    time.sleep(0.1)  # Add a small delay before retrying
+                else:
+                    # The device went away (cable pulled, device reset)
+                    self.link_lost(e)
+        
+        self.log_debug("Serial reading thread stopped")
+    
+    def link_lost(self, error):
+        """Close the failed port and start reconnecting (serial thread)"""
+        with self.port_lock:
+            if self.should_stop:
+                # Disconnected on purpose, the read failed on the closed port
+                return
+            try:
+                self.serial_port.close()
+            except Exception:
+                pass
+            self.reconnector.lost(str(error))
+        self.commands.close("connection lost")
+        self.log_debug(f"Lost the connection to {self.link_port} ({str(error)}) - reconnecting")
+        self.event_queue.put(("link", ("lost",)))
+    
+    def reconnect(self):
+        """Try to open the lost port again once the backoff allows (serial thread)"""
+        wait = self.reconnector.wait()
+        if wait:
+            # Short naps, so a disconnect or the port being plugged in again is noticed
+            time.sleep(min(wait, 0.1))
+            return
+        
+        import serial
+        try:
+            port = serial.Serial(self.link_port, self.link_baud, timeout=SERIAL_READ_TIMEOUT)
+        except (OSError, ValueError, serial.SerialException) as e:
+            delay = self.reconnector.failed(str(e))
+            self.log_debug(f"Reconnect attempt {self.reconnector.attempts} to {self.link_port} failed, "
+                           f"next in {delay:.1f} s")
+            return
+        with self.port_lock:
+            if self.should_stop or not self.reconnector.reopened():
+                # Disconnected while the port was being opened
+                port.close()
+                return
+            
+            # The device may have restarted, so start over in text mode
+            self.protocol = "text"
+            self.class_labels = []
+            self.stream_decoder = StreamDecoder()
+            self.sequence_tracker = SequenceTracker()
+            self.commands = CommandChannel(self.write_port)
+            self.serial_port = port
+        self.log_debug(f"Reopened {self.link_port} after {self.reconnector.attempts} attempt(s)")
+        self.event_queue.put(("link", ("reopened",)))
+    
+    def handle_frame(self, frame, received_at=None, received_time=None):
+        """Process one binary detection (or heartbeat) frame, read at perf_counter() received_at"""
+        self.keepalive.heard()
+        heartbeat = frame.frame_type == FRAME_HEARTBEAT
+        trace = None
+        if not heartbeat and received_at is not None:
+            trace = self.latency.begin(received_at, frame.seq)
+            self.latency.reported(frame.latency_ms)
+        missing = self.sequence_tracker.update(frame.seq)
+        if missing:
+            self.log_debug(f"Dropped {missing} frame(s) before frame {frame.seq} "
+                           f"({self.sequence_tracker.dropped} dropped in total)")
+        
+        kind = "heartbeat" if heartbeat else "frame"
+        self.log_raw_data(f"[{kind} {frame.seq}] {len(frame.entries)} classes, {frame.latency_ms}ms", is_incoming=True)
+        
+        detections = []
+        for class_id, quantity, score in frame.entries:
+            if class_id < len(self.class_labels):
+                item = self.class_labels[class_id]
+            else:
+                item = f"class_{class_id}"
+            detections.append(Detection(item, quantity, score))
+        
+        # An empty frame means nothing is in view; a heartbeat repeats the
+        # reported state, which also corrects a lost report
+        if trace is not None:
+            self.latency.parsed(trace)
+        self.post_detections(detections, trace, received_time)
+    
+    def handle_line(self, line, received_at=None, received_time=None):
+        """Process one text line from the device, read at perf_counter() received_at"""
+        # Log the raw bytes data
+        self.log_raw_data(line, is_incoming=True)
+        
+        decoded_line = line.decode('utf-8', errors='replace').strip()
+        
+        # Detection messages are by far the most common, check them first
+        parsed = parse_detection_line(decoded_line)
+        if parsed is not None:
+            detections, errors = parsed
+            for error in errors:
+                self.log_debug(f"Error parsing part '{error.part}': {error.reason}")
+            
+            # A DETECTION message without valid items clears the list
+            self.keepalive.heard()
+            trace = None
+            if received_at is not None:
+                trace = self.latency.begin(received_at)
+                self.latency.parsed(trace)
+            self.post_detections(detections, trace, received_time)
+            return
+        
+        # Latency and stage timings that follow each report
+        latency_ms = parse_latency_line(decoded_line)
+        if latency_ms is not None:
+            self.latency.reported(latency_ms)
+            return
+        
+        timing = parse_timing_line(decoded_line)
+        if timing is not None:
+            self.latency.device_timing(*timing)
+            return
+        
+        # Heartbeats repeat the last report while nothing changes
+        parsed = parse_heartbeat_line(decoded_line)
+        if parsed is not None:
+            self.keepalive.heard()
+            self.post_detections(parsed[0], received_time=received_time)
+            return
+        
+        # Check for "No objects detected" message
+        if "No objects detected" in decoded_line:
+            self.log_debug("No objects detected - clearing detected items list")
+            # Clear the detected items list on the main thread
+            self.post_detections([], received_time=received_time)
+            return
+        
+        # Replies to tagged commands complete their futures (see
+        # send_command()) and are then handled like untagged ones
+        decoded_line, is_reply = self.commands.feed_line(decoded_line)
+        
+        # Reply to "proto=..." switches the decoding of detections
+        proto_reply = parse_proto_reply(decoded_line)
+        if proto_reply:
+            self.protocol, labels = proto_reply
+            if labels:
+                self.class_labels = labels
+            self.sequence_tracker.reset()
+            self.log_debug(f"Protocol set to {self.protocol} (labels: {self.class_labels})")
+            return
+        
+        # Reply to "report=..." changes how the detections are aggregated
+        report_reply = parse_report_reply(decoded_line)
+        if report_reply:
+            self.event_queue.put(("report", report_reply))
+            return
+        
+        # Just log other messages; replies were logged by command_done()
+        if decoded_line and not is_reply:
+            self.log_debug(f"Received message: {decoded_line}")
+    
+    def process_detections(self, detections):
+        """Process the detection data from Nicla Vision (runs on the Tk thread)"""
+        # An empty list is a frame with nothing in view; it still counts
+        # towards the consensus window
+        self.session.detections.update(detections)
+        self.log_debug(f"Processed {len(detections)} detections, consensus: {self.session.detections.counts}")
+        
+        # Already on the main thread, update the detected items treeview directly
+        self._update_detected_tree()
+    
+    def update_detected_tree(self):
+        """Schedule an update of the treeview"""
+        self.log_debug("Scheduling update of detected tree")
+        # Use after to ensure we're on the main thread
+        self.root.after(0, self._update_detected_tree)
+    
+    def _update_detected_tree(self):
+        """Internal function to update the detected tree on the main thread"""
+        try:
+            rows = {
+                item.item: (item.item, item.count, f"{item.price:.2f}", f"{item.confidence:.2f}")
+                for item in self.session.detections.items
+            }
+            
+            # Only rows that were added, removed or changed are touched; Tk
+            # redraws them when it is next idle
+            removed, added, changed = self.detected_view.render(rows)
+            if removed or added:
+                self.log_debug(f"Updated detected items tree: {len(rows)} items "
+                               f"(+{added} -{removed} ~{changed})")
+            
+        except Exception as e:
+            self.log_debug(f"Error updating detected tree: {str(e)}")
+    
+    def add_item(self):
+        """Add item to the biller's list"""
+        # Get the selected item from the combobox instead of text entry
+        item_name = self.item_var.get().strip()
+        quantity = self.quantity_entry.get()
+        
+        if not item_name:
+            messagebox.showwarning("Input Error", "Please select an item from the dropdown")
+            return
+        
+        try:
+            line = self.session.cart.add(item_name, int(quantity))
+        except ValueError:
+            messagebox.showwarning("Input Error", "Please enter a valid quantity")
+            return
+        
+        # Show the new cart line with price and total; the row id is the line id
+        self.biller_tree.insert('', tk.END, iid=str(line.line_id),
+                                values=(line.item, f"{line.price:.2f}", line.quantity, f"{line.total:.2f}"))
+        
+        # Reset the combobox and quantity entry
+        self.item_var.set("")  # Clear the combobox selection
+        self.price_var.set("0.00")  # Reset price display
+        self.quantity_entry.delete(0, tk.END)
+        self.quantity_entry.insert(0, "1")  # Reset quantity to 1
+        
+        self.log_debug(f"Added item: {line.quantity} x {line.item} @ ₹{line.price:.2f} = ₹{line.total:.2f}")
+        
+        # Calculate and update the total price
+        self.calculate_total()
+    
+    def remove_selected_items(self):
+        """Remove the selected lines from the biller's list"""
+        selected = self.biller_tree.selection()
+        if not selected:
+            messagebox.showwarning("Selection Required", "Please select the items to remove in the biller list")
+            return
+        
+        for row_id in selected:
+            line = self.session.cart.remove(int(row_id))
+            self.log_debug(f"Removed item: {line.quantity} x {line.item} @ ₹{line.price:.2f}")
+        self.biller_tree.delete(*selected)
+        
+        # The cart keeps the total up to date, just show it
+        self.calculate_total()
+    
+    def clear_all(self):
+        """Clear all entered and detected items"""
+        # Clear the biller items
+        for item in self.biller_tree.get_children():
+            self.biller_tree.delete(item)
+        
+        # Clear the detected items
+        self.detected_view.clear()
+        
+        # Clear the cart and the detections
+        self.session.clear()
+        
+        # Reset the combobox selection and price display
+        self.item_var.set("")
+        self.price_var.set("0.00")
+        
+        # Reset the total price
+        self.total_price_var.set("₹0.00")
+        
+        self.log_debug("Cleared all items")
+    
+    def verify_items(self):
+        """Verify if biller items match detected items"""
+        self.log_debug("Running verification process...")
+        
+        if not self.is_connected:
+            messagebox.showwarning("Connection Required", "Please connect to the Nicla Vision device first")
+            return
+        
+        self.log_debug(f"Verifying - Billed items: {self.session.cart.quantities}")
+        self.log_debug(f"Verifying - Detected items: {self.session.detections.counts}")
+        
+        mismatches = [format_mismatch(mismatch) for mismatch in self.session.verify()]
+        
+        # Show the result
+        if not mismatches:
+            self.log_debug("Verification successful - all items match")
+            self.message_var.set("✓ VERIFICATION SUCCESSFUL: All items match!")
+            messagebox.showinfo("Verification Result", "All items have been verified successfully!")
+        else:
+            self.log_debug(f"Verification failed - {len(mismatches)} mismatches found")
+            mismatch_message = "The following items do not match:\n\n" + "\n".join(mismatches)
+            self.message_var.set("✗ VERIFICATION FAILED: Mismatches found")
+            messagebox.showerror("Verification Failed", mismatch_message)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart Retail Verification System")
+    parser.add_argument("--replay", metavar="FILE", help="Play a recorded session instead of connecting to a device")
+    parser.add_argument("--speed", choices=REPLAY_SPEEDS, default=REPLAY_SPEEDS[0], help="Replay speed")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="SQLite product catalog (see catalog.py)")
+    parser.add_argument("--no-auto-connect", action="store_true", help="Don't reconnect to the port used last time")
+    parser.add_argument("--exit-when-ready", action="store_true",
+                        help="Report the time to ready and exit, for measuring startup")
+    args = parser.parse_args()
+    
+    root = tk.Tk()
+    # Start with the splash screen
+    splash = SplashScreen(root, replay_path=args.replay, replay_speed=args.speed, catalog_path=args.catalog,
+                          auto_connect=not args.no_auto_connect, exit_when_ready=args.exit_when_ready)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,59 @@
+# Keyed, incremental rendering of rows into a ttk.Treeview
+#
+# Instead of deleting and reinserting every row on every update, KeyedTreeView
+# remembers the values it rendered for each key (the row iid) and only touches
+# rows that were added, removed or changed. An update that changes nothing
+# makes no Tk calls at all, and nothing forces a synchronous redraw: Tk
+# repaints the changed rows when the main loop is next idle.
+import tkinter as tk
+
+
+def diff_rows(old, new):
+    """
+    Compare two {key: values} mappings.
+
+    Returns:
+        (removed, added, changed): keys only in old, keys only in new (in the
+        order of new) and keys in both whose values differ
+    """
+    removed = [key for key in old if key not in new]
+    added = []
+    changed = []
+    for key, values in new.items():
+        previous = old.get(key)
+        if previous is None:
+            added.append(key)
+        elif previous != values:
+            changed.append(key)
+    return removed, added, changed
+
+
+class KeyedTreeView:
+    """Render {key: values} rows into a Treeview, updating only the differences"""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.rows = {}
+
+    def render(self, rows):
+        """
+        Make the tree show rows, a {key: values tuple} mapping.
+
+        New rows are appended in the order of rows; existing rows keep their
+        position. Returns (removed, added, changed) as counts.
+        """
+        removed, added, changed = diff_rows(self.rows, rows)
+        tree = self.tree
+        if removed:
+            tree.delete(*removed)
+        for key in added:
+            tree.insert('', tk.END, iid=key, values=rows[key])
+        for key in changed:
+            tree.item(key, values=rows[key])
+        self.rows = rows
+        return len(removed), len(added), len(changed)
+
+    def clear(self):
+        if self.rows:
+            self.tree.delete(*self.rows)
+        self.rows = {}
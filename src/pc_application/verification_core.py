@@ -0,0 +1,310 @@
+# UI-free verification core for the Smart Retail Verification System
+#
+# The cart the biller fills in, the detections reported by the Nicla Vision and
+# the comparison between the two, with no Tk access. The GUI is a view over a
+# VerificationSession; services and benchmarks can drive one directly.
+import time
+from collections import deque, namedtuple
+from decimal import Decimal
+
+# One line of the biller's cart; price and total are Decimal
+CartLine = namedtuple("CartLine", ["line_id", "item", "price", "quantity", "total"])
+
+# One detected class after aggregating a frame
+DetectedItem = namedtuple("DetectedItem", ["item", "count", "price", "confidence"])
+
+# An item whose billed and detected quantities differ
+Mismatch = namedtuple("Mismatch", ["item", "billed", "detected"])
+
+
+# Money is kept as Decimal rounded to paise
+MONEY_QUANTUM = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+
+def to_money(value):
+    """Exact Decimal amount of a price given as float, str, int or Decimal"""
+    if not isinstance(value, Decimal):
+        # Through str so 25.1 becomes 25.10, not the binary float expansion
+        value = Decimal(str(value))
+    return value.quantize(MONEY_QUANTUM)
+
+
+def price_of(prices, item):
+    """Catalog price of an item as money, 0.00 for unknown items"""
+    return to_money(prices.get(item, 0))
+
+
+def canonical_name(prices, item):
+    """
+    The catalog's name for an item typed by the biller or reported by the
+    device, so both sides of the verification use the same key. Plain dicts of
+    prices have no other names; a CatalogStore also resolves class labels,
+    aliases and case.
+    """
+    lookup = getattr(prices, "lookup", None)
+    if lookup is None:
+        return item
+    product = lookup(item)
+    return item if product is None else product.name
+
+
+def format_mismatch(mismatch):
+    return f"{mismatch.item}: Billed {mismatch.billed}, Detected {mismatch.detected}"
+
+
+class Cart:
+    """
+    The items entered by the biller.
+
+    Lines are kept by id. The per-item multiset of quantities and the running
+    total are updated on every add and remove, so getting the total or
+    verifying never walks the lines.
+    """
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.clear()
+
+    def add(self, item, quantity):
+        """
+        Add quantity units of item at its catalog price.
+
+        Returns:
+            The CartLine that was added. Raises ValueError for a quantity that
+            is not a positive integer.
+        """
+        if not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError("Quantity must be positive")
+        item = canonical_name(self.prices, item)
+        price = price_of(self.prices, item)
+        line = CartLine(self.next_line_id, item, price, quantity, price * quantity)
+        self.next_line_id += 1
+        self.lines[line.line_id] = line
+        self.quantities[item] = self.quantities.get(item, 0) + quantity
+        self.total += line.total
+        return line
+
+    def add_many(self, entries):
+        """Add (item, quantity) pairs, e.g. a bulk order; returns the new lines"""
+        return [self.add(item, quantity) for item, quantity in entries]
+
+    def remove(self, line_id):
+        """Remove one line by id and return it (KeyError if there is no such line)"""
+        line = self.lines.pop(line_id)
+        remaining = self.quantities[line.item] - line.quantity
+        if remaining:
+            self.quantities[line.item] = remaining
+        else:
+            del self.quantities[line.item]
+        self.total -= line.total
+        return line
+
+    def clear(self):
+        self.lines = {}
+        self.quantities = {}
+        self.total = ZERO
+        self.next_line_id = 1
+
+    def __len__(self):
+        return len(self.lines)
+
+
+class DetectionState:
+    """
+    The detected items, as a consensus over the most recent detection frames.
+
+    Each class keeps a histogram of the quantities it had in the frames of the
+    window (frames where it was missing count as 0), so the reported quantity
+    is the mode or median of the window rather than whatever the last frame
+    said. A window of one frame reports the latest frame as it is.
+
+    Args:
+        prices: {item: price} used to price the detected items
+        window_frames: Number of most recent frames in the window
+        window_ms: Optionally also drop frames older than this
+        statistic: "mode" or "median" of the quantities in the window
+    """
+
+    def __init__(self, prices, window_frames=1, window_ms=None, statistic="mode"):
+        if statistic not in ("mode", "median"):
+            raise ValueError(f"Unknown statistic: {statistic}")
+        self.prices = prices
+        self.window_frames = max(1, window_frames)
+        self.window_ms = window_ms
+        self.statistic = statistic
+        self.clear()
+
+    def set_window(self, window_frames, window_ms=None):
+        """
+        Change the window, e.g. to one frame when the device only reports
+        debounced changes. Frames beyond the new size are dropped at once.
+        """
+        self.window_frames = max(1, window_frames)
+        self.window_ms = window_ms
+        while len(self.frames) > self.window_frames:
+            self._evict()
+        self._compute()
+
+    def clear(self):
+        self.items = []
+        self.counts = {}
+        # (time, {class: (quantity, confidence)}) for each frame in the window
+        self.frames = deque()
+        # Per class: {quantity: frames} for quantities > 0, number of frames
+        # the class was present in and the sum of its confidences
+        self.histograms = {}
+        self.present = {}
+        self.confidence_sums = {}
+        self.latest = {}
+
+    def update(self, detections, now=None):
+        """
+        Add one frame of detections and recompute the consensus.
+
+        The cost depends on the number of classes, not on the window size.
+
+        Args:
+            detections: iterable of (item, quantity, score), e.g. Detection
+                records; classes reported more than once are summed. An empty
+                frame means nothing was in view.
+            now: Frame time in seconds (time.monotonic() by default)
+        """
+        if now is None:
+            now = time.monotonic()
+
+        prices = self.prices
+        counts = {}
+        confidence_sums = {}
+        for class_name, quantity, confidence in detections:
+            class_name = canonical_name(prices, class_name)
+            if class_name in counts:
+                counts[class_name] += quantity
+                confidence_sums[class_name] += confidence
+            else:
+                counts[class_name] = quantity
+                confidence_sums[class_name] = confidence
+        frame = {
+            class_name: (count, confidence_sums[class_name] / (count if count > 0 else 1))
+            for class_name, count in counts.items()
+        }
+
+        self._push(now, frame)
+        while len(self.frames) > self.window_frames or (
+                self.window_ms is not None and (now - self.frames[0][0]) * 1000.0 > self.window_ms):
+            self._evict()
+        self.latest = counts
+
+        self._compute()
+        return self.items
+
+    def _push(self, now, frame):
+        self.frames.append((now, frame))
+        for class_name, (count, confidence) in frame.items():
+            histogram = self.histograms.get(class_name)
+            if histogram is None:
+                histogram = self.histograms[class_name] = {}
+                self.present[class_name] = 0
+                self.confidence_sums[class_name] = 0.0
+            histogram[count] = histogram.get(count, 0) + 1
+            self.present[class_name] += 1
+            self.confidence_sums[class_name] += confidence
+
+    def _evict(self):
+        _, frame = self.frames.popleft()
+        for class_name, (count, confidence) in frame.items():
+            histogram = self.histograms[class_name]
+            if histogram[count] == 1:
+                del histogram[count]
+            else:
+                histogram[count] -= 1
+            self.present[class_name] -= 1
+            if self.present[class_name] == 0:
+                # Gone from the whole window; also drops rounding residue
+                del self.histograms[class_name]
+                del self.present[class_name]
+                del self.confidence_sums[class_name]
+            else:
+                self.confidence_sums[class_name] -= confidence
+
+    def _consensus(self, class_name, histogram, frames):
+        """Mode or median quantity of a class over the frames of the window"""
+        absent = frames - self.present[class_name]
+        if self.statistic == "median":
+            # Lower median, counting the frames the class was absent as 0
+            middle = (frames + 1) // 2
+            if absent >= middle:
+                return 0
+            seen = absent
+            for count in sorted(histogram):
+                seen += histogram[count]
+                if seen >= middle:
+                    return count
+        # Mode; a tie goes to the latest frame's quantity, then the larger one
+        latest = self.latest.get(class_name, 0)
+        best, best_frames = 0, absent
+        for count, count_frames in histogram.items():
+            if count_frames > best_frames or (count_frames == best_frames and (
+                    count == latest or (best != latest and count > best))):
+                best, best_frames = count, count_frames
+        return best
+
+    def _compute(self):
+        frames = len(self.frames)
+        prices = self.prices
+        items = []
+        counts = {}
+        for class_name, histogram in self.histograms.items():
+            count = self._consensus(class_name, histogram, frames)
+            if count <= 0:
+                continue
+            counts[class_name] = count
+            # Smoothed confidence: mean over the frames the class was seen in
+            confidence = self.confidence_sums[class_name] / self.present[class_name]
+            items.append(DetectedItem(class_name, count, price_of(prices, class_name), confidence))
+        self.items = items
+        self.counts = counts
+
+
+def verify(billed, detected):
+    """
+    Compare two multisets of item quantities.
+
+    Args:
+        billed: {item: quantity} entered by the biller
+        detected: {item: quantity} reported by the device
+
+    Returns:
+        A list of Mismatch, billed items first, empty when everything matches
+    """
+    mismatches = []
+    for item_name, billed_count in billed.items():
+        detected_count = detected.get(item_name, 0)
+        if billed_count != detected_count:
+            mismatches.append(Mismatch(item_name, billed_count, detected_count))
+
+    # Items detected but not billed
+    for item_name, detected_count in detected.items():
+        if item_name not in billed:
+            mismatches.append(Mismatch(item_name, 0, detected_count))
+    return mismatches
+
+
+class VerificationSession:
+    """
+    A cart and the detections it is verified against, for one checkout counter.
+
+    Keyword arguments configure the detection window, see DetectionState.
+    """
+
+    def __init__(self, prices, window_frames=1, window_ms=None, statistic="mode"):
+        self.prices = prices
+        self.cart = Cart(prices)
+        self.detections = DetectionState(prices, window_frames, window_ms, statistic)
+
+    def verify(self):
+        return verify(self.cart.quantities, self.detections.counts)
+
+    def clear(self):
+        self.cart.clear()
+        self.detections.clear()
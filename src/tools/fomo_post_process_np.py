@@ -0,0 +1,416 @@
+# Host-side (CPython + NumPy) port of the FOMO post-processing that runs on the
+# Nicla Vision in src/nicla/object_detection_nicla_improved_accuracy_post_processing.py
+#
+# The device version builds one image.Image per class, calls find_blobs() on it
+# and then get_statistics() once per blob. Here the raw (1, oh, ow, oc) output
+# tensor is thresholded, labelled and scored for all classes in one batched
+# pass, so recorded heatmaps can be re-scored offline and the result used as a
+# reference when benchmarking the device code. fomo_post_process_batch() does
+# the same for a whole stack of frames, including the blob merging and the
+# soft-NMS, which is several times faster than one call per frame; the
+# "fomo" cases of benchmarks/bench_hot_paths.py record both rates.
+#
+# Usage:
+#   python fomo_post_process_np.py heatmaps.npy --min-confidence 0.6 --roi 0 0 320 240 [--batch 1000]
+import argparse
+import math
+import time
+
+import numpy as np
+
+# Same defaults as the device script
+DEFAULT_MIN_CONFIDENCE = 0.6
+DEFAULT_ROI = (0, 0, 320, 240)
+
+# Frames post-processed together by the command line tool
+DEFAULT_BATCH = 1000
+
+# Defaults of ml.utils.NMS.get_bounding_boxes()
+NMS_THRESHOLD = 0.1
+NMS_SIGMA = 0.1
+
+
+def to_grayscale(heatmaps):
+    """Convert float class heatmaps to the uint8 pixels image.Image(x * 255) holds"""
+    return np.clip(np.asarray(heatmaps, dtype=np.float32) * 255, 0, 255).astype(np.uint8)
+
+
+def _label_components(mask):
+    """
+    Label 4-connected components of every class plane at once.
+
+    Args:
+        mask: Boolean array of shape (oc, oh, ow)
+
+    Returns:
+        Integer array of the same shape. Each foreground pixel holds the flat
+        index of the first (raster order) pixel of its component, background
+        pixels hold mask.size.
+    """
+    background = mask.size
+    flat_index = np.arange(mask.size).reshape(mask.shape)
+    labels = np.where(mask, flat_index, background)
+
+    while True:
+        merged = labels.copy()
+        # Pull the smallest label from the 4 neighbours. Planes are never mixed
+        # because the class axis is left alone.
+        np.minimum(merged[:, 1:, :], labels[:, :-1, :], out=merged[:, 1:, :])
+        np.minimum(merged[:, :-1, :], labels[:, 1:, :], out=merged[:, :-1, :])
+        np.minimum(merged[:, :, 1:], labels[:, :, :-1], out=merged[:, :, 1:])
+        np.minimum(merged[:, :, :-1], labels[:, :, 1:], out=merged[:, :, :-1])
+        merged = np.where(mask, merged, background)
+
+        # Pointer jumping: a label is the index of a pixel in the same component,
+        # so following it shortcuts long chains.
+        fg = merged[mask]
+        merged[mask] = merged.reshape(-1)[fg]
+
+        if np.array_equal(merged, labels):
+            return labels
+        labels = merged
+
+
+def _merge_rect_groups(rects, groups):
+    """
+    Merge overlapping rectangles until none overlap, within each group (a
+    class of one frame) and for all groups at once. Gives the same result as
+    find_blobs(merge=True, margin=0) merging two blobs at a time.
+
+    Args:
+        rects: Integer array of shape (n, 4) of (x, y, w, h)
+        groups: Group of each rect; rects are sorted by group and within a
+            group in the order find_blobs() reports them
+
+    Returns:
+        (rects, groups) of the merged rectangles. Each takes the place of the
+        first rect it absorbed.
+    """
+    rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+    groups = np.asarray(groups)
+    while True:
+        count = len(rects)
+        x0 = rects[:, 0]
+        y0 = rects[:, 1]
+        x1 = x0 + rects[:, 2]
+        y1 = y0 + rects[:, 3]
+
+        # Every ordered pair of rects in the same group
+        starts = np.searchsorted(groups, groups, side="left")
+        sizes = np.searchsorted(groups, groups, side="right") - starts
+        first = np.repeat(np.arange(count), sizes)
+        second = np.repeat(starts - (np.cumsum(sizes) - sizes), sizes) + np.arange(len(first))
+        overlap = ((first != second) & (x0[first] < x1[second]) & (x1[first] > x0[second]) &
+                   (y0[first] < y1[second]) & (y1[first] > y0[second]))
+        if not overlap.any():
+            return rects, groups
+        first = first[overlap]
+        second = second[overlap]
+
+        # Components of the overlap graph, labelled with their lowest index,
+        # so the merged rects keep the order of their first member
+        labels = np.arange(count)
+        while True:
+            merged = labels.copy()
+            np.minimum.at(merged, first, labels[second])
+            merged = merged[merged]
+            if np.array_equal(merged, labels):
+                break
+            labels = merged
+
+        roots, inverse = np.unique(labels, return_inverse=True)
+        left = x0[roots].copy()
+        top = y0[roots].copy()
+        right = x1[roots].copy()
+        bottom = y1[roots].copy()
+        np.minimum.at(left, inverse, x0)
+        np.minimum.at(top, inverse, y0)
+        np.maximum.at(right, inverse, x1)
+        np.maximum.at(bottom, inverse, y1)
+        # Merged rects can overlap others now, so go round again
+        rects = np.stack([left, top, right - left, bottom - top], axis=1)
+        groups = groups[roots]
+
+
+def _merge_rects(rects):
+    """Merge overlapping rectangles of one class until none overlap"""
+    if len(rects) < 2:
+        return list(rects)
+    merged, _ = _merge_rect_groups(rects, np.zeros(len(rects), dtype=np.int64))
+    return [tuple(rect) for rect in merged.tolist()]
+
+
+def find_class_blobs_batch(heatmaps, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """
+    Threshold, label and score the blobs of every class of a stack of frames
+    in one pass.
+
+    Args:
+        heatmaps: FOMO outputs of shape (frames, oh, ow, oc)
+        min_confidence: Same meaning as min_confidence on the device
+
+    Returns:
+        (frame, class, rects, scores) arrays with one entry per blob: rects
+        of (x, y, w, h) in output-grid coordinates, sorted by frame and class
+        and within a class in the order find_blobs() would report them
+    """
+    heatmaps = np.asarray(heatmaps)
+    frames, oh, ow, oc = heatmaps.shape
+
+    # Class-major planes, as the device loops over outputs[0][0, :, :, i]
+    pixels = to_grayscale(heatmaps).transpose(0, 3, 1, 2).reshape(frames * oc, oh, ow)
+    mask = pixels >= math.ceil(min_confidence * 255)
+
+    if not mask.any():
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros((0, 4), dtype=np.int64), np.zeros(0)
+
+    labels = _label_components(mask)
+    planes, ys, xs = np.nonzero(mask)
+    roots, inverse = np.unique(labels[mask], return_inverse=True)
+
+    # Bounding box of every component
+    count = len(roots)
+    x_min = np.full(count, ow)
+    y_min = np.full(count, oh)
+    x_max = np.full(count, -1)
+    y_max = np.full(count, -1)
+    np.minimum.at(x_min, inverse, xs)
+    np.minimum.at(y_min, inverse, ys)
+    np.maximum.at(x_max, inverse, xs)
+    np.maximum.at(y_max, inverse, ys)
+
+    # merge=True on the device joins blobs whose rectangles overlap. Roots
+    # are flat pixel indices, so the blobs come sorted by plane.
+    rects = np.stack([x_min, y_min, x_max - x_min + 1, y_max - y_min + 1], axis=1)
+    rects, blob_planes = _merge_rect_groups(rects, roots // (oh * ow))
+
+    # Summed-area tables of thresholded pixel values and pixel counts, used for
+    # the get_statistics(thresholds=..., roi=rect).l_mean() score of each rect
+    sums = np.zeros((frames * oc, oh + 1, ow + 1), dtype=np.int64)
+    counts = np.zeros((frames * oc, oh + 1, ow + 1), dtype=np.int64)
+    sums[:, 1:, 1:] = np.where(mask, pixels, 0).cumsum(1).cumsum(2)
+    counts[:, 1:, 1:] = mask.cumsum(1).cumsum(2)
+
+    c = blob_planes
+    x, y, w, h = rects.T
+    total = sums[c, y + h, x + w] - sums[c, y, x + w] - sums[c, y + h, x] + sums[c, y, x]
+    n = counts[c, y + h, x + w] - counts[c, y, x + w] - counts[c, y + h, x] + counts[c, y, x]
+    # l_mean() is an integer on the device
+    scores = np.floor(total / n + 0.5) / 255.0
+
+    return blob_planes // oc, blob_planes % oc, rects, scores
+
+
+def find_class_blobs(heatmaps, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """
+    Threshold, label and score the blobs of every class in one pass.
+
+    Args:
+        heatmaps: FOMO output of shape (oh, ow, oc) or (1, oh, ow, oc)
+        min_confidence: Same meaning as min_confidence on the device
+
+    Returns:
+        List with one entry per class. Each entry is a list of
+        ((x, y, w, h), score) in output-grid coordinates, in the order
+        find_blobs() would report them.
+    """
+    heatmaps = np.asarray(heatmaps)
+    if heatmaps.ndim == 3:
+        heatmaps = heatmaps[np.newaxis]
+    _, classes, rects, scores = find_class_blobs_batch(heatmaps[:1], min_confidence)
+
+    result = [[] for _ in range(heatmaps.shape[-1])]
+    for cls, rect, score in zip(classes.tolist(), rects.tolist(), scores.tolist()):
+        result[cls].append((tuple(rect), score))
+    return result
+
+
+def soft_nms_batch(boxes, scores, threshold=NMS_THRESHOLD, sigma=NMS_SIGMA):
+    """
+    Gaussian soft-NMS over all classes, as done by ml.utils.NMS, for many
+    frames at once.
+
+    Args:
+        boxes: Array of shape (frames, n, 4) of (xmin, ymin, xmax, ymax)
+        scores: Array of shape (frames, n); -inf pads frames with fewer boxes
+
+    Returns:
+        (frames, indices, scores) arrays of the kept boxes, sorted by frame
+        and within a frame in selection order
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    scores = np.array(scores, dtype=np.float64)
+    frame_count, box_count = scores.shape
+
+    # Pairwise IoU and the Gaussian decay it causes, computed once up front
+    areas = (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1])
+    iw = (np.minimum(boxes[:, :, None, 2], boxes[:, None, :, 2]) -
+          np.maximum(boxes[:, :, None, 0], boxes[:, None, :, 0]))
+    ih = (np.minimum(boxes[:, :, None, 3], boxes[:, None, :, 3]) -
+          np.maximum(boxes[:, :, None, 1], boxes[:, None, :, 1]))
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+    union = areas[:, :, None] + areas[:, None, :] - inter
+    iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+    decay = np.exp(-(iou * iou) / sigma)
+
+    frames = np.arange(frame_count)
+    kept_frames = []
+    kept = []
+    kept_scores = []
+    for _ in range(box_count):
+        index = np.argmax(scores, axis=1)
+        best = scores[frames, index]
+        # A frame is done once its best score is below the threshold; decay
+        # only lowers the scores, so it stays done
+        active = best >= threshold
+        if not active.any():
+            break
+        kept_frames.append(frames[active])
+        kept.append(index[active])
+        kept_scores.append(best[active])
+        # Decay the overlapping boxes instead of discarding them, and take the
+        # selected one out of the running
+        scores[active] *= decay[frames[active], index[active]]
+        scores[frames[active], index[active]] = -np.inf
+
+    if not kept:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    kept_frames = np.concatenate(kept_frames)
+    # Steps were appended in order, so a stable sort keeps the selection order
+    order = np.argsort(kept_frames, kind="stable")
+    return kept_frames[order], np.concatenate(kept)[order], np.concatenate(kept_scores)[order]
+
+
+def soft_nms(boxes, scores, threshold=NMS_THRESHOLD, sigma=NMS_SIGMA):
+    """
+    Gaussian soft-NMS over all classes, as done by ml.utils.NMS.
+
+    Args:
+        boxes: Array of (xmin, ymin, xmax, ymax)
+        scores: Array of scores, one per box
+
+    Returns:
+        (indices, scores) of the kept boxes in selection order
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(1, -1, 4)
+    scores = np.asarray(scores, dtype=np.float64).reshape(1, -1)
+    _, kept, kept_scores = soft_nms_batch(boxes, scores, threshold, sigma)
+    return kept.tolist(), kept_scores.tolist()
+
+
+def fomo_post_process_batch(outputs, roi=DEFAULT_ROI, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """
+    fomo_post_process() for a stack of frames, with the labelling, scoring
+    and soft-NMS of all frames done in one batched pass.
+
+    Args:
+        outputs: Raw model outputs of shape (frames, oh, ow, oc)
+        roi: (x, y, w, h) of the model input inside the snapshot
+        min_confidence: Same meaning as min_confidence on the device
+
+    Returns:
+        One fomo_post_process() result per frame
+    """
+    outputs = np.asarray(outputs)
+    frame_count, oh, ow, _ = outputs.shape
+    blob_frames, blob_classes, rects, scores = find_class_blobs_batch(outputs, min_confidence)
+
+    results = [[] for _ in range(frame_count)]
+    if not len(blob_frames):
+        return results
+
+    # Boxes of every frame in class order, padded to the busiest frame
+    per_frame = np.bincount(blob_frames, minlength=frame_count)
+    first_blob = np.cumsum(per_frame) - per_frame
+    slots = np.arange(len(blob_frames)) - first_blob[blob_frames]
+    boxes = np.zeros((frame_count, per_frame.max(), 4), dtype=np.int64)
+    boxes[blob_frames, slots] = np.concatenate([rects[:, :2], rects[:, :2] + rects[:, 2:]], axis=1)
+    padded_scores = np.full((frame_count, per_frame.max()), -np.inf)
+    padded_scores[blob_frames, slots] = scores
+
+    kept_frames, kept, kept_scores = soft_nms_batch(boxes, padded_scores)
+
+    # Project from the output grid back onto the input roi
+    rx, ry, rw, rh = roi
+    x_scale = rw / ow
+    y_scale = rh / oh
+    xmin, ymin, xmax, ymax = boxes[kept_frames, kept].T
+    projected = np.stack([(xmin * x_scale).astype(np.int64) + rx, (ymin * y_scale).astype(np.int64) + ry,
+                          ((xmax - xmin) * x_scale).astype(np.int64),
+                          ((ymax - ymin) * y_scale).astype(np.int64)], axis=1)
+    labels = blob_classes[first_blob[kept_frames] + kept]
+
+    # Classes up to the highest one with a blob in the frame, kept or not
+    class_count = np.zeros(frame_count, dtype=np.int64)
+    np.maximum.at(class_count, blob_frames, blob_classes + 1)
+    for frame in np.nonzero(per_frame)[0].tolist():
+        results[frame] = [[] for _ in range(class_count[frame])]
+    for frame, label, rect, score in zip(kept_frames.tolist(), labels.tolist(), projected.tolist(),
+                                         kept_scores.tolist()):
+        results[frame][label].append((tuple(rect), score))
+    return results
+
+
+def fomo_post_process(outputs, roi=DEFAULT_ROI, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """
+    NumPy equivalent of fomo_post_process() on the device.
+
+    Args:
+        outputs: Raw model output tensor of shape (1, oh, ow, oc)
+        roi: (x, y, w, h) of the model input inside the snapshot
+        min_confidence: Same meaning as min_confidence on the device
+
+    Returns:
+        Same structure as NMS.get_bounding_boxes(): a list indexed by class with
+        lists of ((x, y, w, h), score) in snapshot coordinates, or [] when
+        nothing was found.
+    """
+    outputs = np.asarray(outputs)
+    if outputs.ndim == 3:
+        outputs = outputs[np.newaxis]
+    return fomo_post_process_batch(outputs[:1], roi, min_confidence)[0]
+
+
+def load_heatmaps(path):
+    """Load saved output tensors as an array of shape (frames, oh, ow, oc)"""
+    data = np.load(path)
+    if hasattr(data, "files"):
+        data = data[data.files[0]]
+    if data.ndim == 3:
+        data = data[np.newaxis]
+    elif data.ndim == 5:
+        data = data[:, 0]
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score recorded FOMO heatmaps on the host")
+    parser.add_argument("path", help=".npy/.npz file with output tensors (frames, oh, ow, oc)")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE)
+    parser.add_argument("--roi", type=int, nargs=4, default=DEFAULT_ROI, metavar=("X", "Y", "W", "H"))
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="Frames post-processed per batch")
+    parser.add_argument("--quiet", action="store_true", help="Only print the throughput")
+    args = parser.parse_args()
+
+    heatmaps = load_heatmaps(args.path)
+
+    start = time.perf_counter()
+    results = []
+    for batch_start in range(0, len(heatmaps), args.batch):
+        results += fomo_post_process_batch(heatmaps[batch_start:batch_start + args.batch], tuple(args.roi),
+                                           args.min_confidence)
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        for frame_index, boxes in enumerate(results):
+            # Skip the background class, as the device loop does
+            summary = ", ".join(f"{label}:{len(dets)}" for label, dets in enumerate(boxes) if label and dets)
+            print(f"frame {frame_index}: {summary or 'no objects'}")
+
+    fps = len(heatmaps) / elapsed if elapsed > 0 else float("inf")
+    print(f"{len(heatmaps)} frames in {elapsed:.3f} s ({fps:.0f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
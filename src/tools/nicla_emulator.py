@@ -0,0 +1,345 @@
+# Nicla Vision emulator on a pseudo-terminal
+#
+# Opens one or more PTYs and behaves like the detection firmware on each of
+# them: it answers the start, stop, conf=, delay=, fps=, scene=, report=,
+# timing=, status and proto= commands the same way process_commands() does
+# (with or without a "#<id>" tag) and sends DETECTION and LATENCY lines (or
+# binary frames after "proto=bin"), and TIMING lines after "timing=on", at a
+# configurable frame rate and object density.
+# Each PTY is also linked at a stable path (/tmp/nicla-emulator-<n> by
+# default) that the PC application lists next to the real serial ports.
+#
+# Usage:
+#   python nicla_emulator.py [--count 1] [--fps 100] [--density 3] [--hold 0.9] [--replug-every 30]
+#
+# Linux/macOS only.
+import argparse
+import os
+import random
+import select
+import signal
+import sys
+import time
+import tty
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pc_application"))
+
+from nicla_protocol import encode_detection_frame, FRAME_DETECTION, FRAME_HEARTBEAT  # noqa: E402
+
+DEFAULT_LINK_PREFIX = "/tmp/nicla-emulator-"
+DEFAULT_CLASSES = ["KitKat", "goodday", "HidenSeek", "Unibic"]
+
+# Same as REPORT_HYSTERESIS and HEARTBEAT_MS in the device script
+REPORT_HYSTERESIS = 2
+HEARTBEAT_MS = 2000
+
+# Emulated TIMING lines split the frame latency between the device stages like this
+TIMING_SHARES = (("capture", 0.15), ("scene", 0.05), ("inference", 0.6), ("postprocess", 0.12), ("merge", 0.03),
+                 ("uart", 0.05))
+
+
+class EmulatedDevice:
+    """One emulated Nicla Vision behind a PTY"""
+
+    def __init__(self, link, classes, fps, density, min_confidence=0.6, latency_ms=60, seed=None, hold=0.0):
+        self.link = link
+        self.labels = ["background"] + list(classes)
+        self.density = density
+        self.hold = hold
+        self.latency_ms = latency_ms
+        self.rng = random.Random(seed)
+
+        # Same defaults and state as the firmware
+        self.min_confidence = min_confidence
+        self.delay_ms = max(0, int(round(1000 / fps))) if fps else 1000
+        self.is_running = True
+        self.use_binary_frames = False
+        self.scene_threshold = 2.0
+        self.frame_seq = 0
+        self.report_changes_only = False
+        self.reported_counts = None
+        self.reported_detections = {}
+        self.pending_counts = None
+        self.pending_frames = 0
+        self.last_report_at = 0.0
+        self.timing_enabled = False
+        self.detections = {}
+
+        self.master = None
+        self.slave = None
+        self.input_buffer = bytearray()
+        self.next_frame = time.monotonic()
+
+        self.frames_sent = 0
+        self.bytes_dropped = 0
+
+    def open(self):
+        """Create the PTY and point the link at it"""
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        slave_name = os.ttyname(self.slave)
+
+        if os.path.lexists(self.link):
+            os.remove(self.link)
+        os.symlink(slave_name, self.link)
+
+        self.input_buffer.clear()
+        self.write("Object detection system ready\r\n")
+        return slave_name
+
+    def close(self):
+        """Close the PTY, which looks like an unplugged cable to the PC"""
+        # Leave the link alone if another emulator has taken it over since
+        if self.slave is not None and os.path.islink(self.link) \
+                and os.readlink(self.link) == os.ttyname(self.slave):
+            os.remove(self.link)
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = None
+
+    def fileno(self):
+        return self.master
+
+    def write(self, data):
+        """Write to the PC; like a UART nobody listens to, output that doesn't fit is lost"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        try:
+            written = os.write(self.master, data)
+        except (BlockingIOError, OSError):
+            written = 0
+        self.bytes_dropped += len(data) - written
+
+    def handle_input(self):
+        """Read and execute the commands the PC sent"""
+        try:
+            data = os.read(self.master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        self.input_buffer.extend(data)
+        while True:
+            newline = self.input_buffer.find(b"\n")
+            if newline == -1:
+                break
+            line = bytes(self.input_buffer[:newline])
+            del self.input_buffer[:newline + 1]
+            cmd = line.decode("utf-8", errors="replace").strip()
+            if cmd:
+                self.process_command(cmd)
+
+    def process_command(self, cmd):
+        """Answer one command line, tagged "#<id> <command>" or not, as process_commands() does"""
+        tag = ""
+        if cmd.startswith("#"):
+            parts = cmd.split(" ", 1)
+            tag = parts[0] + " "
+            cmd = parts[1].strip() if len(parts) > 1 else ""
+        self.write(f"{tag}{self.execute_command(cmd)}\r\n")
+
+    def execute_command(self, cmd):
+        """Mirror of execute_command() in the device script"""
+        if cmd == "start":
+            self.is_running = True
+            return "Detection started"
+        elif cmd == "stop":
+            self.is_running = False
+            return "Detection stopped"
+        elif cmd.startswith("conf="):
+            try:
+                self.min_confidence = float(cmd.split("=")[1])
+                return f"Confidence set to {self.min_confidence}"
+            except ValueError:
+                return "Invalid confidence value"
+        elif cmd.startswith("delay="):
+            try:
+                self.delay_ms = int(cmd.split("=")[1])
+                return f"Delay set to {self.delay_ms}ms"
+            except ValueError:
+                return "Invalid delay value"
+        elif cmd.startswith("fps="):
+            try:
+                fps = float(cmd.split("=")[1])
+                self.delay_ms = int(round(1000 / fps)) if fps > 0 else 0
+                return f"Delay set to {self.delay_ms}ms"
+            except ValueError:
+                return "Invalid fps value"
+        elif cmd.startswith("scene="):
+            # Accepted for compatibility; emulated frames are never skipped
+            try:
+                self.scene_threshold = float(cmd.split("=")[1])
+                return f"Scene threshold set to {self.scene_threshold}"
+            except ValueError:
+                return "Invalid scene value"
+        elif cmd == "report=change":
+            self.report_changes_only = True
+            self.reported_counts = None
+            return f"REPORT|change|{HEARTBEAT_MS}"
+        elif cmd == "report=every":
+            self.report_changes_only = False
+            return "REPORT|every"
+        elif cmd == "timing=on":
+            self.timing_enabled = True
+            return "Timing on"
+        elif cmd == "timing=off":
+            self.timing_enabled = False
+            return "Timing off"
+        elif cmd == "proto=bin":
+            self.use_binary_frames = True
+            return f"PROTO|bin|{','.join(self.labels)}"
+        elif cmd == "proto=text":
+            self.use_binary_frames = False
+            return "PROTO|text"
+        elif cmd == "status":
+            status = "Running" if self.is_running else "Stopped"
+            protocol = "bin" if self.use_binary_frames else "text"
+            report = "change" if self.report_changes_only else "every"
+            return (f"Status: {status}, Confidence: {self.min_confidence}, "
+                    f"Delay: {self.delay_ms}ms, Protocol: {protocol}, Scene: {self.scene_threshold}, "
+                    f"Report: {report}")
+        else:
+            return f"Unknown command: {cmd}"
+
+    def detect(self):
+        """
+        Random detections: {class_id: (quantity, best score)}. With probability
+        hold the previous frame's detections are kept (a still tray).
+        """
+        if self.hold and self.rng.random() < self.hold:
+            return self.detections
+        objects = self.rng.randint(0, int(round(self.density * 2)))
+        detections = {}
+        for _ in range(objects):
+            class_id = self.rng.randrange(1, len(self.labels))
+            score = self.rng.uniform(self.min_confidence, 1.0)
+            quantity, best = detections.get(class_id, (0, 0.0))
+            detections[class_id] = (quantity + 1, max(best, score))
+        self.detections = detections
+        return detections
+
+    def report_kind(self, detections, now):
+        """Mirror of report_kind() in the device script"""
+        counts = {class_id: quantity for class_id, (quantity, _) in detections.items()}
+        if counts == self.reported_counts:
+            self.pending_counts = None
+            self.pending_frames = 0
+        elif counts == self.pending_counts:
+            self.pending_frames += 1
+        else:
+            self.pending_counts = counts
+            self.pending_frames = 1
+
+        if self.pending_counts is not None and (self.reported_counts is None or
+                                                self.pending_frames >= REPORT_HYSTERESIS):
+            self.reported_counts = self.pending_counts
+            self.pending_counts = None
+            self.pending_frames = 0
+            return "DETECTION"
+        if (now - self.last_report_at) * 1000 >= HEARTBEAT_MS:
+            return "HEARTBEAT"
+        return None
+
+    def emit_frame(self, now=None):
+        detections = self.detect()
+        latency = max(1, int(self.rng.gauss(self.latency_ms, self.latency_ms * 0.05)))
+
+        kind = "DETECTION"
+        if self.report_changes_only:
+            now = time.monotonic() if now is None else now
+            kind = self.report_kind(detections, now)
+            if kind is None:
+                return
+            if kind == "DETECTION":
+                self.reported_detections = detections
+            else:
+                detections = self.reported_detections
+            self.last_report_at = now
+
+        if self.use_binary_frames:
+            entries = [(class_id, quantity, score) for class_id, (quantity, score) in detections.items()]
+            frame_type = FRAME_HEARTBEAT if kind == "HEARTBEAT" else FRAME_DETECTION
+            self.write(encode_detection_frame(self.frame_seq, latency, entries, frame_type))
+        else:
+            if detections or self.report_changes_only:
+                parts = "".join(f"|{self.labels[class_id]}:{quantity}:{score:.2f}"
+                                for class_id, (quantity, score) in detections.items())
+                self.write(f"{kind}{parts or '|'}\r\n")
+            self.write(f"LATENCY:{latency}ms\r\n")
+        if self.timing_enabled:
+            fields = "".join(f"|{stage}={int(latency * share * 1000)}" for stage, share in TIMING_SHARES)
+            self.write(f"TIMING|{self.frame_seq}{fields}\r\n")
+        self.frame_seq = (self.frame_seq + 1) & 0xFFFF
+        self.frames_sent += 1
+
+    def tick(self, now):
+        """Send a frame if one is due and return when the next one is"""
+        if not self.is_running:
+            self.next_frame = now + 0.1
+        elif now >= self.next_frame:
+            self.emit_frame(now)
+            # Catch up after a stall rather than bursting the missed frames
+            self.next_frame = max(self.next_frame + self.delay_ms / 1000.0, now)
+        return self.next_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate Nicla Vision devices on pseudo-terminals")
+    parser.add_argument("--count", type=int, default=1, help="Number of emulated devices")
+    parser.add_argument("--link-prefix", default=DEFAULT_LINK_PREFIX,
+                        help="Each device is linked at <prefix><n>")
+    parser.add_argument("--fps", type=float, default=1.0, help="Frames per second (sets the initial delay)")
+    parser.add_argument("--density", type=float, default=3.0, help="Average objects per frame")
+    parser.add_argument("--hold", type=float, default=0.0,
+                        help="Chance a frame repeats the previous detections (a still tray)")
+    parser.add_argument("--classes", nargs="+", default=DEFAULT_CLASSES)
+    parser.add_argument("--latency-ms", type=int, default=60, help="Reported processing latency")
+    parser.add_argument("--replug-every", type=float, default=0,
+                        help="Close and reopen every PTY after this many seconds (0 = never)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    # Remove the links on kill too, not just on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    devices = []
+    for n in range(args.count):
+        seed = None if args.seed is None else args.seed + n
+        device = EmulatedDevice(f"{args.link_prefix}{n}", args.classes, args.fps, args.density,
+                                latency_ms=args.latency_ms, seed=seed, hold=args.hold)
+        print(f"{device.link} -> {device.open()}")
+        devices.append(device)
+
+    next_replug = time.monotonic() + args.replug_every if args.replug_every else None
+    last_report = time.monotonic()
+
+    try:
+        while True:
+            now = time.monotonic()
+            next_due = min(device.tick(now) for device in devices)
+            if next_replug is not None:
+                if now >= next_replug:
+                    for device in devices:
+                        device.close()
+                        print(f"{device.link} replugged -> {device.open()}")
+                    next_replug = now + args.replug_every
+                next_due = min(next_due, next_replug)
+
+            readable, _, _ = select.select(devices, [], [], max(0.0, next_due - time.monotonic()))
+            for device in readable:
+                device.handle_input()
+
+            if now - last_report >= 10:
+                sent = sum(device.frames_sent for device in devices)
+                dropped = sum(device.bytes_dropped for device in devices)
+                print(f"{sent} frames sent, {dropped} bytes dropped (no reader)")
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for device in devices:
+            device.close()
+
+
+if __name__ == "__main__":
+    main()
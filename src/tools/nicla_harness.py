@@ -0,0 +1,228 @@
+# Run the Nicla Vision detection script on a PC
+#
+# Imports src/nicla/object_detection_nicla_improved_accuracy_post_processing.py
+# under CPython with the stand-in sensor, image, ml and pyb modules from
+# nicla_stubs/ and drives its run_once() loop. Instead of running a network,
+# each frame hands a recorded (or synthetic) FOMO output tensor to the
+# script's own fomo_post_process(), so everything after inference runs the
+# device code unchanged: scene-change gating, post-processing,
+# merge_nearby_detections() and the text or binary reporting to the UART. The
+# snapshot of each frame is the frame's heatmap scaled up to QVGA, so the
+# scene changes exactly when the model output does.
+#
+# Every stage is timed and reported as p50/p95/p99 milliseconds. By default
+# the script's clock is virtual (sleep_ms() advances it and returns at once,
+# and the reported LATENCY is 0 ms), so the bytes written to the UART depend
+# only on the input and can be compared against a golden file with --expect.
+#
+# Usage:
+#   python nicla_harness.py --synthetic 500 --objects 4 [--commands proto=bin]
+#   python nicla_harness.py --heatmaps heatmaps.npy --output golden.bin
+#   python nicla_harness.py --heatmaps heatmaps.npy --expect golden.bin
+#
+# Timings are CPython on the host, not the Cortex-M7; use them to compare
+# changes to the script, not as device latencies.
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+for _path in (os.path.join(_HERE, "..", "pc_application"), os.path.join(_HERE, "..", "nicla"),
+              _HERE, os.path.join(_HERE, "nicla_stubs")):
+    sys.path.insert(0, _path)
+
+import ml  # noqa: E402
+import sensor  # noqa: E402
+from fomo_post_process_np import load_heatmaps  # noqa: E402
+from latency_stats import LatencyWindow, format_ms  # noqa: E402
+
+DEVICE_MODULE = "object_detection_nicla_improved_accuracy_post_processing"
+
+# Stages of the device script that are timed, in the order they run
+STAGES = ["compute_scene_signature", "fomo_post_process", "merge_nearby_detections", "send_detection_nicla_format",
+          "send_detection_binary", "detect_objects", "run_once"]
+
+
+class VirtualClock:
+    """ticks_ms()/ticks_us()/sleep_ms() for the script that only advance on sleep"""
+
+    def __init__(self):
+        self.now = 0
+
+    def ticks_ms(self):
+        return self.now
+
+    def ticks_us(self):
+        return self.now * 1000
+
+    def sleep_ms(self, ms):
+        self.now += ms
+
+
+def synthetic_heatmaps(frames, objects, grid=12, classes=4, seed=0, repeat=0.0):
+    """
+    FOMO-like output tensors of shape (frames, grid, grid, classes + 1).
+
+    Each frame holds up to objects centroids of random classes: a peak cell
+    surrounded by weaker cells, like the model produces for one object. With
+    probability repeat a frame is a copy of the previous one (a static tray).
+    """
+    rng = random.Random(seed)
+    heatmaps = np.zeros((frames, grid, grid, classes + 1), dtype=np.float32)
+    for index, frame in enumerate(heatmaps):
+        if index and repeat and rng.random() < repeat:
+            frame[...] = heatmaps[index - 1]
+            continue
+        for _ in range(rng.randint(0, objects)):
+            label = rng.randint(1, classes)
+            y = rng.randrange(grid)
+            x = rng.randrange(grid)
+            peak = rng.uniform(0.5, 1.0)
+            frame[max(0, y - 1):y + 2, max(0, x - 1):x + 2, label] = np.maximum(
+                frame[max(0, y - 1):y + 2, max(0, x - 1):x + 2, label], peak * rng.uniform(0.4, 0.9))
+            frame[y, x, label] = max(frame[y, x, label], peak)
+        frame[..., 0] = 1.0 - frame[..., 1:].max(axis=2)
+    return heatmaps
+
+
+def scene_frames(heatmaps, width=320, height=240):
+    """Grayscale snapshots showing the foreground of each heatmap, scaled up"""
+    heatmaps = np.asarray(heatmaps)
+    rows = np.arange(height) * heatmaps.shape[1] // height
+    columns = np.arange(width) * heatmaps.shape[2] // width
+    foreground = heatmaps[..., 1:].max(axis=3)
+    return (foreground[:, rows][:, :, columns] * 255).astype(np.uint8)
+
+
+def timed(func, window):
+    """Wrap func to add its duration to window, except for calls returning False"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        # run_once() returns False for passes that only poll and wait
+        if result is not False:
+            window.add((time.perf_counter() - start) * 1000)
+        return result
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+
+def load_device(realtime=False):
+    """
+    Import and init() the detection script against the stand-in modules.
+
+    Returns (module, {stage: LatencyWindow}).
+    """
+    device = importlib.import_module(DEVICE_MODULE)
+
+    if not realtime:
+        clock = VirtualClock()
+        device.ticks_ms = clock.ticks_ms
+        device.ticks_us = clock.ticks_us
+        device.sleep_ms = clock.sleep_ms
+
+    # The script looks these up as module globals on every call, so wrapping
+    # them here times the real calls made by run_once()
+    windows = {}
+    for stage in STAGES:
+        windows[stage] = LatencyWindow(size=100000)
+        setattr(device, stage, timed(getattr(device, stage), windows[stage]))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        device.init()
+    return device, windows
+
+
+def run(device, heatmaps, commands=(), verbose=False):
+    """Feed commands, then run one frame per heatmap. Returns the UART output."""
+    sensor.feed_frames(scene_frames(heatmaps), heatmaps)
+    device.uart.feed("".join(f"{command}\n" for command in commands))
+
+    log = sys.stdout if verbose else io.StringIO()
+    with contextlib.redirect_stdout(log):
+        # Commands are handled a few per pass, like on the device
+        while device.uart.any():
+            device.process_commands()
+        frames = 0
+        while frames < len(heatmaps):
+            if device.run_once():
+                frames += 1
+    return device.uart.take_output()
+
+
+def print_report(windows, frames, elapsed):
+    print(f"{frames} frames in {elapsed:.2f} s ({frames / elapsed:.1f} fps), "
+          f"inference on {windows['detect_objects'].count}")
+    print(f"{'stage':<28} {'calls':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for stage in STAGES:
+        summary = windows[stage].summary()
+        if not summary["count"]:
+            continue
+        print(f"{stage:<28} {summary['count']:>7} {format_ms(summary['p50']):>8} {format_ms(summary['p95']):>8} "
+              f"{format_ms(summary['p99']):>8} {format_ms(summary['max']):>8}")
+
+
+def first_difference(a, b):
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return i
+    return min(len(a), len(b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Nicla detection script on the PC with stand-in modules")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--heatmaps", help="Saved output tensors (.npy/.npz), one frame each")
+    source.add_argument("--synthetic", type=int, metavar="FRAMES", help="Generate this many frames")
+    parser.add_argument("--objects", type=int, default=3, help="Maximum objects per synthetic frame")
+    parser.add_argument("--grid", type=int, default=12, help="Output grid size of synthetic frames")
+    parser.add_argument("--repeat", type=float, default=0.0,
+                        help="Chance a synthetic frame repeats the previous one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--commands", nargs="*", default=[],
+                        help="Commands sent before the first frame, e.g. proto=bin conf=0.5")
+    parser.add_argument("--realtime", action="store_true",
+                        help="Use the real clock and honour the script's sleeps")
+    parser.add_argument("--verbose", action="store_true", help="Show what the script prints")
+    golden = parser.add_mutually_exclusive_group()
+    golden.add_argument("--output", help="Write the UART output to this file")
+    golden.add_argument("--expect", help="Fail unless the UART output matches this file")
+    args = parser.parse_args()
+
+    if args.heatmaps:
+        heatmaps = load_heatmaps(args.heatmaps)
+    else:
+        heatmaps = synthetic_heatmaps(args.synthetic, args.objects, args.grid, len(ml.DEFAULT_LABELS) - 1,
+                                      args.seed, args.repeat)
+    ml.configure(grid=heatmaps.shape[1])
+
+    device, windows = load_device(args.realtime)
+    start = time.perf_counter()
+    output = run(device, heatmaps, args.commands, args.verbose)
+    print_report(windows, len(heatmaps), time.perf_counter() - start)
+    print(f"UART output: {len(output)} bytes")
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(output)
+    elif args.expect:
+        with open(args.expect, "rb") as f:
+            expected = f.read()
+        if output != expected:
+            offset = first_difference(output, expected)
+            print(f"UART output differs from {args.expect} at byte {offset}:")
+            print(f"  expected: {expected[max(0, offset - 40):offset + 40]!r}")
+            print(f"  got:      {output[max(0, offset - 40):offset + 40]!r}")
+            sys.exit(1)
+        print(f"UART output matches {args.expect}")
+
+
+if __name__ == "__main__":
+    main()
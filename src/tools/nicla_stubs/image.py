@@ -0,0 +1,115 @@
+# Stand-in for the OpenMV image module (CPython, used by nicla_harness.py)
+#
+# Image wraps a NumPy array. find_blobs() and get_statistics() implement the
+# subset the detection script uses on top of the NumPy FOMO port, so they
+# return the same blobs and scores as the device; drawing calls are counted
+# and otherwise ignored.
+import numpy as np
+
+from fomo_post_process_np import _label_components, _merge_rects
+
+
+class Blob:
+    def __init__(self, rect, pixels):
+        self._rect = rect
+        self._pixels = pixels
+
+    def rect(self):
+        return self._rect
+
+    def x(self):
+        return self._rect[0]
+
+    def y(self):
+        return self._rect[1]
+
+    def w(self):
+        return self._rect[2]
+
+    def h(self):
+        return self._rect[3]
+
+    def pixels(self):
+        return self._pixels
+
+
+class Statistics:
+    def __init__(self, l_mean):
+        self._l_mean = l_mean
+
+    def l_mean(self):
+        return self._l_mean
+
+
+def _threshold_mask(pixels, thresholds):
+    mask = np.zeros(pixels.shape, dtype=bool)
+    for low, high in thresholds:
+        mask |= (pixels >= low) & (pixels <= high)
+    return mask
+
+
+class Image:
+    """A grayscale (or RGB) image backed by a NumPy array"""
+
+    def __init__(self, data):
+        data = np.asarray(data)
+        if data.dtype != np.uint8:
+            data = np.clip(data, 0, 255).astype(np.uint8)
+        self.data = data
+        self.roi = (0, 0, data.shape[1], data.shape[0])
+        self.drawn = 0
+        self.model_output = None  # Set by sensor.snapshot(), see ml.Model.predict()
+
+    def width(self):
+        return self.data.shape[1]
+
+    def height(self):
+        return self.data.shape[0]
+
+    def _gray(self):
+        if self.data.ndim == 3:
+            return self.data.mean(axis=2).astype(np.uint8)
+        return self.data
+
+    def find_blobs(self, thresholds, x_stride=2, area_threshold=10, pixels_threshold=10, merge=False, **kwargs):
+        pixels = self._gray()
+        mask = _threshold_mask(pixels, thresholds)
+        if not mask.any():
+            return []
+
+        labels = _label_components(mask[np.newaxis])[0]
+        ys, xs = np.nonzero(mask)
+        roots, inverse, counts = np.unique(labels[mask], return_inverse=True, return_counts=True)
+        blobs = []
+        for k in range(len(roots)):
+            members = inverse == k
+            x0, x1 = int(xs[members].min()), int(xs[members].max())
+            y0, y1 = int(ys[members].min()), int(ys[members].max())
+            blobs.append(((x0, y0, x1 - x0 + 1, y1 - y0 + 1), int(counts[k])))
+
+        blobs = [(rect, count) for rect, count in blobs
+                 if count >= pixels_threshold and rect[2] * rect[3] >= area_threshold]
+        if merge and len(blobs) > 1:
+            rects = _merge_rects([rect for rect, _ in blobs])
+            blobs = [((x, y, w, h), int(mask[y:y + h, x:x + w].sum())) for x, y, w, h in rects]
+        return [Blob(rect, count) for rect, count in blobs]
+
+    def get_statistics(self, thresholds=None, roi=None, **kwargs):
+        pixels = self._gray()
+        if roi is not None:
+            x, y, w, h = roi
+            pixels = pixels[y:y + h, x:x + w]
+        if thresholds is not None:
+            pixels = pixels[_threshold_mask(pixels, thresholds)]
+        if pixels.size == 0:
+            return Statistics(0)
+        # l_mean() is an integer on the device
+        return Statistics(int(np.floor(pixels.mean() + 0.5)))
+
+    def draw_rectangle(self, *args, **kwargs):
+        self.drawn += 1
+        return self
+
+    def draw_string(self, *args, **kwargs):
+        self.drawn += 1
+        return self
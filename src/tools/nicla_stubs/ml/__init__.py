@@ -0,0 +1,59 @@
+# Stand-in for the OpenMV ml module (CPython, used by nicla_harness.py)
+#
+# Model.predict() does not run a network: it hands the output tensor attached
+# to the input image (see sensor.feed_frames), else the next queued one (see
+# feed_outputs), to the post-processing callback, or an all-zero tensor when
+# there is neither.
+from collections import deque
+
+import numpy as np
+
+DEFAULT_LABELS = ["background", "KitKat", "goodday", "HidenSeek", "Unibic"]
+DEFAULT_GRID = 12
+
+_outputs = deque()
+_config = {"labels": list(DEFAULT_LABELS), "grid": DEFAULT_GRID}
+
+
+def configure(labels=None, grid=None):
+    """Set the labels and output grid size of models loaded afterwards"""
+    if labels is not None:
+        _config["labels"] = list(labels)
+    if grid is not None:
+        _config["grid"] = grid
+
+
+def feed_outputs(outputs):
+    """Queue output tensors of shape (oh, ow, oc) or (1, oh, ow, oc), one per predict()"""
+    for output in outputs:
+        output = np.asarray(output, dtype=np.float32)
+        if output.ndim == 3:
+            output = output[np.newaxis]
+        _outputs.append(output)
+
+
+class Model:
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.labels = list(_config["labels"])
+        grid = _config["grid"]
+        self.output_shape = [(1, grid, grid, len(self.labels))]
+        self.input_shape = [(1, grid * 8, grid * 8, 1)]
+
+    def predict(self, inputs, callback=None):
+        output = getattr(inputs[0], "model_output", None)
+        if output is None and _outputs:
+            output = _outputs.popleft()
+        if output is not None:
+            output = np.asarray(output, dtype=np.float32)
+            if output.ndim == 3:
+                output = output[np.newaxis]
+            self.output_shape = [output.shape]
+        else:
+            output = np.zeros(self.output_shape[0], dtype=np.float32)
+        if callback is None:
+            return [output]
+        return callback(self, inputs, [output])
+
+    def __str__(self):
+        return f"Model({self.path}, stand-in, labels={self.labels}, output={self.output_shape})"
@@ -0,0 +1,36 @@
+# Stand-in for ml.utils (CPython, used by nicla_harness.py)
+#
+# NMS collects the boxes found on the output grid and applies the same
+# Gaussian soft-NMS and projection onto the input roi as the NumPy port.
+from fomo_post_process_np import NMS_SIGMA, NMS_THRESHOLD, soft_nms
+
+
+class NMS:
+    def __init__(self, window_w, window_h, roi):
+        self.window_w = window_w
+        self.window_h = window_h
+        self.roi = roi
+        self.boxes = []
+        self.scores = []
+        self.labels = []
+
+    def add_bounding_box(self, xmin, ymin, xmax, ymax, score, label):
+        self.boxes.append((xmin, ymin, xmax, ymax))
+        self.scores.append(score)
+        self.labels.append(label)
+
+    def get_bounding_boxes(self, threshold=NMS_THRESHOLD, sigma=NMS_SIGMA):
+        if not self.boxes:
+            return []
+        kept, kept_scores = soft_nms(self.boxes, self.scores, threshold, sigma)
+
+        rx, ry, rw, rh = self.roi
+        x_scale = rw / self.window_w
+        y_scale = rh / self.window_h
+        output = [[] for _ in range(max(self.labels) + 1)]
+        for index, score in zip(kept, kept_scores):
+            xmin, ymin, xmax, ymax = self.boxes[index]
+            rect = (int(xmin * x_scale) + rx, int(ymin * y_scale) + ry,
+                    int((xmax - xmin) * x_scale), int((ymax - ymin) * y_scale))
+            output[self.labels[index]].append((rect, score))
+        return output
@@ -0,0 +1,60 @@
+# Stand-in for the OpenMV pyb module (CPython, used by nicla_harness.py)
+#
+# UART keeps everything written to it and hands out the commands queued with
+# feed(); LED only records its state.
+from collections import deque
+
+
+class UART:
+    def __init__(self, bus, baudrate=115200, **kwargs):
+        self.bus = bus
+        self.baudrate = baudrate
+        self.written = bytearray()
+        self.lines = deque()
+
+    def init(self, baudrate, bits=8, parity=None, stop=1, **kwargs):
+        self.baudrate = baudrate
+
+    def feed(self, data):
+        """Queue bytes from the PC; each line is returned by one readline()"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        for line in data.splitlines(True):
+            self.lines.append(line)
+
+    def any(self):
+        return len(self.lines)
+
+    def readline(self):
+        return self.lines.popleft() if self.lines else None
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.written.extend(data)
+        return len(data)
+
+    def take_output(self):
+        """Return and clear everything written so far"""
+        data = bytes(self.written)
+        self.written.clear()
+        return data
+
+
+class LED:
+    def __init__(self, number):
+        self.number = number
+        self.lit = False
+        self.changes = 0
+
+    def on(self):
+        self.lit = True
+        self.changes += 1
+
+    def off(self):
+        self.lit = False
+        self.changes += 1
+
+    def toggle(self):
+        self.lit = not self.lit
+        self.changes += 1
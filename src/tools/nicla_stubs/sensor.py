@@ -0,0 +1,56 @@
+# Stand-in for the OpenMV sensor module (CPython, used by nicla_harness.py)
+#
+# snapshot() returns the next queued frame (see feed_frames), or a blank QVGA
+# image when none is queued. A queued frame can carry the output tensor the
+# stand-in ml.Model returns for it, which keeps frames and model outputs in
+# step when the script skips inference on some of them.
+from collections import deque
+
+import numpy as np
+
+import image
+
+RGB565 = "RGB565"
+GRAYSCALE = "GRAYSCALE"
+QVGA = (320, 240)
+QQVGA = (160, 120)
+VGA = (640, 480)
+
+_state = {"pixformat": RGB565, "framesize": QVGA}
+_frames = deque()
+
+
+def reset():
+    _frames.clear()
+
+
+def set_pixformat(pixformat):
+    _state["pixformat"] = pixformat
+
+
+def set_framesize(framesize):
+    _state["framesize"] = framesize
+
+
+def skip_frames(n=None, time=None):
+    pass
+
+
+def feed_frames(frames, outputs=None):
+    """
+    Queue frames (arrays of shape (h, w) or (h, w, 3)) for snapshot(), each
+    optionally with the model output tensor predict() returns for it
+    """
+    if outputs is None:
+        outputs = [None] * len(frames)
+    _frames.extend(zip(frames, outputs))
+
+
+def snapshot():
+    if _frames:
+        frame, output = _frames.popleft()
+        img = image.Image(frame)
+        img.model_output = output
+        return img
+    width, height = _state["framesize"]
+    return image.Image(np.zeros((height, width), dtype=np.uint8))
@@ -0,0 +1,381 @@
+# Offline sweep of the detection thresholds over a labelled heatmap dataset
+#
+# min_confidence and class_distance_thresholds (src/nicla/detection_merge.py)
+# were tuned by hand. This runs the NumPy port of the device post-processing
+# (fomo_post_process_np.py) and the device's own merge_nearby_detections()
+# over saved FOMO output tensors for a grid of confidence and distance
+# thresholds, matches the merged detections against ground truth and reports
+# precision, recall and count accuracy per class.
+#
+# The post-processing only depends on the confidence and the merge of a class
+# only on that class's distance threshold, so every frame is post-processed
+# once per distinct thresholded mask and each class is merged once per
+# distance; the grid is never expanded into combinations of per-class
+# thresholds. Frames are split
+# into chunks evaluated by a process pool and the per-chunk counts are summed.
+#
+# Ground truth is a CSV with one row per object, frame,label,x,y, where frame
+# is the index into the heatmaps, label a class name or index and x, y the
+# object centre in snapshot pixels. Frames without rows hold no objects.
+#
+# A detection is a true positive when its centre is within --match-radius
+# pixels of a still unmatched object of the same class (highest scores are
+# matched first). Count accuracy is the share of frames, among those where
+# the class was labelled or detected, in which the number of detections
+# equals the number of objects, which is what the checkout verification
+# depends on.
+#
+# Usage:
+#   python threshold_sweep.py heatmaps.npy truth.csv [--labels-file labels.txt] [--csv sweep.csv]
+#   python threshold_sweep.py --synthetic 20000 [--save-synthetic dataset]
+import argparse
+import csv
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, "..", "nicla"))
+
+from detection_merge import (  # noqa: E402
+    DEFAULT_DISTANCE_THRESHOLD,
+    class_distance_thresholds,
+    merge_nearby_detections,
+)
+from fomo_post_process_np import (  # noqa: E402
+    DEFAULT_MIN_CONFIDENCE,
+    DEFAULT_ROI,
+    fomo_post_process,
+    load_heatmaps,
+    to_grayscale,
+)
+
+DEFAULT_LABELS = ["background", "KitKat", "goodday", "HidenSeek", "Unibic"]
+DEFAULT_CONFIDENCES = [round(0.3 + 0.05 * i, 2) for i in range(13)]
+DEFAULT_DISTANCES = [10, 20, 30, 40, 50, 60, 70, 80, 100, 120]
+DEFAULT_MATCH_RADIUS = 30
+
+# Frames per pool task; large enough that pickling the counts is negligible
+CHUNK_FRAMES = 500
+
+# Counters kept per (confidence, distance, class)
+TP, FP, FN, COUNT_OK, COUNT_FRAMES = range(5)
+COUNTERS = 5
+
+# Set in each worker by _init_worker()
+_dataset = None
+
+
+def read_truth(path, labels):
+    """{frame: [(class_id, x, y), ...]} from a frame,label,x,y CSV"""
+    truth = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            label = row["label"]
+            class_id = int(label) if label.isdigit() else labels.index(label)
+            truth.setdefault(int(row["frame"]), []).append((class_id, float(row["x"]), float(row["y"])))
+    return truth
+
+
+def write_truth(path, truth, labels):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("frame", "label", "x", "y"))
+        for frame in sorted(truth):
+            for class_id, x, y in truth[frame]:
+                writer.writerow((frame, labels[class_id], f"{x:.1f}", f"{y:.1f}"))
+
+
+def synthetic_dataset(frames, objects=4, grid=12, classes=4, roi=DEFAULT_ROI, seed=0):
+    """
+    FOMO-like output tensors with their ground truth, for trying the sweep.
+
+    Besides the objects themselves, frames have the things the thresholds are
+    there for: weak spurious peaks, objects that light up a second cell two
+    cells away, and neighbouring objects of the same class.
+
+    Returns:
+        (heatmaps of shape (frames, grid, grid, classes + 1), truth)
+    """
+    rng = random.Random(seed)
+    heatmaps = np.zeros((frames, grid, grid, classes + 1), dtype=np.float32)
+    truth = {}
+    rx, ry, rw, rh = roi
+    cell_w = rw / grid
+    cell_h = rh / grid
+
+    def peak(frame, x, y, label, value):
+        if 0 <= x < grid and 0 <= y < grid:
+            frame[y, x, label] = max(frame[y, x, label], value)
+
+    for index, frame in enumerate(heatmaps):
+        for _ in range(rng.randint(0, objects)):
+            label = rng.randint(1, classes)
+            x = rng.randrange(grid)
+            y = rng.randrange(grid)
+            peak(frame, x, y, label, rng.uniform(0.55, 1.0))
+            truth.setdefault(index, []).append((label, rx + (x + 0.5) * cell_w, ry + (y + 0.5) * cell_h))
+            if rng.random() < 0.25:
+                # One object seen as two blobs
+                dx, dy = rng.choice(((2, 0), (-2, 0), (0, 2), (0, -2)))
+                peak(frame, x + dx, y + dy, label, rng.uniform(0.4, 0.8))
+            elif rng.random() < 0.25 and 0 <= x + 3 < grid:
+                # A second item of the same product next to it
+                peak(frame, x + 3, y, label, rng.uniform(0.55, 1.0))
+                truth[index].append((label, rx + (x + 3.5) * cell_w, ry + (y + 0.5) * cell_h))
+        for _ in range(rng.randint(0, 2)):
+            peak(frame, rng.randrange(grid), rng.randrange(grid), rng.randint(1, classes), rng.uniform(0.2, 0.55))
+        frame[..., 0] = 1.0 - frame[..., 1:].max(axis=2)
+    return heatmaps, truth
+
+
+def match_class(detections, objects, radius_sq):
+    """(true positives, false positives, false negatives) of one class in one frame"""
+    if not objects:
+        return 0, len(detections), 0
+    if not detections:
+        return 0, 0, len(objects)
+    unmatched = list(objects)
+    tp = 0
+    # Detections come out of the merge sorted by score, highest first
+    for (x, y, w, h), _ in detections:
+        cx = x + w // 2
+        cy = y + h // 2
+        best = None
+        best_sq = radius_sq
+        for k, (ox, oy) in enumerate(unmatched):
+            d_sq = (ox - cx) ** 2 + (oy - cy) ** 2
+            if d_sq <= best_sq:
+                best, best_sq = k, d_sq
+        if best is not None:
+            del unmatched[best]
+            tp += 1
+    return tp, len(detections) - tp, len(unmatched)
+
+
+def evaluate_frames(frames, truth, labels, confidences, distances, roi, match_radius):
+    """
+    Count matches for every threshold combination over some frames.
+
+    Args:
+        frames: Iterable of (frame index, output tensor (oh, ow, oc))
+        truth: {frame index: [(class_id, x, y), ...]}
+
+    Returns:
+        int64 array of shape (confidences, distances, classes, COUNTERS)
+    """
+    counts = np.zeros((len(confidences), len(distances), len(labels), COUNTERS), dtype=np.int64)
+    radius_sq = match_radius * match_radius
+    for index, heatmap in frames:
+        objects = {}
+        for class_id, x, y in truth.get(index, ()):
+            objects.setdefault(class_id, []).append((x, y))
+
+        # Confidences with no pixel value between their thresholds find the
+        # same blobs, so each distinct mask is post-processed once
+        values = np.unique(to_grayscale(heatmap))
+        results_by_mask = {}
+        for ci, confidence in enumerate(confidences):
+            mask_key = int(np.searchsorted(values, math.ceil(confidence * 255)))
+            results = results_by_mask.get(mask_key)
+            if results is None:
+                results = results_by_mask[mask_key] = fomo_post_process(heatmap[np.newaxis], roi, confidence)
+            for class_id in range(1, len(labels)):
+                found = results[class_id] if class_id < len(results) else []
+                class_objects = objects.get(class_id, ())
+                if not found and not class_objects:
+                    continue
+                previous = None
+                for di, distance in enumerate(distances):
+                    merged = merge_nearby_detections(list(found), labels[class_id], distance)
+                    # Nearby thresholds often keep the same detections
+                    if merged != previous:
+                        tp, fp, fn = match_class(merged, class_objects, radius_sq)
+                        previous = merged
+                    cell = counts[ci, di, class_id]
+                    cell[TP] += tp
+                    cell[FP] += fp
+                    cell[FN] += fn
+                    cell[COUNT_OK] += len(merged) == len(class_objects)
+                    cell[COUNT_FRAMES] += 1
+    return counts
+
+
+def _init_worker(dataset):
+    global _dataset
+    if isinstance(dataset, str):
+        # Each worker maps the file instead of receiving the frames
+        dataset = np.load(dataset, mmap_mode="r")
+    _dataset = dataset
+
+
+def _evaluate_chunk(start, stop, truth, labels, confidences, distances, roi, match_radius):
+    frames = ((index, np.asarray(_dataset[index])) for index in range(start, stop))
+    return evaluate_frames(frames, truth, labels, confidences, distances, roi, match_radius)
+
+
+def sweep(dataset, truth, labels, confidences, distances, roi=DEFAULT_ROI, match_radius=DEFAULT_MATCH_RADIUS,
+          workers=None, chunk_frames=CHUNK_FRAMES):
+    """
+    Evaluate the whole threshold grid over a dataset with a process pool.
+
+    Args:
+        dataset: Array of output tensors (frames, oh, ow, oc), or the path of
+            a .npy file that each worker maps
+        truth: {frame index: [(class_id, x, y), ...]}
+        workers: Pool size, os.cpu_count() by default; 0 runs in this process
+
+    Returns:
+        int64 array of shape (confidences, distances, classes, COUNTERS)
+    """
+    frames = len(np.load(dataset, mmap_mode="r")) if isinstance(dataset, str) else len(dataset)
+    chunks = [(start, min(start + chunk_frames, frames)) for start in range(0, frames, chunk_frames)]
+    args = [(start, stop, {i: truth[i] for i in range(start, stop) if i in truth}, labels, confidences,
+             distances, roi, match_radius) for start, stop in chunks]
+
+    if workers == 0:
+        _init_worker(dataset)
+        results = [_evaluate_chunk(*chunk_args) for chunk_args in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dataset,)) as pool:
+            futures = [pool.submit(_evaluate_chunk, *chunk_args) for chunk_args in args]
+            results = [future.result() for future in futures]
+
+    total = np.zeros((len(confidences), len(distances), len(labels), COUNTERS), dtype=np.int64)
+    for counts in results:
+        total += counts
+    return total
+
+
+def metrics(cell):
+    """(precision, recall, f1, count accuracy) of one counter cell, None when undefined"""
+    tp, fp, fn, count_ok, count_frames = (int(v) for v in cell)
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / (tp + fn) if tp + fn else None
+    f1 = 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else None
+    accuracy = count_ok / count_frames if count_frames else None
+    return precision, recall, f1, accuracy
+
+
+def _rank(m):
+    """Sort key of metrics(): count accuracy first, since verification checks counts, then F1"""
+    return (-1 if m[3] is None else m[3], -1 if m[2] is None else m[2])
+
+
+def _pct(value):
+    return "-" if value is None else f"{value * 100:.1f}%"
+
+
+def nearest(values, value):
+    return min(range(len(values)), key=lambda i: abs(values[i] - value))
+
+
+def print_report(counts, labels, confidences, distances, current_confidence):
+    """Current thresholds against the best grid point (see _rank()) of every class"""
+    ci_current = nearest(confidences, current_confidence)
+    print(f"{'class':<12} {'setting':<8} {'conf':>5} {'dist':>5} {'precision':>9} {'recall':>7} {'f1':>7} "
+          f"{'count acc':>9}")
+    for class_id in range(1, len(labels)):
+        label = labels[class_id]
+        distance = class_distance_thresholds.get(label, DEFAULT_DISTANCE_THRESHOLD)
+        di_current = nearest(distances, distance)
+        best = max(((ci, di) for ci in range(len(confidences)) for di in range(len(distances))),
+                   key=lambda p: _rank(metrics(counts[p[0], p[1], class_id])))
+        for name, (ci, di) in (("current", (ci_current, di_current)), ("best", best)):
+            precision, recall, f1, accuracy = metrics(counts[ci, di, class_id])
+            print(f"{label:<12} {name:<8} {confidences[ci]:>5.2f} {distances[di]:>5} {_pct(precision):>9} "
+                  f"{_pct(recall):>7} {_pct(f1):>7} {_pct(accuracy):>9}")
+
+    # min_confidence is one setting for all classes; rank it with every class
+    # at its best distance for that confidence
+    print(f"\n{'conf':>5} {'mean count acc':>14} {'mean f1':>8}")
+    for ci, confidence in enumerate(confidences):
+        accuracies = []
+        f1s = []
+        for class_id in range(1, len(labels)):
+            best = max((metrics(counts[ci, di, class_id]) for di in range(len(distances))), key=_rank)
+            if best[3] is not None:
+                accuracies.append(best[3])
+            if best[2] is not None:
+                f1s.append(best[2])
+        mean_accuracy = sum(accuracies) / len(accuracies) if accuracies else None
+        mean_f1 = sum(f1s) / len(f1s) if f1s else None
+        marker = "  <- current" if ci == ci_current else ""
+        print(f"{confidence:>5.2f} {_pct(mean_accuracy):>14} {_pct(mean_f1):>8}{marker}")
+
+
+def write_csv(path, counts, labels, confidences, distances):
+    """The full grid, one row per class and threshold pair"""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("class", "confidence", "distance", "tp", "fp", "fn", "precision", "recall", "f1",
+                         "count_accuracy", "count_frames"))
+        for class_id in range(1, len(labels)):
+            for ci, confidence in enumerate(confidences):
+                for di, distance in enumerate(distances):
+                    cell = counts[ci, di, class_id]
+                    values = ["" if m is None else f"{m:.4f}" for m in metrics(cell)]
+                    writer.writerow([labels[class_id], confidence, distance, int(cell[TP]), int(cell[FP]),
+                                     int(cell[FN])] + values + [int(cell[COUNT_FRAMES])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the detection thresholds over labelled heatmaps")
+    parser.add_argument("heatmaps", nargs="?", help=".npy/.npz file with output tensors (frames, oh, ow, oc)")
+    parser.add_argument("truth", nargs="?", help="CSV with frame,label,x,y rows")
+    parser.add_argument("--synthetic", type=int, metavar="FRAMES", help="Generate a labelled dataset instead")
+    parser.add_argument("--save-synthetic", metavar="PREFIX", help="Write the generated PREFIX.npy and PREFIX.csv")
+    parser.add_argument("--labels-file", help="labels.txt of the model, one label per line")
+    parser.add_argument("--confidences", type=float, nargs="+", default=DEFAULT_CONFIDENCES)
+    parser.add_argument("--distances", type=int, nargs="+", default=DEFAULT_DISTANCES)
+    parser.add_argument("--match-radius", type=float, default=DEFAULT_MATCH_RADIUS,
+                        help="Pixels between a detection and its object")
+    parser.add_argument("--roi", type=int, nargs=4, default=DEFAULT_ROI, metavar=("X", "Y", "W", "H"))
+    parser.add_argument("--workers", type=int, default=None, help="Processes, 0 to run in this one")
+    parser.add_argument("--csv", help="Write the metrics of every grid point to this file")
+    args = parser.parse_args()
+
+    labels = DEFAULT_LABELS
+    if args.labels_file:
+        with open(args.labels_file) as f:
+            labels = [line.strip() for line in f if line.strip()]
+
+    if args.synthetic:
+        dataset, truth = synthetic_dataset(args.synthetic, classes=len(labels) - 1, roi=tuple(args.roi))
+        if args.save_synthetic:
+            np.save(f"{args.save_synthetic}.npy", dataset)
+            write_truth(f"{args.save_synthetic}.csv", truth, labels)
+    elif args.heatmaps and args.truth:
+        truth = read_truth(args.truth, labels)
+        # Plain .npy files are mapped by the workers instead of being sent to them
+        dataset = args.heatmaps
+        if not args.heatmaps.endswith(".npy") or np.load(args.heatmaps, mmap_mode="r").ndim != 4:
+            dataset = load_heatmaps(args.heatmaps)
+    else:
+        parser.error("give the heatmaps and truth files, or --synthetic")
+
+    # Always evaluate the device's current settings too
+    confidences = sorted(set(args.confidences) | {DEFAULT_MIN_CONFIDENCE})
+    distances = sorted(set(args.distances) | set(class_distance_thresholds.values()) | {DEFAULT_DISTANCE_THRESHOLD})
+
+    frames = len(np.load(dataset, mmap_mode="r")) if isinstance(dataset, str) else len(dataset)
+    workers = os.cpu_count() if args.workers is None else args.workers
+    start = time.perf_counter()
+    counts = sweep(dataset, truth, labels, confidences, distances, tuple(args.roi), args.match_radius, workers)
+    elapsed = time.perf_counter() - start
+    print(f"{frames} frames x {len(confidences)} confidences x {len(distances)} distances "
+          f"in {elapsed:.1f} s on {workers or 1} process(es) ({frames / elapsed:.0f} frames/s)\n")
+
+    print_report(counts, labels, confidences, distances, DEFAULT_MIN_CONFIDENCE)
+    if args.csv:
+        write_csv(args.csv, counts, labels, confidences, distances)
+        print(f"\nMetrics of {len(confidences) * len(distances) * (len(labels) - 1)} grid points written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Tests for the tagged commands in src/pc_application/command_channel.py
+#
+# Usage:
+#   python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from command_channel import CommandChannel, CommandTimeout  # noqa: E402
+
+
+def channel(timeout=1.0):
+    writes = []
+    return CommandChannel(writes.append, timeout=timeout), writes
+
+
+def test_reply_resolves_future():
+    commands, writes = channel()
+    status, proto = commands.send_many(["status", "proto=bin"])
+    assert writes == [b"#1 status\r\n#2 proto=bin\r\n"]
+
+    assert commands.feed_line("#2 PROTO|bin|background,KitKat") == ("PROTO|bin|background,KitKat", True)
+    reply = proto.result()
+    assert reply.ok and reply.fields == {"protocol": "bin", "labels": ["background", "KitKat"]}
+    assert not status.done()
+
+
+def test_legacy_reject_resends_pending_commands():
+    commands, writes = channel()
+    futures = commands.send_many(["status", "proto=bin", "report=change"])
+    commands.feed_line("Unknown command: #1 status")
+    commands.feed_line("Unknown command: #2 proto=bin")
+    commands.feed_line("Unknown command: #3 report=change")
+
+    assert writes[1:] == [b"status\r\nproto=bin\r\nreport=change\r\n"]
+    assert [future.result() for future in futures] == [None, None, None]
+    assert not commands.tagged
+    commands.send("status")
+    assert writes[-1] == b"status\r\n"
+
+
+def test_legacy_reject_after_expiry_resends_expired_commands():
+    commands, writes = channel(timeout=0.5)
+    futures = commands.send_many(["status", "proto=bin"])
+    assert commands.expire(now=float("inf")) == 2
+    for future in futures:
+        with pytest.raises(CommandTimeout):
+            future.result()
+
+    # Slow firmware rejects the batch after its deadline; the device must
+    # still get proto=bin, just without the tag
+    commands.feed_line("Unknown command: #1 status")
+    commands.feed_line("Unknown command: #2 proto=bin")
+    assert writes[1:] == [b"status\r\nproto=bin\r\n"]
+
+
+def test_late_reply_is_not_resent():
+    commands, writes = channel(timeout=0.5)
+    commands.send_many(["status", "proto=bin"])
+    commands.expire(now=float("inf"))
+    commands.feed_line("#1 Status: Running")
+    commands.feed_line("Unknown command: #2 proto=bin")
+    assert writes[1:] == [b"proto=bin\r\n"]
@@ -0,0 +1,50 @@
+# Tests for the bounded log panes in src/pc_application/log_buffer.py
+#
+# Usage:
+#   python -m pytest tests
+import os
+import sys
+import tkinter as tk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from log_buffer import LogView, RingLog  # noqa: E402
+
+
+class TextStandIn:
+    """The part of a Tk Text widget LogView uses, without a display"""
+
+    def __init__(self):
+        self.text = ""
+
+    def insert(self, index, text):
+        assert index == tk.END
+        self.text += text
+
+    def delete(self, first, last):
+        assert first == "1.0"
+        if last == tk.END:
+            self.text = ""
+            return
+        # "N.0" is the start of line N, so lines 1..N-1 go
+        lines = self.text.split("\n")
+        self.text = "\n".join(lines[int(last.split(".")[0]) - 1:])
+
+    def see(self, index):
+        pass
+
+
+def test_entries_with_several_lines_or_none_stay_in_step():
+    widget = TextStandIn()
+    view = LogView(widget, RingLog(max_lines=3))
+    view.extend(["[1] one\n", "[2] <<DETECTION|KitKat:1:0.90\n\n", "[3] no newline", "[4] four\n"])
+    assert widget.text == "[2] <<DETECTION|KitKat:1:0.90\n\n[3] no newline\n[4] four\n"
+
+    view.append("[5] five\nand more\n")
+    view.append("[6] six\n")
+    assert widget.text == "[4] four\n[5] five\nand more\n[6] six\n"
+    assert list(view.log.entries) == ["[4] four\n", "[5] five\nand more\n", "[6] six\n"]
+
+    view.clear()
+    view.append("[7] seven\n")
+    assert widget.text == "[7] seven\n"
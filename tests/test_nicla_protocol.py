@@ -0,0 +1,69 @@
+# Tests for the serial stream decoder in src/pc_application/nicla_protocol.py
+#
+# Usage:
+#   python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from nicla_protocol import StreamDecoder, encode_detection_frame  # noqa: E402
+
+
+def frames(count):
+    return [encode_detection_frame(seq, 12, [(seq % 4, 1 + seq % 3, 0.8)]) for seq in range(count)]
+
+
+def decode(stream, chunk=None):
+    """Feed stream to a new decoder, in pieces of chunk bytes; returns the decoder and its events"""
+    decoder = StreamDecoder()
+    chunk = chunk or len(stream)
+    events = []
+    for start in range(0, len(stream), chunk):
+        events += decoder.feed(stream[start:start + chunk])
+    return decoder, events
+
+
+def frame_seqs(events):
+    return [payload.seq for kind, payload in events if kind == "frame"]
+
+
+def test_sync_byte_inside_text_line():
+    # The yen sign is C2 A5, with or without the second sync byte after it
+    stream = "Price: ¥100 ¥Z\r\n".encode("utf-8") + frames(1)[0] + b"LATENCY:5\r\n"
+    for chunk in (None, 1, 3):
+        _, events = decode(stream, chunk)
+        assert events[0] == ("line", "Price: ¥100 ¥Z\r\n".encode("utf-8"))
+        assert frame_seqs(events) == [0]
+        assert events[-1] == ("line", b"LATENCY:5\r\n")
+
+
+def test_resync_after_dropped_byte():
+    sent = frames(2000)
+    damaged = bytearray(sent[5])
+    del damaged[4]
+    stream = b"".join(sent[:5]) + bytes(damaged) + b"".join(sent[6:])
+    for chunk in (None, 1, 64):
+        decoder, events = decode(stream, chunk)
+        seqs = frame_seqs(events)
+        assert seqs[:6] == [0, 1, 2, 3, 4, 6]
+        assert seqs == [seq for seq in range(2000) if seq != 5]
+        # Only the remains of frame 5 are left over as text
+        assert [payload for kind, payload in events if kind == "line"] == [bytes(damaged)]
+
+
+def test_resync_after_garbage_byte():
+    sent = frames(100)
+    stream = b"".join(sent[:10]) + b"\xa5" + b"".join(sent[10:20]) + b"\x00\xa5\x5a\x01" + b"".join(sent[20:])
+    for chunk in (None, 1, 7):
+        _, events = decode(stream, chunk)
+        assert frame_seqs(events) == list(range(100))
+
+
+def test_corrupt_frame_is_dropped():
+    sent = frames(10)
+    corrupt = bytearray(sent[3])
+    corrupt[-1] ^= 0xFF
+    decoder, events = decode(b"".join(sent[:3]) + bytes(corrupt) + b"".join(sent[4:]))
+    assert frame_seqs(events) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert decoder.crc_errors >= 1
@@ -0,0 +1,37 @@
+# Tests for the reconnection state in src/pc_application/port_watcher.py
+#
+# Usage:
+#   python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pc_application"))
+
+from port_watcher import Backoff, Reconnector  # noqa: E402
+
+
+def test_reopen_after_cancel_is_refused():
+    reconnector = Reconnector()
+    reconnector.lost("cable pulled", now=10.0)
+    assert reconnector.due(now=10.0)
+
+    # Disconnected on purpose while the port was being opened
+    reconnector.cancel()
+    assert not reconnector.reopened(now=10.5)
+    assert not reconnector.reconnecting and not reconnector.recovering
+    assert reconnector.recovered(now=11.0) is None
+
+
+def test_reopen_and_recover():
+    reconnector = Reconnector(Backoff(jitter=0.0))
+    reconnector.lost("cable pulled", now=10.0)
+    assert reconnector.failed("busy", now=10.0) == 0.25
+    assert abs(reconnector.wait(now=10.1) - 0.15) < 1e-9
+    reconnector.port_appeared(now=10.1)
+    assert reconnector.wait(now=10.1) == 0.0
+
+    assert reconnector.reopened(now=10.2)
+    assert reconnector.attempts == 2 and reconnector.recovering
+    assert abs(reconnector.recovered(now=10.5) - 500.0) < 1e-6
+    assert not reconnector.reconnecting and not reconnector.recovering
+